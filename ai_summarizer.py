@@ -1,8 +1,14 @@
 import os
 import json
 import logging
+import time
 from openai import OpenAI
 
+from metrics import AI_REQUEST_SECONDS, AI_REQUESTS
+from tracing import set_span_error, span
+
+logger = logging.getLogger(__name__)
+
 # Initialize OpenAI client
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")  # Retrieve from the environment
 
@@ -11,7 +17,30 @@ if not OPENAI_API_KEY:
 
 openai = OpenAI(api_key=OPENAI_API_KEY)
 
+def create_chat_completion(operation, **kwargs):
+    """
+    Make a chat completion request, recording its time and outcome by
+    operation in the AI request metrics
+    
+    Args:
+        operation (str): What the request is for, e.g. 'summarize'
+        **kwargs: Passed to openai.chat.completions.create
+    
+    Returns:
+        ChatCompletion: The completion response
+    """
+    started = time.perf_counter()
+    outcome = 'error'
+    try:
+        with span('openai.chat.completions', operation=operation, model=kwargs.get('model')):
+            response = openai.chat.completions.create(**kwargs)
+        outcome = 'ok'
+        return response
+    finally:
+        AI_REQUEST_SECONDS.observe(time.perf_counter() - started, operation=operation)
+        AI_REQUESTS.inc(operation=operation, outcome=outcome)
 
+@span('summarize_company')
 def summarize_company(description):
     """
     Summarize company descriptions using OpenAI's GPT-4o model
@@ -34,21 +63,24 @@ def summarize_company(description):
             f"{description}"
         )
         
-        response = openai.chat.completions.create(
+        response = create_chat_completion(
+            'summarize',
             model="gpt-4o",
             messages=[{"role": "user", "content": prompt}],
             max_tokens=150
         )
         
         summary = response.choices[0].message.content.strip()
-        logging.debug(f"AI summarization complete: {summary[:50]}...")
+        logger.debug("AI summarization complete: %s...", summary[:50])
         return summary
         
     except Exception as e:
-        logging.error(f"Error summarizing with AI: {e}")
+        logger.error("Error summarizing with AI: %s", e)
+        set_span_error(str(e))
         # Return a truncated version as fallback
         return description[:200] + "..." if len(description) > 200 else description
 
+@span('analyze_company_value')
 def analyze_company_value(company_data):
     """
     Analyze a company's potential value as a lead using AI
@@ -79,7 +111,8 @@ def analyze_company_value(company_data):
         
         # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
         # do not change this unless explicitly requested by the user
-        response = openai.chat.completions.create(
+        response = create_chat_completion(
+            'analyze',
             model="gpt-4o",
             messages=[{"role": "user", "content": prompt}],
             response_format={"type": "json_object"}
@@ -92,5 +125,6 @@ def analyze_company_value(company_data):
         }
         
     except Exception as e:
-        logging.error(f"Error analyzing company value: {e}")
+        logger.error("Error analyzing company value: %s", e)
+        set_span_error(str(e))
         return { 'score': 50, 'reasoning': 'Unable to analyze due to an error'}
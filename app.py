@@ -1,41 +1,112 @@
 import os
 import logging
-import traceback
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+from flask import Flask, Response, abort, render_template, request, jsonify, session, redirect, url_for, send_file, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.orm import DeclarativeBase, contains_eager, joinedload
+
+from db_config import (
+    DATABASE_REPLICA_URL, RoutingSession, engine_options, init_sqlite_profile, pool_stats, use_read_replica
+)
+from logging_config import configure_logging
+from metrics import CACHE_REQUESTS, init_metrics, render_metrics, watch_pools
+
+# Flask-Migrate provides the 'flask db' schema migration commands
+try:
+    from flask_migrate import Migrate
+except ImportError:
+    Migrate = None
+import csv
 import json
+import time
+import click
+from datetime import datetime
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)
+# Set up logging: levels, format and rate limits from the LOG_* variables
+configure_logging()
+logger = logging.getLogger(__name__)
 
 class Base(DeclarativeBase):
     pass
 
-db = SQLAlchemy(model_class=Base)
+db = SQLAlchemy(model_class=Base, session_options={"class_": RoutingSession})
 # create the app
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev_secret_key")
 
 # configure the database
 app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///leads.db")
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-}
+# pool size, overflow, timeout and recycling from the DB_POOL_* variables
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config["SQLALCHEMY_DATABASE_URI"])
+# optional read replica for the read-only endpoints marked @use_read_replica
+if DATABASE_REPLICA_URL:
+    app.config["SQLALCHEMY_BINDS"] = {
+        "replica": {"url": DATABASE_REPLICA_URL, **engine_options(DATABASE_REPLICA_URL)}
+    }
+# seconds to cache /api/leads/stats responses (0 disables the cache)
+app.config["LEAD_STATS_CACHE_TTL"] = float(os.environ.get("LEAD_STATS_CACHE_TTL", "0"))
+# lead scoring weight overrides as JSON, e.g. {"email_status": {"valid": 50}}
+app.config["LEAD_SCORING_WEIGHTS"] = json.loads(os.environ.get("LEAD_SCORING_WEIGHTS", "{}"))
+# group enrichment commits in a write-behind batcher ("1"/"0", default on for SQLite)
+app.config["WRITE_BATCHING"] = {"1": True, "0": False}.get(os.environ.get("WRITE_BATCHING"))
+# load the duplicate and similar-company indexes in the background at startup,
+# so the first scrape or new lead doesn't wait for them ("1"/"0", default on)
+app.config["PRELOAD_COMPANY_INDEXES"] = os.environ.get("PRELOAD_COMPANY_INDEXES", "1") == "1"
 # initialize the app with the extension
 db.init_app(app)
+if Migrate is not None:
+    Migrate(app, db)
+
+# WAL, synchronous=NORMAL, busy_timeout etc. on every SQLite connection
+with app.app_context():
+    for engine in db.engines.values():
+        init_sqlite_profile(engine)
+    watch_pools(db.engines)
+
+# request latency and status counts for /metrics
+init_metrics(app)
 
 # Import routes after app initialization to avoid circular imports
-from models import Lead, Company, SocialMedia, CompetitorAnalysis
+from models import Lead, Company, SocialMedia, CompetitorAnalysis, CompanyVector, Job
 from email_tools import validate_email
 from social_media_detector import detect_social_media
 from ai_summarizer import summarize_company, analyze_company_value
 from scraper import scrape_company_data
+from lead_queries import (
+    SORT_COLUMNS, filter_leads_query, get_lead_changes, get_lead_stats, lead_load_options,
+    leads_version, make_etag, paginate_leads, parse_datetime, parse_fieldset, parse_int, parse_page_size,
+    serialize_lead
+)
+from lead_export import EXPORT_FORMATS, STREAM_WRITERS, iter_export_rows, normalize_export_format, write_xlsx
+from lead_import import import_leads as run_lead_import, iter_import_rows, normalize_import_format
+from enrichment import process_enrichment_tasks
+from scoring import count_social_profiles, merge_weights, rescore_leads, score_lead
+from search import init_search, search as run_search
+from scrape_jobs import (
+    DEFAULT_BATCH_CONCURRENCY, MAX_BATCH_CONCURRENCY, MAX_BATCH_SOURCES, get_batch_scrape, get_scrape_job,
+    normalize_scrape_sources, start_batch_scrape, start_scrape_job, stream_batch_results,
+    stream_job_events
+)
+from scheduler import Scheduler
+from work_queue import JOB_STATUSES, enqueue_job, enqueue_jobs, job_to_dict
+from rescrape import RESCRAPE_WORKERS, rescrape_companies
+from similarity import MAX_BATCH_COMPETITORS, competitor_fields, similarity_scores
+from company_index import (
+    DEFAULT_SIMILAR_COUNT, MAX_SIMILAR_COUNT, backfill_company_vectors, company_index, similar_companies
+)
+from dedup import (
+    MAX_SIMILAR_COMPANIES, dedup_index, duplicate_groups, find_duplicate_company, find_duplicates, merge_companies,
+    source_domain
+)
+from followups import FollowUpDispatcher, due_followups
 
 # Initialize database
 with app.app_context():
     db.create_all()
+    init_search()
+if app.config["PRELOAD_COMPANY_INDEXES"]:
+    dedup_index.start_loading(app)
+    if company_index is not None:
+        company_index.start_loading(app)
 
 # Routes
 @app.route('/')
@@ -54,122 +125,160 @@ def scraper():
     return render_template('scraper.html')
 
 @app.route('/api/leads', methods=['GET'])
+@use_read_replica
 def get_leads():
-    """Get all leads with filtering options"""
-    industry = request.args.get('industry')
-    email_status = request.args.get('email_status')
-    company_size = request.args.get('company_size')
-    
-    # Start with base query
-    query = Lead.query.join(Lead.company)
-    
-    # Apply filters if provided
-    if industry:
-        query = query.filter(Company.industry == industry)
-    if email_status:
-        query = query.filter(Lead.email_status == email_status)
-    if company_size:
-        query = query.filter(Company.size == company_size)
-    
-    leads = query.all()
-    result = []
+    """
+    Get one page of leads with filtering and sorting options.
     
-    for lead in leads:
-        social_media = SocialMedia.query.filter_by(company_id=lead.company.id).first()
-        lead_data = {
-            'id': lead.id,
-            'name': lead.name,
-            'email': lead.email,
-            'email_status': lead.email_status,
-            'score': lead.score,
-            'position': lead.position,
-            'phone': lead.phone,
-            'linkedin_profile': lead.linkedin_profile,
-            'priority': lead.priority,
-            'last_contact_date': lead.last_contact_date.isoformat() if lead.last_contact_date else None,
-            'next_follow_up': lead.next_follow_up.isoformat() if lead.next_follow_up else None,
-            'follow_up_notes': lead.follow_up_notes,
-            'follow_up_type': lead.follow_up_type,
-            'ai_analysis': lead.ai_analysis,
-            'cold_email_template': lead.cold_email_template,
-            'company': {
-                'id': lead.company.id,
-                'name': lead.company.name,
-                'industry': lead.company.industry,
-                'size': lead.company.size,
-                'description': lead.company.description,
-                'summary': lead.company.summary,
-                'website': lead.company.website,
-                'domain': lead.company.domain,
-                'country': lead.company.country,
-                'revenue': lead.company.revenue,
-                'target_audience': lead.company.target_audience,
-                'linkedin_activity': lead.company.linkedin_activity,
-                'owner_name': lead.company.owner_name,
-                'owner_email': lead.company.owner_email,
-                'owner_phone': lead.company.owner_phone,
-                'owner_linkedin': lead.company.owner_linkedin
-            },
-            'social_media': {
-                'linkedin': social_media.linkedin if social_media else None,
-                'twitter': social_media.twitter if social_media else None,
-                'instagram': social_media.instagram if social_media else None,
-                'facebook': social_media.facebook if social_media else None
-            }
-        }
-        result.append(lead_data)
+    Query parameters: industry, email_status, company_size, priority,
+    min_score, max_score, q (name/company search), sort (score, created_at,
+    next_follow_up), order (asc, desc), limit and cursor (from the previous
+    page's next_cursor).
     
-    return jsonify(result)
+    Leads come back in the compact 'list' projection unless view=full or a
+    'fields' list (e.g. fields=name,email,company.industry) is given; the
+    full record is available from /api/lead/<id>.
+    """
+    sort = request.args.get('sort', 'created_at')
+    order = request.args.get('order', 'desc')
+    
+    try:
+        limit = parse_page_size(request.args.get('limit'))
+        fieldset = parse_fieldset(request.args.get('fields'), request.args.get('view', 'list'))
+        query = filter_leads_query(Lead.query.join(Lead.company), request.args)
+        
+        # Answer revalidations from a count/max(updated_at) aggregate
+        # before loading or serializing any rows
+        total, last_updated = leads_version(query)
+        etag = make_etag(total, last_updated, request.query_string.decode())
+        if request.if_none_match.contains(etag):
+            return not_modified(etag)
+        
+        # Only the requested columns are selected; the company join doubles
+        # as the eager load and social media comes in one SELECT ... IN
+        query = query.options(*lead_load_options(fieldset, extra_columns=(sort,) if sort in SORT_COLUMNS else ()))
+        leads, next_cursor = paginate_leads(
+            query, sort=sort, order=order, limit=limit,
+            cursor=request.args.get('cursor')
+        )
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    
+    response = jsonify({
+        'leads': [serialize_lead(lead, fieldset) for lead in leads],
+        'next_cursor': next_cursor,
+        'total': total
+    })
+    return with_etag(response, etag)
+
+# query string -> (expiry timestamp, stats), see LEAD_STATS_CACHE_TTL
+lead_stats_cache = {}
+LEAD_STATS_CACHE_MAX_ENTRIES = 256
+
+@app.route('/api/leads/stats', methods=['GET'])
+@use_read_replica
+def get_leads_stats():
+    """
+    Get dashboard aggregates (totals, score histogram and unscored count,
+    breakdowns by industry/size/email status/priority and follow-up counts)
+    for the leads matching the same filters as /api/leads.
+    """
+    cache_key = request.query_string.decode()
+    ttl = app.config["LEAD_STATS_CACHE_TTL"]
+    cached = lead_stats_cache.get(cache_key)
+    if ttl and cached and cached[0] > time.monotonic():
+        CACHE_REQUESTS.inc(cache='lead_stats', result='hit')
+        return jsonify(cached[1])
+    if ttl:
+        CACHE_REQUESTS.inc(cache='lead_stats', result='miss')
+    
+    try:
+        query = filter_leads_query(Lead.query.join(Lead.company), request.args)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    
+    stats = get_lead_stats(query)
+    
+    if ttl:
+        if len(lead_stats_cache) >= LEAD_STATS_CACHE_MAX_ENTRIES:
+            lead_stats_cache.clear()
+        lead_stats_cache[cache_key] = (time.monotonic() + ttl, stats)
+    
+    return jsonify(stats)
+
+@app.route('/api/leads/changes', methods=['GET'])
+def get_lead_changes_feed():
+    """
+    Get leads created, updated or deleted since a change token.
+    
+    Pass the previous response's next_since as 'since' (omit it to start
+    from the beginning) and keep polling while has_more is true. Accepts
+    'limit', 'view' and 'fields' like /api/leads.
+    """
+    try:
+        limit = parse_page_size(request.args.get('limit'))
+        fieldset = parse_fieldset(request.args.get('fields'), request.args.get('view', 'list'))
+        changes = get_lead_changes(request.args.get('since'), limit=limit, fieldset=fieldset)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    
+    return jsonify(changes)
+
+@app.route('/api/search', methods=['GET'])
+def search_records():
+    """
+    Full-text search over company descriptions, summaries and target
+    audiences, and lead names, positions and AI analysis.
+    
+    Query parameters: q, type (all, company, lead), limit and offset.
+    Results are ranked by relevance and carry an HTML snippet with the
+    matching words in <mark> tags.
+    """
+    query = (request.args.get('q') or '').strip()
+    if not query:
+        return jsonify({
+            'success': False,
+            'message': "'q' is required"
+        }), 400
+    
+    try:
+        limit = parse_page_size(request.args.get('limit'))
+        offset = parse_int(request.args.get('offset') or 0, 'offset')
+        results = run_search(query, request.args.get('type', 'all'), limit, offset)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    
+    return jsonify({'query': query, **results})
 
 @app.route('/api/lead/<int:lead_id>', methods=['GET'])
+@use_read_replica
 def get_lead(lead_id):
     """Get a specific lead by ID"""
-    lead = Lead.query.get_or_404(lead_id)
-    social_media = SocialMedia.query.filter_by(company_id=lead.company.id).first()
-    
-    lead_data = {
-        'id': lead.id,
-        'name': lead.name,
-        'email': lead.email,
-        'email_status': lead.email_status,
-        'score': lead.score,
-        'position': lead.position,
-        'phone': lead.phone,
-        'linkedin_profile': lead.linkedin_profile,
-        'priority': lead.priority,
-        'last_contact_date': lead.last_contact_date.isoformat() if lead.last_contact_date else None,
-        'next_follow_up': lead.next_follow_up.isoformat() if lead.next_follow_up else None,
-        'follow_up_notes': lead.follow_up_notes,
-        'follow_up_type': lead.follow_up_type,
-        'ai_analysis': lead.ai_analysis,
-        'cold_email_template': lead.cold_email_template,
-        'company': {
-            'id': lead.company.id,
-            'name': lead.company.name,
-            'industry': lead.company.industry,
-            'size': lead.company.size,
-            'description': lead.company.description,
-            'summary': lead.company.summary,
-            'website': lead.company.website,
-            'domain': lead.company.domain,
-            'country': lead.company.country,
-            'revenue': lead.company.revenue,
-            'target_audience': lead.company.target_audience,
-            'linkedin_activity': lead.company.linkedin_activity,
-            'owner_name': lead.company.owner_name,
-            'owner_email': lead.company.owner_email,
-            'owner_phone': lead.company.owner_phone,
-            'owner_linkedin': lead.company.owner_linkedin
-        },
-        'social_media': {
-            'linkedin': social_media.linkedin if social_media else None,
-            'twitter': social_media.twitter if social_media else None,
-            'instagram': social_media.instagram if social_media else None,
-            'facebook': social_media.facebook if social_media else None
-        }
-    }
+    version = db.session.query(Lead.updated_at, Company.updated_at) \
+        .join(Lead.company).filter(Lead.id == lead_id).first()
+    if version is None:
+        abort(404)
+    etag = make_etag(lead_id, *version)
+    if request.if_none_match.contains(etag):
+        return not_modified(etag)
     
-    return jsonify(lead_data)
+    lead = Lead.query.options(
+        joinedload(Lead.company).selectinload(Company.social_media)
+    ).filter_by(id=lead_id).first_or_404()
+    
+    return with_etag(jsonify(serialize_lead(lead)), etag)
 
 @app.route('/api/lead/<int:lead_id>', methods=['PUT'])
 def update_lead(lead_id):
@@ -225,15 +334,47 @@ def update_lead(lead_id):
 
 @app.route('/api/leads', methods=['POST'])
 def add_lead():
-    """Add a new lead"""
+    """
+    Add a new lead.
+    
+    The lead joins a stored company with the same normalized name or
+    domain, or the one given as "company_id". If the company only looks
+    similar to stored ones, returns 409 with them under
+    "similar_companies" so the caller can confirm: send "company_id" to
+    use one, or "force": true to store a new company.
+    """
     data = request.json
     
     # Validate email
     email_result = validate_email(data.get('email', ''))
     
-    # Create or get company
+    # Create or get company, so a known company isn't scraped and
+    # summarized again
     company_name = data.get('company_name', '')
-    company = Company.query.filter_by(name=company_name).first()
+    provided_data = data.get('company_data') or {}
+    domain = provided_data.get('domain') or provided_data.get('website')
+    if data.get('company_id'):
+        company = db.session.get(Company, data['company_id'])
+        if not company:
+            return jsonify({
+                'success': False,
+                'message': 'Company not found'
+            }), 404
+    else:
+        company = find_duplicate_company(company_name, domain=domain, exact=True)
+    
+    if not company and not data.get('force') and company_name:
+        similar = find_duplicates(company_name, domain=domain)[:MAX_SIMILAR_COMPANIES]
+        if similar:
+            companies = {c.id: c for c in Company.query.filter(Company.id.in_([match[0] for match in similar]))}
+            return jsonify({
+                'success': False,
+                'message': f'{company_name} looks like a company already in the database',
+                'similar_companies': [
+                    {**stored_company_data(companies[company_id]), 'similarity': round(similarity, 2), 'reason': reason}
+                    for company_id, similarity, reason in similar if company_id in companies
+                ]
+            }), 409
     
     if not company:
         # Use provided company data or scrape company data
@@ -304,7 +445,7 @@ def add_lead():
         analysis_result = analyze_company_value(company_data_for_analysis)
         ai_analysis = analysis_result.get('reasoning', '')
     except Exception as e:
-        logging.error(f"Error generating AI analysis: {e}")
+        logger.error("Error generating AI analysis: %s", e)
     
     # Create lead
     lead = Lead(
@@ -328,71 +469,181 @@ def add_lead():
     
     return jsonify({'success': True, 'id': lead.id})
 
-@app.route('/api/leads/export', methods=['POST'])
+@app.route('/api/leads/export', methods=['GET', 'POST'])
+@use_read_replica
 def export_leads():
-    """Export leads in the specified format"""
-    data = request.json
-    format_type = data.get('format', 'csv')
-    lead_ids = data.get('lead_ids', [])
+    """
+    Stream leads as CSV, NDJSON, JSON or XLSX.
+    
+    Accepts the same filters as /api/leads (query string, or JSON body for
+    POST) plus 'format' and an optional 'lead_ids' list. Rows are read
+    through a server-side cursor and written to the response as they
+    arrive, so memory use doesn't grow with the number of leads.
+    """
+    args = request.args.to_dict()
+    lead_ids = []
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        lead_ids = data.pop('lead_ids', None) or []
+        args.update({key: value for key, value in data.items() if value is not None})
+    
+    try:
+        format_type = normalize_export_format(args.get('format', 'csv'))
+        query = filter_leads_query(Lead.query.join(Lead.company), args)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
     
-    # Get leads to export
     if lead_ids:
-        leads = Lead.query.filter(Lead.id.in_(lead_ids)).all()
-    else:
-        leads = Lead.query.all()
-    
-    # Format leads data
-    leads_data = []
-    for lead in leads:
-        social_media = SocialMedia.query.filter_by(company_id=lead.company.id).first()
-        lead_data = {
-            'id': lead.id,
-            'name': lead.name,
-            'email': lead.email,
-            'email_status': lead.email_status,
-            'score': lead.score,
-            'position': lead.position,
-            'phone': lead.phone,
-            'linkedin_profile': lead.linkedin_profile,
-            'priority': lead.priority,
-            'last_contact_date': lead.last_contact_date.isoformat() if lead.last_contact_date else None,
-            'next_follow_up': lead.next_follow_up.isoformat() if lead.next_follow_up else None,
-            'follow_up_notes': lead.follow_up_notes,
-            'follow_up_type': lead.follow_up_type,
-            'company_name': lead.company.name,
-            'industry': lead.company.industry,
-            'company_size': lead.company.size,
-            'company_description': lead.company.description,
-            'company_summary': lead.company.summary,
-            'company_website': lead.company.website,
-            'company_domain': lead.company.domain,
-            'company_country': lead.company.country,
-            'owner_name': lead.company.owner_name,
-            'owner_email': lead.company.owner_email,
-            'owner_phone': lead.company.owner_phone,
-            'owner_linkedin': lead.company.owner_linkedin,
+        query = query.filter(Lead.id.in_(lead_ids))
+    query = query.options(
+        contains_eager(Lead.company).selectinload(Company.social_media)
+    ).order_by(Lead.id)
+    
+    mimetype, extension = EXPORT_FORMATS[format_type]
+    filename = f"leads_export_{datetime.utcnow().strftime('%Y-%m-%d')}.{extension}"
+    
+    if format_type == 'xlsx':
+        return send_file(
+            write_xlsx(iter_export_rows(query)),
+            mimetype=mimetype,
+            as_attachment=True,
+            download_name=filename
+        )
+    
+    writer = STREAM_WRITERS[format_type]
+    return Response(
+        stream_with_context(writer(iter_export_rows(query))),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+@app.route('/api/leads/import', methods=['POST'])
+def import_leads():
+    """
+    Bulk import leads from a CSV or NDJSON upload.
+    
+    Send the file as multipart form field 'file', or as the raw request
+    body with a text/csv or application/x-ndjson Content-Type. Columns match
+    the export (name, email, position, phone, linkedin_profile, priority,
+    company_name, company_domain, company_website, industry, company_size,
+    company_country). Existing leads are updated by email. New companies are
+    queued for enrichment instead of being scraped during the import; set
+    check_deliverability=false to skip the DNS check of email domains.
+    """
+    upload = request.files.get('file')
+    try:
+        if upload:
+            format_type = normalize_import_format(request.args.get('format'), upload.filename, upload.mimetype)
+            stream = upload.stream
+        else:
+            format_type = normalize_import_format(request.args.get('format'), mimetype=request.mimetype)
+            stream = request.stream
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    
+    check_deliverability = request.args.get('check_deliverability', 'true').lower() not in ('false', '0', 'no')
+    
+    try:
+        summary = run_lead_import(iter_import_rows(stream, format_type), check_deliverability=check_deliverability)
+    except (UnicodeDecodeError, csv.Error) as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': f'Could not read the uploaded file: {e}'
+        }), 400
+    
+    return jsonify({'success': True, **summary})
+
+@app.route('/api/leads/rescore', methods=['POST'])
+def rescore_leads_endpoint():
+    """
+    Recompute lead scores in bulk.
+    
+    The JSON body accepts the same filters as /api/leads, 'dry_run' and
+    'weights'. A dry run returns the current and rescored score
+    distributions without saving; with 'weights' it shows what those
+    weights (merged over the configured ones) would do. Saved scores always
+    use the configured LEAD_SCORING_WEIGHTS, so they stay consistent with
+    newly added leads.
+    """
+    data = request.get_json(silent=True) or {}
+    dry_run = bool(data.pop('dry_run', False))
+    overrides = data.pop('weights', None)
+    
+    try:
+        weights = merge_weights(app.config["LEAD_SCORING_WEIGHTS"])
+        if overrides:
+            weights = merge_weights({**app.config["LEAD_SCORING_WEIGHTS"], **overrides})
+            if not dry_run:
+                raise ValueError('Custom weights can only be used with dry_run; '
+                                 'set LEAD_SCORING_WEIGHTS to change the saved scores')
+        query = filter_leads_query(Lead.query.join(Lead.company), data)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    
+    result = rescore_leads(query, weights, dry_run=dry_run)
+    return jsonify({'success': True, **result})
+
+def stored_company_data(company):
+    """A stored company in the shape of scraped company data"""
+    social_media = SocialMedia.query.filter_by(company_id=company.id).first()
+    return {
+        'id': company.id,
+        'name': company.name,
+        'industry': company.industry,
+        'size': company.size,
+        'description': company.description,
+        'summary': company.summary,
+        'website': company.website,
+        'domain': company.domain,
+        'country': company.country,
+        'revenue': company.revenue,
+        'target_audience': company.target_audience,
+        'owner_name': company.owner_name,
+        'owner_email': company.owner_email,
+        'owner_phone': company.owner_phone,
+        'owner_linkedin': company.owner_linkedin,
+        'social_media': {
             'linkedin': social_media.linkedin if social_media else None,
             'twitter': social_media.twitter if social_media else None,
             'instagram': social_media.instagram if social_media else None,
             'facebook': social_media.facebook if social_media else None
         }
-        leads_data.append(lead_data)
-    
-    # Return data in requested format
-    if format_type == 'json':
-        return jsonify(leads_data)
-    else:
-        # For CSV and Excel, return the data as JSON for client-side processing
-        return jsonify({
-            'format': format_type,
-            'data': leads_data
-        })
+    }
 
 @app.route('/api/scrape', methods=['POST'])
 def scrape_leads():
-    """Scrape leads from a source"""
-    data = request.json
-    source_url = data.get('source_url')
+    """
+    Start scraping a company website or name in the background.
+    
+    Returns 409 with the stored company's data under "company" if the
+    source matches a company already stored (by domain or normalized or
+    similar name), unless "force" is true. Otherwise returns 202 with a
+    job id straight away. Follow progress with GET /api/scrape/<job_id>
+    or the Server-Sent Events stream at /api/scrape/<job_id>/events,
+    which reports each stage (website found, text extracted, company
+    info, summary ready, socials found) and ends with a 'done' event
+    carrying the company data, or 'failed'.
+    
+    Jobs live in the memory of the process that runs them, so with
+    several nodes behind a load balancer these requests need sticky
+    sessions; POST /api/jobs queues scrapes any node can report on.
+    
+    Each scrape is traced; GET /api/scrape/<job_id>?timings=true adds
+    its span timeline (search, downloads, extraction, social probing,
+    OpenAI calls) with each span's duration and outcome.
+    """
+    data = request.get_json(silent=True) or {}
+    source_url = (data.get('source_url') or '').strip()
     
     if not source_url:
         return jsonify({
@@ -400,58 +651,413 @@ def scrape_leads():
             'message': 'No source URL or company name provided'
         }), 400
     
+    # Don't scrape (and summarize) a company we already have, unless forced
+    existing = None if data.get('force') else find_duplicate_company(source_url, domain=source_domain(source_url))
+    if existing:
+        return jsonify({
+            'success': False,
+            'message': f'{existing.name} is already in the database',
+            'existing_company': {'id': existing.id, 'name': existing.name, 'website': existing.website},
+            'company': stored_company_data(existing)
+        }), 409
+    
+    logger.info("Starting scraping for: %s", source_url)
+    job = start_scrape_job(source_url)
+    
+    status_url = url_for('get_scrape_job_status', job_id=job.id)
+    response = jsonify({
+        'success': True,
+        'message': f'Scraping started for {source_url}',
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': status_url,
+        'events_url': url_for('stream_scrape_job_events', job_id=job.id)
+    })
+    response.status_code = 202
+    response.headers['Location'] = status_url
+    return response
+
+@app.route('/api/scrape/<job_id>', methods=['GET'])
+def get_scrape_job_status(job_id):
+    """
+    Get a scrape job's status, progress events and (when done) company
+    data, plus its span timings with ?timings=true
+    """
+    job = get_scrape_job(job_id)
+    if not job:
+        return jsonify({
+            'success': False,
+            'message': 'Scrape job not found'
+        }), 404
+    
+    timings = request.args.get('timings', 'false').lower() in ('true', '1', 'yes')
+    return jsonify({'success': True, **job.to_dict(timings=timings)})
+
+@app.route('/api/scrape/<job_id>/events', methods=['GET'])
+def stream_scrape_job_events(job_id):
+    """Stream a scrape job's progress as Server-Sent Events"""
+    job = get_scrape_job(job_id)
+    if not job:
+        return jsonify({
+            'success': False,
+            'message': 'Scrape job not found'
+        }), 404
+    
+    last_event_id = request.headers.get('Last-Event-ID', type=int) or 0
+    return Response(
+        stream_with_context(stream_job_events(job, last_event_id)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/scrape/batch', methods=['POST'])
+def start_batch_scrape_endpoint():
+    """
+    Scrape a list of websites and/or company names in the background.
+    
+    Send JSON {"sources": [...], "concurrency": 8}, or a text/plain body
+    with one source per line. Sources are normalized and deduplicated by
+    domain (or name), then scraped with bounded concurrency; one failing
+    source doesn't stop the others. Returns 202 with the batch id and its
+    status and results URLs. With "timings": true (or ?timings=true)
+    each result carries its scrape's span timings.
+    """
+    if request.mimetype == 'text/plain':
+        sources = request.get_data(as_text=True).splitlines()
+        concurrency = request.args.get('concurrency')
+        timings = request.args.get('timings', 'false').lower() in ('true', '1', 'yes')
+    else:
+        data = request.get_json(silent=True) or {}
+        sources = data.get('sources')
+        concurrency = data.get('concurrency')
+        timings = bool(data.get('timings'))
+    
+    if not isinstance(sources, list) or not sources:
+        return jsonify({
+            'success': False,
+            'message': "Provide a non-empty 'sources' list of URLs or company names"
+        }), 400
+    
     try:
-        logging.info(f"Starting scraping for: {source_url}")
-        # Get company data from the scraper
-        company_data = scrape_company_data(source_url)
-        
-        if not company_data or not company_data.get('name'):
-            return jsonify({
-                'success': False,
-                'message': 'Failed to scrape company data',
-                'error': 'No company information found'
-            }), 404
-        
-        logging.info(f"Successfully scraped data for {company_data.get('name')}")
-        
-        # Generate a summary if we have a description
-        if company_data.get('description'):
-            try:
-                company_data['summary'] = summarize_company(company_data['description'])
-                logging.info(f"Generated summary for {company_data.get('name')}")
-            except Exception as e:
-                logging.error(f"Error generating summary: {e}")
-                company_data['summary'] = "Summary generation failed."
-        
-        # Detect social media profiles
-        try:
-            if not company_data.get('social_media') or not any(company_data.get('social_media', {}).values()):
-                social_media_data = detect_social_media(company_data.get('name', ''))
-                company_data['social_media'] = social_media_data
-                logging.info(f"Detected social media for {company_data.get('name')}")
-        except Exception as e:
-            logging.error(f"Error detecting social media: {e}")
-            company_data['social_media'] = {
-                'linkedin': None,
-                'twitter': None,
-                'instagram': None,
-                'facebook': None
+        concurrency = parse_int(concurrency, 'concurrency') if concurrency not in (None, '') else DEFAULT_BATCH_CONCURRENCY
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    concurrency = max(1, min(concurrency, MAX_BATCH_CONCURRENCY))
+    
+    sources, duplicates, invalid = normalize_scrape_sources(sources)
+    if not sources:
+        return jsonify({
+            'success': False,
+            'message': 'No valid sources to scrape',
+            'invalid': invalid
+        }), 400
+    if len(sources) > MAX_BATCH_SOURCES:
+        return jsonify({
+            'success': False,
+            'message': f'A batch can have at most {MAX_BATCH_SOURCES} sources after deduplication'
+        }), 400
+    
+    batch = start_batch_scrape(sources, concurrency, timings=timings)
+    logger.info("Started batch scrape %s with %s sources", batch.id, len(sources))
+    
+    status_url = url_for('get_batch_scrape_status', batch_id=batch.id)
+    response = jsonify({
+        'success': True,
+        'batch_id': batch.id,
+        'total': len(sources),
+        'duplicates': duplicates,
+        'invalid': invalid,
+        'concurrency': concurrency,
+        'status_url': status_url,
+        'results_url': url_for('get_batch_scrape_results', batch_id=batch.id)
+    })
+    response.status_code = 202
+    response.headers['Location'] = status_url
+    return response
+
+@app.route('/api/scrape/batch/<batch_id>', methods=['GET'])
+def get_batch_scrape_status(batch_id):
+    """Get a batch scrape's progress counts and failures"""
+    batch = get_batch_scrape(batch_id)
+    if not batch:
+        return jsonify({
+            'success': False,
+            'message': 'Batch scrape not found'
+        }), 404
+    
+    return jsonify({'success': True, **batch.to_dict()})
+
+@app.route('/api/scrape/batch/<batch_id>', methods=['DELETE'])
+def cancel_batch_scrape(batch_id):
+    """Cancel a batch scrape; scrapes already running finish, the rest are skipped"""
+    batch = get_batch_scrape(batch_id)
+    if not batch:
+        return jsonify({
+            'success': False,
+            'message': 'Batch scrape not found'
+        }), 404
+    
+    batch.cancelled = True
+    return jsonify({'success': True, **batch.to_dict()})
+
+@app.route('/api/scrape/batch/<batch_id>/results', methods=['GET'])
+def get_batch_scrape_results(batch_id):
+    """
+    Download a batch's results as NDJSON, one line per source in completion
+    order: {"source", "status": "done", "company_data"} or
+    {"source", "status": "failed", "error"}.
+    
+    The response streams results as they complete until the batch
+    finishes; follow=false returns only the results available now. Use
+    offset to skip results already downloaded.
+    """
+    batch = get_batch_scrape(batch_id)
+    if not batch:
+        return jsonify({
+            'success': False,
+            'message': 'Batch scrape not found'
+        }), 404
+    
+    try:
+        offset = parse_int(request.args.get('offset') or 0, 'offset')
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    follow = request.args.get('follow', 'true').lower() not in ('false', '0', 'no')
+    
+    return Response(
+        stream_with_context(stream_batch_results(batch, max(offset, 0), follow)),
+        mimetype='application/x-ndjson',
+        headers={
+            'Content-Disposition': f'attachment; filename="scrape_batch_{batch.id}.ndjson"',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+@app.route('/api/jobs', methods=['POST'])
+def create_jobs():
+    """
+    Queue background jobs for the worker processes (see worker.py).
+    
+    Send JSON {"kind": "scrape" | "enrich" | "competitors", "payload": {...}}
+    for one job or "payloads": [...] for several. Scrape payloads take
+    "source" (URL or company name) and optionally "save_lead"; enrich
+    payloads take "company_id"; competitors payloads take "company_id"
+    and a "competitors" list (see /api/competitors/batch). Optional
+    "max_attempts" (default 5) bounds retries.
+    """
+    data = request.get_json(silent=True) or {}
+    payloads = data.get('payloads')
+    if payloads is None and 'payload' in data:
+        payloads = [data['payload']]
+    
+    if not isinstance(payloads, list) or not payloads:
+        return jsonify({
+            'success': False,
+            'message': "Provide a 'payload' object or a non-empty 'payloads' list"
+        }), 400
+    
+    try:
+        max_attempts = parse_int(data.get('max_attempts', 5), 'max_attempts')
+        if max_attempts < 1:
+            raise ValueError("'max_attempts' must be at least 1")
+        jobs = enqueue_jobs(data.get('kind'), payloads, max_attempts=max_attempts)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    
+    return jsonify({
+        'success': True,
+        'job_ids': [job.id for job in jobs],
+        'status_urls': [url_for('get_job', job_id=job.id) for job in jobs]
+    }), 202
+
+@app.route('/api/jobs', methods=['GET'])
+def get_job_counts():
+    """Get the number of queued jobs per status, optionally for one kind"""
+    query = db.session.query(Job.status, db.func.count(Job.id)).group_by(Job.status)
+    if request.args.get('kind'):
+        query = query.filter(Job.kind == request.args['kind'])
+    counts = dict.fromkeys(JOB_STATUSES, 0)
+    counts.update(dict(query.all()))
+    
+    return jsonify({'success': True, 'counts': counts})
+
+@app.route('/api/jobs/<int:job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get a queued job's status, attempts, result or last error"""
+    job = db.session.get(Job, job_id)
+    if not job:
+        return jsonify({
+            'success': False,
+            'message': 'Job not found'
+        }), 404
+    
+    return jsonify({'success': True, 'job': job_to_dict(job)})
+
+@app.route('/api/companies/duplicates', methods=['GET'])
+def get_duplicate_companies():
+    """
+    Get groups of companies that look like duplicates: same domain or
+    normalized name, or similar names/descriptions by MinHash. Groups are
+    ordered by their lowest company id; 'limit' caps how many are returned
+    (default 50).
+    """
+    try:
+        limit = parse_page_size(request.args.get('limit') or 50)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    
+    groups = duplicate_groups()
+    page = groups[:limit]
+    companies = {
+        company.id: company
+        for company in Company.query.filter(Company.id.in_([company_id for group in page for company_id in group]))
+    }
+    
+    return jsonify({
+        'success': True,
+        'total_groups': len(groups),
+        'groups': [
+            [
+                {
+                    'id': company_id,
+                    'name': companies[company_id].name,
+                    'domain': companies[company_id].domain,
+                    'website': companies[company_id].website
+                }
+                for company_id in group
+                if company_id in companies
+            ]
+            for group in page
+        ]
+    })
+
+@app.route('/api/companies/<int:company_id>/duplicates', methods=['GET'])
+def get_company_duplicates(company_id):
+    """Get the companies that look like duplicates of one company, most similar first"""
+    company = db.session.get(Company, company_id)
+    if not company:
+        return jsonify({
+            'success': False,
+            'message': 'Company not found'
+        }), 404
+    
+    matches = find_duplicates(company.name, company.domain, company.website, company.description, exclude=company.id)
+    companies = {
+        duplicate.id: duplicate
+        for duplicate in Company.query.filter(Company.id.in_([duplicate_id for duplicate_id, _, _ in matches]))
+    }
+    
+    return jsonify({
+        'success': True,
+        'company_id': company_id,
+        'duplicates': [
+            {
+                'id': duplicate_id,
+                'name': companies[duplicate_id].name,
+                'domain': companies[duplicate_id].domain,
+                'website': companies[duplicate_id].website,
+                'similarity': round(similarity, 2),
+                'reason': reason
             }
-        
+            for duplicate_id, similarity, reason in matches
+            if duplicate_id in companies
+        ]
+    })
+
+@app.route('/api/companies/merge', methods=['POST'])
+def merge_duplicate_companies():
+    """
+    Merge duplicate companies. Send JSON {"target_id": 1, "source_ids":
+    [2, 3]}: the sources' leads and analyses move to the target, which
+    keeps its own details and fills any gaps from the sources, and the
+    sources are deleted.
+    """
+    data = request.get_json(silent=True) or {}
+    source_ids = data.get('source_ids')
+    
+    if not isinstance(source_ids, list) or not source_ids:
         return jsonify({
-            'success': True,
-            'message': f'Successfully scraped data for {company_data.get("name")}',
-            'company_data': company_data
-        })
-        
-    except Exception as e:
-        logging.error(f"Error during scraping: {e}")
-        logging.debug(f"Scraping error details: {traceback.format_exc()}")
+            'success': False,
+            'message': "Provide a 'target_id' and a non-empty 'source_ids' list"
+        }), 400
+    
+    try:
+        target_id = parse_int(data.get('target_id'), 'target_id')
+        source_ids = [parse_int(source_id, 'source_ids') for source_id in source_ids]
+        result = merge_companies(target_id, source_ids)
+    except ValueError as e:
+        db.session.rollback()
         return jsonify({
             'success': False,
-            'message': 'Error during scraping process',
-            'error': str(e)
-        }), 500
+            'message': str(e)
+        }), 400
+    
+    return jsonify({'success': True, 'target_id': target_id, **result})
+
+@app.route('/api/companies/<int:company_id>/similar', methods=['GET'])
+def get_similar_companies(company_id):
+    """
+    Get the k companies most similar to a company (default 10, at most
+    100), by cosine similarity of their hashed text embeddings, from an
+    in-memory approximate nearest-neighbour index.
+    """
+    if company_index is None:
+        return jsonify({
+            'success': False,
+            'message': 'Finding similar companies requires NumPy'
+        }), 501
+    
+    try:
+        k = parse_int(request.args.get('k') or DEFAULT_SIMILAR_COUNT, 'k')
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    k = max(1, min(k, MAX_SIMILAR_COUNT))
+    
+    company = db.session.get(Company, company_id)
+    if not company:
+        return jsonify({
+            'success': False,
+            'message': 'Company not found'
+        }), 404
+    
+    neighbours = similar_companies(company_id, k) or []
+    companies = {
+        neighbour.id: neighbour
+        for neighbour in Company.query.filter(Company.id.in_([neighbour_id for neighbour_id, _ in neighbours]))
+    }
+    
+    return jsonify({
+        'success': True,
+        'company_id': company_id,
+        'similar': [
+            {
+                'id': neighbour_id,
+                'name': companies[neighbour_id].name,
+                'industry': companies[neighbour_id].industry,
+                'size': companies[neighbour_id].size,
+                'country': companies[neighbour_id].country,
+                'website': companies[neighbour_id].website,
+                'similarity': round(similarity, 4)
+            }
+            for neighbour_id, similarity in neighbours
+            if neighbour_id in companies
+        ]
+    })
 
 @app.route('/api/competitors/<int:company_id>', methods=['GET'])
 def get_competitors(company_id):
@@ -508,47 +1114,8 @@ def add_competitor():
                 'error': 'No competitor information found'
             }), 404
         
-        # Calculate similarity score (simple implementation)
-        similarity_score = 0
-        if company.industry == competitor_data.get('industry'):
-            similarity_score += 30
-        if company.size == competitor_data.get('size'):
-            similarity_score += 20
-        if company.country == competitor_data.get('country'):
-            similarity_score += 20
-        # Add additional 30 points based on target audience similarity
-        similarity_score += 30
-        
-        # Generate AI comparison
-        try:
-            ai_comparison = f"Both {company.name} and {competitor_data.get('name')} operate in the {company.industry} industry. "
-            if company.size == competitor_data.get('size'):
-                ai_comparison += f"They are similar in size ({company.size}). "
-            else:
-                ai_comparison += f"While {company.name} is {company.size}, {competitor_data.get('name')} is {competitor_data.get('size')}. "
-            
-            # Add strengths and weaknesses
-            strengths = f"{competitor_data.get('name')} has a strong online presence." if any(competitor_data.get('social_media', {}).values()) else f"{competitor_data.get('name')} has limited online visibility."
-            weaknesses = "Further analysis required to determine specific weaknesses."
-        except Exception as e:
-            logging.error(f"Error generating AI comparison: {e}")
-            ai_comparison = "Comparison not available."
-            strengths = "Not determined."
-            weaknesses = "Not determined."
-        
-        # Create competitor analysis
-        competitor = CompetitorAnalysis(
-            company_id=company_id,
-            competitor_name=competitor_data.get('name', competitor_name),
-            competitor_website=competitor_data.get('website', ''),
-            competitor_industry=competitor_data.get('industry', 'Unknown'),
-            competitor_size=competitor_data.get('size', 'Unknown'),
-            market_position='challenger',  # Default position
-            strengths=strengths,
-            weaknesses=weaknesses,
-            similarity_score=similarity_score,
-            ai_comparison=ai_comparison
-        )
+        similarity_score = similarity_scores(company, [competitor_data])[0]
+        competitor = CompetitorAnalysis(**competitor_fields(company, competitor_data, similarity_score))
         
         db.session.add(competitor)
         db.session.commit()
@@ -560,14 +1127,84 @@ def add_competitor():
         })
         
     except Exception as e:
-        logging.error(f"Error adding competitor: {e}")
-        logging.debug(f"Error details: {traceback.format_exc()}")
+        logger.error("Error adding competitor: %s", e)
+        logger.debug("Error details", exc_info=True)
         return jsonify({
             'success': False,
             'message': 'Error adding competitor',
             'error': str(e)
         }), 500
 
+@app.route('/api/competitors/batch', methods=['POST'])
+def add_competitors_batch():
+    """
+    Queue a job that scrapes many competitor candidates for a company and
+    stores them with similarity scores.
+    
+    Send JSON {"company_id": 1, "competitors": [names or URLs],
+    "concurrency": 8}. Candidates are deduplicated here; a worker process
+    (see worker.py) scrapes them concurrently, scores them against the
+    company in one pass and skips ones already recorded as its
+    competitors. Returns 202 with the job id and its status URL; the
+    finished job's result lists the added competitors, most similar
+    first, and the candidates that failed.
+    """
+    data = request.get_json(silent=True) or {}
+    sources = data.get('competitors')
+    
+    if not data.get('company_id') or not isinstance(sources, list) or not sources:
+        return jsonify({
+            'success': False,
+            'message': "Company ID and a non-empty 'competitors' list are required"
+        }), 400
+    
+    try:
+        company_id = parse_int(data['company_id'], 'company_id')
+        concurrency = data.get('concurrency')
+        concurrency = parse_int(concurrency, 'concurrency') if concurrency not in (None, '') else DEFAULT_BATCH_CONCURRENCY
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    concurrency = max(1, min(concurrency, MAX_BATCH_CONCURRENCY))
+    
+    company = db.session.get(Company, company_id)
+    if not company:
+        return jsonify({
+            'success': False,
+            'message': 'Company not found'
+        }), 404
+    
+    sources, duplicates, invalid = normalize_scrape_sources(sources)
+    if not sources:
+        return jsonify({
+            'success': False,
+            'message': 'No valid competitors to scrape',
+            'invalid': invalid
+        }), 400
+    if len(sources) > MAX_BATCH_COMPETITORS:
+        return jsonify({
+            'success': False,
+            'message': f'A batch can have at most {MAX_BATCH_COMPETITORS} competitors'
+        }), 400
+    
+    job = enqueue_job('competitors', {'company_id': company.id, 'competitors': sources, 'concurrency': concurrency})
+    logger.info("Queued competitor job %s for company %s with %s candidates", job.id, company.id, len(sources))
+    
+    status_url = url_for('get_job', job_id=job.id)
+    response = jsonify({
+        'success': True,
+        'job_id': job.id,
+        'total': len(sources),
+        'duplicates': duplicates,
+        'invalid': invalid,
+        'status_url': status_url
+    })
+    response.status_code = 202
+    response.headers['Location'] = status_url
+    return response
+
 @app.route('/api/generate-email/<int:lead_id>', methods=['GET'])
 def generate_email(lead_id):
     """Generate a cold email template for a lead"""
@@ -619,7 +1256,7 @@ Looking forward to hearing from you,
         })
         
     except Exception as e:
-        logging.error(f"Error generating email template: {e}")
+        logger.error("Error generating email template: %s", e)
         return jsonify({
             'success': False,
             'message': 'Error generating email template',
@@ -647,7 +1284,7 @@ def linkedin_connect(lead_id):
         })
         
     except Exception as e:
-        logging.error(f"Error generating LinkedIn connection: {e}")
+        logger.error("Error generating LinkedIn connection: %s", e)
         return jsonify({
             'success': False,
             'message': 'Error generating LinkedIn connection message',
@@ -667,6 +1304,13 @@ def schedule_followup(lead_id):
             'success': False,
             'message': 'Follow-up date is required'
         }), 400
+    try:
+        follow_up_date = parse_datetime(follow_up_date, 'follow_up_date')
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
     
     try:
         lead = Lead.query.get_or_404(lead_id)
@@ -684,13 +1328,60 @@ def schedule_followup(lead_id):
         })
         
     except Exception as e:
-        logging.error(f"Error scheduling follow-up: {e}")
+        logger.error("Error scheduling follow-up: %s", e)
         return jsonify({
             'success': False,
             'message': 'Error scheduling follow-up',
             'error': str(e)
         }), 500
 
+@app.route('/api/followups', methods=['GET'])
+def get_due_followups():
+    """
+    Get one page of leads with a follow-up due, soonest first.
+    
+    Query parameters: due_before (ISO 8601, default now), type (follow-up
+    type, e.g. email), limit and cursor (from the previous page's
+    next_cursor), plus fields / view as for /api/leads.
+    """
+    try:
+        due_before = request.args.get('due_before')
+        due_before = parse_datetime(due_before, 'due_before') if due_before else datetime.utcnow()
+        limit = parse_page_size(request.args.get('limit'))
+        fieldset = parse_fieldset(request.args.get('fields'), request.args.get('view', 'list'))
+        followups, next_cursor = due_followups(
+            due_before, follow_up_type=request.args.get('type'), limit=limit,
+            cursor=request.args.get('cursor'), fieldset=fieldset
+        )
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    
+    return jsonify({
+        'followups': followups,
+        'due_before': due_before.isoformat(),
+        'next_cursor': next_cursor
+    })
+
+@app.route('/api/db/pool', methods=['GET'])
+def get_pool_stats():
+    """Connection pool occupancy and checkout wait times for the primary and any replica"""
+    return jsonify({
+        'primary' if key is None else key: pool_stats(engine)
+        for key, engine in db.engines.items()
+    })
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Counters and latency histograms in the Prometheus text format: scrape
+    stages, page fetches by host, text extraction by method, AI requests,
+    DB commits, connection pools, cache hit rates and API request latency
+    """
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/analyze-lead/<int:lead_id>', methods=['GET'])
 def analyze_lead(lead_id):
     """Analyze a lead using AI"""
@@ -731,13 +1422,23 @@ def analyze_lead(lead_id):
         })
         
     except Exception as e:
-        logging.error(f"Error analyzing lead: {e}")
+        logger.error("Error analyzing lead: %s", e)
         return jsonify({
             'success': False,
             'message': 'Error analyzing lead',
             'error': str(e)
         }), 500
 
+def with_etag(response, etag):
+    """Attach an ETag and ask clients to revalidate it on every use"""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def not_modified(etag):
+    """Empty 304 response for a matching If-None-Match"""
+    return with_etag(Response(status=304), etag)
+
 def calculate_lead_score(email_status, company):
     """
     Calculate a lead score based on various factors:
@@ -746,38 +1447,100 @@ def calculate_lead_score(email_status, company):
     - Social media presence (0-20 points)
     - Industry relevance (0-20 points)
     """
-    score = 0
-    
-    # Email status score
-    if email_status == 'valid':
-        score += 40
-    elif email_status == 'risky':
-        score += 20
-    
-    # Company size score
-    if company.size == 'Enterprise':
-        score += 20
-    elif company.size == 'Mid-Market':
-        score += 15
-    elif company.size == 'SMB':
-        score += 10
-    
-    # Social media presence score
     social_media = SocialMedia.query.filter_by(company_id=company.id).first()
-    if social_media:
-        presence_count = sum(1 for link in [
-            social_media.linkedin, 
-            social_media.twitter, 
-            social_media.instagram, 
-            social_media.facebook
-        ] if link)
-        score += min(presence_count * 5, 20)
-    
-    # Industry relevance score (simplified)
-    relevant_industries = ['Technology', 'Finance', 'Healthcare', 'Retail']
-    if company.industry in relevant_industries:
-        score += 20
-    else:
-        score += 10
+    return score_lead(email_status, company.size, company.industry, count_social_profiles(social_media))
+
+@app.cli.command('import-leads')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'format_type', help='csv or ndjson (default: from the file extension)')
+@click.option('--skip-dns-check', is_flag=True, help="Don't check email domains' MX records")
+def import_leads_command(path, format_type, skip_dns_check):
+    """Bulk import leads from a CSV or NDJSON file"""
+    try:
+        format_type = normalize_import_format(format_type, path)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='--format')
+    
+    with open(path, 'rb') as stream:
+        summary = run_lead_import(iter_import_rows(stream, format_type), check_deliverability=not skip_dns_check)
     
-    return score
+    click.echo(
+        f"{summary['processed']} rows: {summary['inserted']} inserted, {summary['updated']} updated, "
+        f"{summary['skipped']} skipped, {summary['duplicates']} duplicates; "
+        f"{summary['companies_created']} companies created and queued for enrichment"
+    )
+    for error in summary['errors']:
+        click.echo(f"line {error['line']}: {error['message']}", err=True)
+
+@app.cli.command('enrich-companies')
+@click.option('--limit', default=50, show_default=True, help='Maximum number of companies to enrich')
+def enrich_companies_command(limit):
+    """Run queued company enrichment (scraping, summaries, social media)"""
+    counts = process_enrichment_tasks(limit)
+    click.echo(f"{counts['done']} companies enriched, {counts['failed']} failed")
+
+@app.cli.command('rescrape-companies')
+@click.option('--force', is_flag=True, help='Re-extract every company, even if its site is unchanged')
+@click.option('--workers', default=RESCRAPE_WORKERS, show_default=True, help='Concurrent site downloads')
+def rescrape_companies_command(force, workers):
+    """Refresh companies whose website changed since the last scrape"""
+    result = rescrape_companies(force=force, workers=workers)
+    click.echo(
+        f"{result['checked']} companies: {result['skipped']} unchanged, "
+        f"{result['refreshed']} refreshed, {result['failed']} failed"
+    )
+    for error in result['errors']:
+        click.echo(f"  {error['name']} ({error['company_id']}): {error['error']}", err=True)
+
+@app.cli.command('index-companies')
+@click.option('--rebuild', is_flag=True, help='Recompute every vector, not just missing ones')
+def index_companies_command(rebuild):
+    """Store similar-companies vectors for companies that don't have one"""
+    if company_index is None:
+        raise click.ClickException('Finding similar companies requires NumPy')
+    if rebuild:
+        db.session.query(CompanyVector).delete()
+        db.session.commit()
+    click.echo(f"{backfill_company_vectors()} companies indexed")
+
+@app.cli.command('rescore-leads')
+@click.option('--dry-run', is_flag=True, help='Show the new score distribution without saving')
+def rescore_leads_command(dry_run):
+    """Recompute every lead's score with the configured weights"""
+    result = rescore_leads(Lead.query.join(Lead.company), dry_run=dry_run)
+    rescored = result['rescored']
+    click.echo(
+        f"{result['count']} leads, {result['changed']} scores {'would change' if dry_run else 'changed'}; "
+        f"mean {result['current']['mean']} -> {rescored['mean']}"
+    )
+    for bucket in rescored['histogram']:
+        click.echo(f"{bucket['min']:>3}-{bucket['max']:<3} {bucket['count']}")
+
+@app.cli.command('run-followups')
+@click.option('--once', is_flag=True, help='Send the reminders due now and exit')
+def run_followups_command(once):
+    """Send follow-up reminders as they come due"""
+    dispatcher = FollowUpDispatcher(app)
+    if once:
+        click.echo(f"{dispatcher.dispatch()} follow-up reminders sent")
+        return
+
+    try:
+        dispatcher.run_forever()
+    except KeyboardInterrupt:
+        dispatcher.stop()
+
+@app.cli.command('run-scheduler')
+@click.option('--once', is_flag=True, help='Run the schedules due now, wait for them and exit')
+def run_scheduler_command(once):
+    """Run active auto-scraper schedules as they come due"""
+    scheduler = Scheduler(app)
+    if once:
+        click.echo(f"{scheduler.poll()} schedule runs started")
+        scheduler.stop()
+        return
+
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        scheduler.stop(wait=False)
@@ -0,0 +1,279 @@
+import argparse
+import json
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import scraper  # noqa: E402
+import social_media_detector  # noqa: E402
+from logging_config import configure_logging  # noqa: E402
+from server import CorpusServer, LocalRouteAdapter  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+# Word stems for the benchmark's company names, numbered to make them unique
+NAME_STEMS = ['northwind', 'bluepeak', 'cobalt', 'harbor', 'lumen', 'granite', 'summit', 'foundry',
+              'meridian', 'quarry', 'tidewater', 'ironwood', 'keystone', 'redfern', 'silverline', 'oakmont']
+
+# Metrics compared against a baseline, and whether higher is better
+COMPARED_METRICS = {
+    'companies_per_sec': True,
+    'p50_ms': False,
+    'p99_ms': False,
+    'peak_rss_mb': False,
+}
+
+def company_sources(count, sources):
+    """
+    Deterministic scrape sources for the benchmark companies
+
+    Args:
+        count (int): Number of companies
+        sources (str): 'url' (homepage URLs), 'about' (about page URLs),
+            'name' (names to search for) or 'mixed' (all three in turn)
+
+    Returns:
+        list: (company name, scrape source) pairs
+    """
+    kinds = ['url', 'about', 'name'] if sources == 'mixed' else [sources]
+    companies = []
+    for i in range(count):
+        slug = f'{NAME_STEMS[i % len(NAME_STEMS)]}{i // len(NAME_STEMS)}'
+        kind = kinds[i % len(kinds)]
+        if kind == 'url':
+            source = f'https://www.{slug}.com/'
+        elif kind == 'about':
+            source = f'https://www.{slug}.com/about'
+        else:
+            source = slug.capitalize()
+        companies.append((slug.capitalize(), source))
+    return companies
+
+def run_company(mode, name, source):
+    """
+    Scrape one company the way a scrape job does, minus the AI summary
+
+    Returns:
+        bool: True if the company was scraped without an error
+    """
+    ok = True
+    if mode in ('scrape', 'full'):
+        company_data = scraper.scrape_company_data(source)
+        ok = 'error' not in company_data
+        name = company_data.get('name') or name
+    if mode in ('social', 'full'):
+        social_media_detector.detect_social_media(name)
+    return ok
+
+def percentile(values, p):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+class RSSSampler:
+    """
+    Track the process's peak resident set size while running, sampling
+    /proc/self/statm, or ru_maxrss (the peak since the process started)
+    where /proc is not available
+    """
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._page_size = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+    def sample(self):
+        try:
+            with open('/proc/self/statm') as f:
+                rss = int(f.read().split()[1]) * self._page_size
+        except OSError:
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            rss *= 1 if sys.platform == 'darwin' else 1024
+        self.peak = max(self.peak, rss)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def __enter__(self):
+        self.sample()
+        self._thread = threading.Thread(target=self._run, name='rss-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+
+def run_level(server, mode, companies, concurrency):
+    """
+    Scrape all companies with the given number of threads
+
+    Returns:
+        dict: Throughput, latency percentiles, errors and peak RSS
+    """
+    latencies = []
+    failures = 0
+
+    def timed_company(company):
+        started = time.perf_counter()
+        try:
+            ok = run_company(mode, *company)
+        except Exception:
+            ok = False
+        return ok, time.perf_counter() - started
+
+    server.stats.clear()
+    with RSSSampler() as rss:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='bench') as pool:
+            for ok, seconds in pool.map(timed_company, companies):
+                latencies.append(seconds)
+                failures += not ok
+        elapsed = time.perf_counter() - started
+
+    return {
+        'concurrency': concurrency,
+        'companies': len(companies),
+        'seconds': round(elapsed, 3),
+        'companies_per_sec': round(len(companies) / elapsed, 2),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+        'failed': failures,
+        'peak_rss_mb': round(rss.peak / 2**20, 1),
+        'server': dict(server.stats),
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, params, baseline, threshold):
+    """
+    Compare results with a baseline run at the same concurrency levels
+
+    Args:
+        results (list): This run's per-level results
+        params (dict): This run's parameters
+        baseline (dict): A saved run
+        threshold (float): Allowed change, in percent, before a metric
+            counts as a regression
+
+    Returns:
+        list: Regression descriptions
+    """
+    baseline_levels = {level['concurrency']: level for level in baseline['results']}
+    regressions = []
+    print(f"\nCompared with {baseline.get('git_commit') or 'baseline'} ({baseline.get('created_at')}):")
+    changed = sorted(key for key, value in params.items()
+                     if key not in ('concurrency', 'log_level') and baseline['params'].get(key) != value)
+    if changed:
+        print(f"  warning: the baseline was run with different {', '.join(changed)}")
+    for level in results:
+        before = baseline_levels.get(level['concurrency'])
+        if before is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            if not before.get(metric):
+                continue
+            change = (level[metric] - before[metric]) / before[metric] * 100
+            regressed = -change > threshold if higher_is_better else change > threshold
+            print(f"  concurrency {level['concurrency']:>3} {metric:<18} {before[metric]:>9} -> "
+                  f"{level[metric]:>9} ({change:+.1f}%){'  REGRESSION' if regressed else ''}")
+            if regressed:
+                regressions.append(f"concurrency {level['concurrency']} {metric} {change:+.1f}%")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark scraping against a local stand-in for the web')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16], help='Thread counts to run')
+    parser.add_argument('--companies', type=int, default=60, help='Companies scraped per concurrency level')
+    parser.add_argument('--sources', choices=['url', 'about', 'name', 'mixed'], default='mixed',
+                        help='Scrape homepage URLs, about page URLs, names to search for, or all three')
+    parser.add_argument('--mode', choices=['scrape', 'social', 'full'], default='full',
+                        help='Run scrape_company_data, detect_social_media, or both')
+    parser.add_argument('--latency-ms', type=float, default=20, help='Server delay per response')
+    parser.add_argument('--jitter-ms', type=float, default=5, help='Random +/- variation of the delay')
+    parser.add_argument('--error-rate', type=float, default=0, help='Share of requests answered with a 503')
+    parser.add_argument('--reset-rate', type=float, default=0, help='Share of connections reset without a response')
+    parser.add_argument('--search-delay', type=float, default=0,
+                        help='Pause after each social media search (SOCIAL_SEARCH_DELAY_SECONDS)')
+    parser.add_argument('--warmup', type=int, default=3, help='Companies scraped before measuring')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the server delays and errors')
+    parser.add_argument('--log-level', default='WARNING', help='Log level while scraping')
+    parser.add_argument('--save', nargs='?', const='', metavar='PATH',
+                        help=f'Save the results as JSON (default: a timestamped file in {RESULTS_DIR})')
+    parser.add_argument('--compare', metavar='PATH', help='Saved results to check for regressions')
+    parser.add_argument('--threshold', type=float, default=10, help='Change, in percent, counted as a regression')
+    args = parser.parse_args()
+
+    configure_logging(level=args.log_level)
+    social_media_detector.SOCIAL_SEARCH_DELAY_SECONDS = args.search_delay
+    companies = company_sources(args.companies, args.sources)
+
+    server = CorpusServer(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+                          reset_rate=args.reset_rate, seed=args.seed)
+    session = scraper.http_session
+    adapters = session.adapters.copy()
+    adapter = LocalRouteAdapter(server.base_url, pool_maxsize=max(args.concurrency))
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    results = []
+    try:
+        with server:
+            for company in company_sources(args.warmup, args.sources):
+                run_company(args.mode, *company)
+            print(f"{'threads':>7} {'companies/s':>11} {'p50 ms':>8} {'p99 ms':>8} {'failed':>6} {'peak RSS MB':>11}")
+            for concurrency in args.concurrency:
+                level = run_level(server, args.mode, companies, concurrency)
+                results.append(level)
+                print(f"{concurrency:>7} {level['companies_per_sec']:>11} {level['p50_ms']:>8} "
+                      f"{level['p99_ms']:>8} {level['failed']:>6} {level['peak_rss_mb']:>11}")
+    finally:
+        session.adapters = adapters
+        adapter.close()
+
+    run = {
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'params': {key: value for key, value in vars(args).items() if key not in ('save', 'compare', 'threshold')},
+        'results': results,
+    }
+
+    if args.save is not None:
+        path = args.save or os.path.join(
+            RESULTS_DIR, f"{args.mode}-{datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S')}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(run, f, indent=2)
+            f.write('\n')
+        print(f'\nSaved results to {path}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, run['params'], json.load(f), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {'; '.join(regressions)}")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
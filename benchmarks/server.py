@@ -0,0 +1,244 @@
+import os
+import random
+import socket
+import struct
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from requests.adapters import HTTPAdapter
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus')
+
+# Hosts served as social media profiles, by platform name
+SOCIAL_HOSTS = {
+    'linkedin.com': 'LinkedIn',
+    'twitter.com': 'Twitter',
+    'x.com': 'X',
+    'instagram.com': 'Instagram',
+    'facebook.com': 'Facebook',
+}
+
+# Search query words that make the search results list social profiles
+SOCIAL_RESULT_URLS = {
+    'linkedin': 'https://www.linkedin.com/company/{slug}',
+    'twitter': 'https://twitter.com/{slug}',
+    'instagram': 'https://www.instagram.com/{slug}',
+    'facebook': 'https://www.facebook.com/{slug}',
+}
+
+# Company site paths, by corpus page
+SITE_PAGES = {
+    '/': 'homepage',
+    '/about': 'about',
+    '/contact': 'contact',
+}
+
+SEARCH_RESULT = '''      <div class="g">
+        <a href="/url?q={url}&amp;sa=U&amp;ved=2ahUKEwiB"><h3>{title}</h3></a>
+        <div class="st">{title} - official site and company information.</div>
+      </div>
+'''
+
+def load_corpus(corpus_dir=CORPUS_DIR):
+    """
+    Load the corpus page templates
+
+    Args:
+        corpus_dir (str): Directory of <page>.html templates
+
+    Returns:
+        dict: Template text by page name
+    """
+    pages = {}
+    for filename in os.listdir(corpus_dir):
+        if filename.endswith('.html'):
+            with open(os.path.join(corpus_dir, filename), encoding='utf-8') as f:
+                pages[filename[:-len('.html')]] = f.read()
+    return pages
+
+def render(template, **values):
+    """Fill the {{name}} placeholders of a corpus template"""
+    for key, value in values.items():
+        template = template.replace('{{%s}}' % key, value)
+    return template
+
+def company_values(slug):
+    """Template values for the company with the given slug"""
+    return {'name': slug.capitalize(), 'slug': slug, 'domain': f'{slug}.com'}
+
+class CorpusRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serve corpus pages for requests routed as /<original host>/<path>,
+    after the server's latency and with its injected errors
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        time.sleep(server.delay())
+
+        roll = server.roll()
+        if roll < server.reset_rate:
+            server.count('reset')
+            # Close with an RST and no response, like a dropped connection
+            self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+            self.close_connection = True
+            return
+        if roll < server.reset_rate + server.error_rate:
+            server.count('error')
+            self.send_page(503, '<html><body><h1>503 Service Unavailable</h1></body></html>')
+            return
+
+        parts = urlsplit(self.path)
+        host, _, path = parts.path.lstrip('/').partition('/')
+        status, body = self.route(host.lower(), '/' + path, parse_qs(parts.query))
+        server.count(status)
+        self.send_page(status, body)
+
+    def route(self, host, path, query):
+        """
+        Pick the corpus page for a request
+
+        Args:
+            host (str): Original host, e.g. www.acme.com
+            path (str): Original path
+            query (dict): Parsed query string
+
+        Returns:
+            tuple: (status code, body)
+        """
+        pages = self.server.pages
+        bare_host = host[len('www.'):] if host.startswith('www.') else host
+
+        if bare_host == 'google.com' and path == '/search':
+            return 200, self.search_results(query.get('q', [''])[0])
+
+        if bare_host in SOCIAL_HOSTS:
+            slug = path.rstrip('/').rsplit('/', 1)[-1]
+            if not slug:
+                return 404, '<html><body>Page not found</body></html>'
+            return 200, render(pages['social_profile'], platform=SOCIAL_HOSTS[bare_host],
+                               **company_values(slug.lower()))
+
+        page = SITE_PAGES.get(path.rstrip('/') or '/')
+        if page is None:
+            return 404, '<html><body>Page not found</body></html>'
+        return 200, render(pages[page], **company_values(bare_host.split('.')[0]))
+
+    def search_results(self, query):
+        """
+        Render a results page for a search: the company's profile on the
+        social platform named in the query, or else its website
+        """
+        words = query.lower().split()
+        slug = words[0] if words else 'example'
+        urls = [template.format(slug=slug) for platform, template in SOCIAL_RESULT_URLS.items()
+                if platform in words]
+        if not urls:
+            urls = [f'https://www.{slug}.com/', f'https://www.{slug}.com/about']
+        results = ''.join(SEARCH_RESULT.format(url=url, title=f'{slug.capitalize()} - {url}') for url in urls)
+        return render(self.server.pages['search_results'], query=query, results=results)
+
+    def send_page(self, status, body):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+class CorpusServer(ThreadingHTTPServer):
+    """
+    Local HTTP stand-in for company sites, search results and social
+    profiles, serving the corpus with configurable latency and errors
+
+    Args:
+        latency_ms (float): Delay before each response
+        jitter_ms (float): Random +/- variation of the delay
+        error_rate (float): Share of requests answered with a 503
+        reset_rate (float): Share of requests whose connection is reset
+            without a response
+        seed (int): Seed for the delays and injected errors
+        port (int): Port to listen on, 0 for any free one
+    """
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, latency_ms=0, jitter_ms=0, error_rate=0, reset_rate=0, seed=0, port=0):
+        super().__init__(('127.0.0.1', port), CorpusRequestHandler)
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.reset_rate = reset_rate
+        self.pages = load_corpus()
+        self.stats = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return 'http://%s:%s' % self.server_address[:2]
+
+    def delay(self):
+        with self._lock:
+            jitter = self._random.uniform(-self.jitter, self.jitter) if self.jitter else 0
+        return max(0, self.latency + jitter)
+
+    def roll(self):
+        with self._lock:
+            return self._random.random()
+
+    def count(self, outcome):
+        with self._lock:
+            self.stats[outcome] += 1
+
+    def start(self):
+        """Serve in a background thread"""
+        self._thread = threading.Thread(target=self.serve_forever, name='corpus-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+class LocalRouteAdapter(HTTPAdapter):
+    """
+    requests adapter sending every request to a CorpusServer as
+    <base_url>/<host>/<path>?<query>, so code fetching real URLs runs
+    against the local corpus unchanged
+
+    Args:
+        base_url (str): CorpusServer base URL
+        pool_maxsize (int): Connections kept open to the server; at least
+            the number of threads fetching at once
+    """
+    def __init__(self, base_url, pool_maxsize=10):
+        self.base_url = base_url.rstrip('/')
+        super().__init__(pool_connections=1, pool_maxsize=pool_maxsize)
+
+    def send(self, request, **kwargs):
+        original_url = request.url
+        parts = urlsplit(original_url)
+        local = request.copy()
+        local.url = f'{self.base_url}/{parts.hostname}{parts.path or "/"}'
+        if parts.query:
+            local.url += '?' + parts.query
+        response = super().send(local, **kwargs)
+        response.url = original_url
+        response.request = request
+        return response
@@ -0,0 +1,317 @@
+import hashlib
+import logging
+import math
+import os
+from collections import Counter
+from functools import lru_cache
+from datetime import datetime
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session, object_session
+
+from app import db
+from index_sync import SyncedIndex
+from models import Company, CompanyVector
+from similarity import company_tokens
+from metrics import CACHE_REQUESTS
+
+# The similar-companies index needs NumPy; without it the endpoint is disabled
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Hashed embedding size. 128 float32s is 512 bytes per company, ~50MB at
+# 100k companies in memory.
+VECTOR_DIMENSIONS = 128
+
+# Random-hyperplane LSH: each table hashes a vector to LSH_BITS sign bits;
+# more tables find more true neighbours, more bits make smaller buckets
+LSH_TABLES = 12
+LSH_BITS = 8
+LSH_SEED = 42
+
+# Other processes' changes are picked up from company_vector at most this
+# often (seconds)
+INDEX_SYNC_SECONDS = float(os.environ.get("COMPANY_INDEX_SYNC_SECONDS", "30"))
+
+DEFAULT_SIMILAR_COUNT = 10
+MAX_SIMILAR_COUNT = 100
+
+# Company fields added as whole-value features, with their weight relative
+# to a text token
+CATEGORY_FEATURES = {'industry': 3.0, 'size': 1.0, 'country': 1.0}
+
+BACKFILL_BATCH_SIZE = 1000
+
+# Company fields the vector is computed from
+INDEXED_FIELDS = ('name', 'description', 'summary', 'target_audience', 'industry', 'size', 'country')
+
+@lru_cache(maxsize=1 << 18)
+def feature_hash(feature):
+    digest = int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'little')
+    return digest % VECTOR_DIMENSIONS, 1.0 if digest >> 63 else -1.0
+
+CACHE_REQUESTS.watch_lru_cache('feature_hash', feature_hash)
+
+def company_vector(company):
+    """
+    Hashed embedding of a company: sublinear term frequencies of its
+    name, description, summary and target audience words, plus its
+    industry, size and country, hashed into VECTOR_DIMENSIONS signed
+    buckets and L2-normalized.
+
+    Args:
+        company: Company, or a row with the same attributes
+
+    Returns:
+        numpy.ndarray: float32 vector (all zeros if the company has no text)
+    """
+    features = {
+        f'word:{token}': 1 + math.log(count)
+        for token, count in Counter(company_tokens(company) + company_tokens({'description': company.name})).items()
+    }
+    for field, weight in CATEGORY_FEATURES.items():
+        value = (getattr(company, field) or '').strip().lower()
+        if value and value != 'unknown':
+            features[f'{field}:{value}'] = weight
+
+    if not features:
+        return np.zeros(VECTOR_DIMENSIONS, dtype=np.float32)
+    indices, signs = zip(*map(feature_hash, features))
+    vector = np.bincount(indices, np.multiply(signs, list(features.values())), minlength=VECTOR_DIMENSIONS)
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector).astype(np.float32)
+
+class CompanyIndex(SyncedIndex):
+    """
+    In-memory approximate nearest-neighbour index over company vectors.
+
+    Vectors live in one preallocated matrix; LSH tables map each bucket
+    signature to the rows hashed there. A query gathers candidates from
+    its buckets in every table (probing neighbouring buckets if that finds
+    too few) and ranks them by exact cosine similarity.
+    """
+    name = 'similarity index'
+    sync_seconds = INDEX_SYNC_SECONDS
+
+    def __init__(self):
+        super().__init__()
+        self.planes = np.random.default_rng(LSH_SEED).standard_normal(
+            (VECTOR_DIMENSIONS, LSH_TABLES * LSH_BITS)
+        ).astype(np.float32)
+        self.bit_values = 1 << np.arange(LSH_BITS)
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.vectors = np.zeros((1024, VECTOR_DIMENSIONS), dtype=np.float32)
+            self.ids = np.full(1024, -1, dtype=np.int64)
+            self.signatures = np.zeros((1024, LSH_TABLES), dtype=np.int64)
+            self.rows = {}  # company id -> row
+            self.free_rows = []
+            self.size = 0
+            self.buckets = [{} for _ in range(LSH_TABLES)]
+
+    def signatures_for(self, vectors):
+        bits = (vectors @ self.planes > 0).reshape(len(vectors), LSH_TABLES, LSH_BITS)
+        return bits @ self.bit_values
+
+    def add_many(self, company_ids, vectors):
+        """Insert or replace vectors for companies"""
+        if not len(company_ids):
+            return
+        vectors = np.asarray(vectors, dtype=np.float32)
+        signatures = self.signatures_for(vectors)
+        with self.lock:
+            for company_id, vector, signature in zip(company_ids, vectors, signatures):
+                self.discard(company_id)
+                row = self.free_rows.pop() if self.free_rows else self.next_row()
+                self.vectors[row] = vector
+                self.ids[row] = company_id
+                self.signatures[row] = signature
+                self.rows[int(company_id)] = row
+                for table, key in enumerate(signature.tolist()):
+                    self.buckets[table].setdefault(key, set()).add(row)
+
+    def next_row(self):
+        if self.size == len(self.ids):
+            capacity = len(self.ids) * 2
+            self.vectors = np.resize(self.vectors, (capacity, VECTOR_DIMENSIONS))
+            self.ids = np.concatenate([self.ids, np.full(capacity - self.size, -1, dtype=np.int64)])
+            self.signatures = np.resize(self.signatures, (capacity, LSH_TABLES))
+        self.size += 1
+        return self.size - 1
+
+    def discard(self, company_id):
+        with self.lock:
+            row = self.rows.pop(company_id, None)
+            if row is None:
+                return
+            for table, key in enumerate(self.signatures[row].tolist()):
+                bucket = self.buckets[table].get(key)
+                bucket.discard(row)
+                if not bucket:
+                    del self.buckets[table][key]
+            self.ids[row] = -1
+            self.free_rows.append(row)
+
+    def candidate_rows(self, signature, wanted):
+        candidates = set()
+        for table, key in enumerate(signature.tolist()):
+            candidates |= self.buckets[table].get(key, set())
+        # Multi-probe: also look in buckets one bit away
+        if len(candidates) < wanted:
+            for bit in range(LSH_BITS):
+                for table, key in enumerate(signature.tolist()):
+                    candidates |= self.buckets[table].get(key ^ (1 << bit), set())
+                if len(candidates) >= wanted:
+                    break
+        return candidates
+
+    def similar(self, company_id, k=DEFAULT_SIMILAR_COUNT, exact=False):
+        """
+        The k companies most similar to a company.
+
+        Returns:
+            list: (company id, cosine similarity) pairs, most similar first,
+                or None if the company isn't indexed
+        """
+        with self.lock:
+            row = self.rows.get(company_id)
+            if row is None:
+                return None
+            vector = self.vectors[row]
+            if exact:
+                rows = np.flatnonzero(self.ids[:self.size] >= 0)
+            else:
+                rows = np.fromiter(self.candidate_rows(self.signatures[row], k * 4 + 1), dtype=np.int64)
+            rows = rows[rows != row]
+            scores = self.vectors[rows] @ vector
+            ids = self.ids[rows]
+
+        top = np.argsort(-scores)[:k] if len(scores) > k else np.argsort(-scores)
+        return [(int(ids[i]), float(scores[i])) for i in top if scores[i] > 0]
+
+    def read_vectors(self, query):
+        return {
+            company_id: np.frombuffer(vector, dtype=np.float32)
+            for company_id, vector in db.session.execute(query)
+        }
+
+    def build(self):
+        """Load every stored vector, indexing companies that don't have one yet"""
+        backfill_company_vectors()
+        fresh = CompanyIndex()
+        fresh.apply(self.read_vectors(select(CompanyVector.company_id, CompanyVector.vector)))
+        logger.info("Loaded %s company vectors into the similarity index", len(fresh.rows))
+        return fresh
+
+    def swap(self, fresh):
+        self.vectors, self.ids, self.signatures = fresh.vectors, fresh.ids, fresh.signatures
+        self.rows, self.free_rows, self.size, self.buckets = fresh.rows, fresh.free_rows, fresh.size, fresh.buckets
+
+    def read_changes(self, since):
+        """Vectors changed since a time, including companies bulk-inserted without one"""
+        backfill_company_vectors()
+        return self.read_vectors(
+            select(CompanyVector.company_id, CompanyVector.vector).where(CompanyVector.updated_at >= since)
+        )
+
+    def apply(self, changes):
+        with self.lock:
+            for company_id, vector in changes.items():
+                if vector is None:
+                    self.discard(company_id)
+            added = [(company_id, vector) for company_id, vector in changes.items() if vector is not None]
+            self.add_many([company_id for company_id, _ in added], [vector for _, vector in added])
+
+company_index = CompanyIndex() if np is not None else None
+
+def backfill_company_vectors(batch_size=BACKFILL_BATCH_SIZE):
+    """
+    Store vectors for companies that have none, e.g. ones added by a bulk
+    import that bypasses the ORM events.
+
+    Returns:
+        int: Number of companies indexed
+    """
+    missing = (
+        select(Company.id, *[getattr(Company, field) for field in INDEXED_FIELDS])
+        .outerjoin(CompanyVector, CompanyVector.company_id == Company.id)
+        .where(CompanyVector.company_id.is_(None))
+        .order_by(Company.id)
+        .limit(batch_size)
+    )
+    indexed = 0
+    last_id = 0
+    while True:
+        companies = db.session.execute(missing.where(Company.id > last_id)).all()
+        if not companies:
+            return indexed
+        last_id = companies[-1].id
+        now = datetime.utcnow()
+        db.session.execute(CompanyVector.__table__.insert(), [
+            {'company_id': company.id, 'vector': company_vector(company).tobytes(), 'updated_at': now}
+            for company in companies
+        ])
+        db.session.commit()
+        indexed += len(companies)
+
+def similar_companies(company_id, k=DEFAULT_SIMILAR_COUNT):
+    """
+    Companies most similar to a company, from the in-memory index.
+
+    Returns:
+        list: (company id, similarity) pairs, or None if the company
+            isn't indexed
+    """
+    company_index.ensure_current()
+    return company_index.similar(company_id, k)
+
+# Keep stored vectors current as companies change; the in-memory index
+# follows once the transaction commits
+
+def pending_index_changes(target):
+    return object_session(target).info.setdefault('company_index_changes', {})
+
+def store_company_vector(connection, company):
+    vector = company_vector(company)
+    now = datetime.utcnow()
+    table = CompanyVector.__table__
+    updated = connection.execute(
+        table.update().where(table.c.company_id == company.id).values(vector=vector.tobytes(), updated_at=now)
+    ).rowcount
+    if not updated:
+        connection.execute(table.insert().values(company_id=company.id, vector=vector.tobytes(), updated_at=now))
+    pending_index_changes(company)[company.id] = vector
+
+if np is not None:
+    @event.listens_for(Company, 'after_insert')
+    def company_inserted(mapper, connection, target):
+        store_company_vector(connection, target)
+
+    @event.listens_for(Company, 'after_update')
+    def company_changed(mapper, connection, target):
+        state = inspect(target)
+        if any(state.attrs[field].history.has_changes() for field in INDEXED_FIELDS):
+            store_company_vector(connection, target)
+
+    @event.listens_for(Company, 'before_delete')
+    def company_deleted(mapper, connection, target):
+        table = CompanyVector.__table__
+        connection.execute(table.delete().where(table.c.company_id == target.id))
+        pending_index_changes(target)[target.id] = None
+
+    @event.listens_for(Session, 'after_commit')
+    def apply_index_changes(session):
+        changes = session.info.pop('company_index_changes', None)
+        # An index that hasn't started loading reads these from the table instead
+        if changes and company_index.tracks_commits():
+            company_index.apply_committed(changes)
+
+    @event.listens_for(Session, 'after_rollback')
+    def discard_index_changes(session):
+        session.info.pop('company_index_changes', None)
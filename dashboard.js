@@ -8,12 +8,18 @@ let leadsData = [];
 let currentLead = null;
 let competitorsData = [];
 
+// Pagination state for the leads list
+let nextCursor = null;
+let totalLeads = 0;
+const LEADS_PAGE_SIZE = 50;
+
 document.addEventListener('DOMContentLoaded', function() {
     // Initialize dashboard
     loadDashboardData();
 
     // Set up event listeners for filters
     document.getElementById('apply-filters-btn').addEventListener('click', applyFilters);
+    document.getElementById('load-more-btn').addEventListener('click', loadMoreLeads);
 
     // Set up event listeners for lead actions
     document.getElementById('save-schedule-btn').addEventListener('click', saveFollowUpSchedule);
@@ -42,6 +48,52 @@ document.addEventListener('DOMContentLoaded', function() {
     });
 });
 
+/**
+ * Build the query string for the leads API from the current filters
+ * @param {string|null} cursor - Cursor of the page to fetch
+ * @returns {string} - Query string including the leading '?'
+ */
+function buildLeadsQueryString(cursor) {
+    const [sort, order] = document.getElementById('sort-select').value.split(':');
+    const filters = {
+        industry: document.getElementById('industry-filter').value,
+        email_status: document.getElementById('email-status-filter').value,
+        company_size: document.getElementById('company-size-filter').value,
+        priority: document.getElementById('priority-filter').value,
+        min_score: document.getElementById('min-score-filter').value,
+        max_score: document.getElementById('max-score-filter').value,
+        q: document.getElementById('search-filter').value.trim(),
+        sort: sort,
+        order: order,
+        limit: LEADS_PAGE_SIZE,
+        cursor: cursor
+    };
+
+    const queryParams = [];
+    Object.entries(filters).forEach(([key, value]) => {
+        if (value !== '' && value !== null && value !== undefined) {
+            queryParams.push(`${key}=${encodeURIComponent(value)}`);
+        }
+    });
+
+    return `?${queryParams.join('&')}`;
+}
+
+/**
+ * Fetch a page of leads from the API
+ * @param {string|null} cursor - Cursor of the page to fetch
+ * @returns {Promise<Object>} - Page with leads, next_cursor and total
+ */
+function fetchLeadsPage(cursor) {
+    return fetch(`/api/leads${buildLeadsQueryString(cursor)}`)
+        .then(response => response.json().then(data => {
+            if (!response.ok) {
+                throw new Error(data.message || `Request failed with status ${response.status}`);
+            }
+            return data;
+        }));
+}
+
 /**
  * Load dashboard data and update UI
  */
@@ -55,26 +107,18 @@ function loadDashboardData() {
             <p class="mt-3">Loading leads...</p>
         </div>
     `;
+    document.getElementById('load-more-container').classList.add('d-none');
 
-    // Get filter values
-    const industry = document.getElementById('industry-filter').value;
-    const emailStatus = document.getElementById('email-status-filter').value;
-    const companySize = document.getElementById('company-size-filter').value;
+    // Statistics are computed server-side over every matching lead
+    loadStatistics();
 
-    // Build query string
-    let queryParams = [];
-    if (industry) queryParams.push(`industry=${encodeURIComponent(industry)}`);
-    if (emailStatus) queryParams.push(`email_status=${encodeURIComponent(emailStatus)}`);
-    if (companySize) queryParams.push(`company_size=${encodeURIComponent(companySize)}`);
-    
-    const queryString = queryParams.length > 0 ? `?${queryParams.join('&')}` : '';
-
-    // Fetch leads data from API
-    fetch(`/api/leads${queryString}`)
-        .then(response => response.json())
+    // Fetch the first page of leads from the API
+    fetchLeadsPage(null)
         .then(data => {
-            leadsData = data;
-            updateDashboardUI(data);
+            leadsData = data.leads;
+            nextCursor = data.next_cursor;
+            totalLeads = data.total;
+            updateDashboardUI(data.leads);
         })
         .catch(error => {
             console.error('Error loading leads:', error);
@@ -89,14 +133,47 @@ function loadDashboardData() {
         });
 }
 
+/**
+ * Load the next page of leads and append it to the list
+ */
+function loadMoreLeads() {
+    if (!nextCursor) return;
+
+    const loadMoreBtn = document.getElementById('load-more-btn');
+    const originalBtnText = loadMoreBtn.innerHTML;
+    loadMoreBtn.disabled = true;
+    loadMoreBtn.innerHTML = '<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span> Loading...';
+
+    fetchLeadsPage(nextCursor)
+        .then(data => {
+            leadsData = leadsData.concat(data.leads);
+            nextCursor = data.next_cursor;
+            totalLeads = data.total;
+            document.getElementById('leads-container').insertAdjacentHTML('beforeend', data.leads.map(renderLeadCard).join(''));
+            updateLoadMoreButton();
+        })
+        .catch(error => {
+            console.error('Error loading more leads:', error);
+            showAlert('Could not load more leads', 'danger');
+        })
+        .finally(() => {
+            loadMoreBtn.disabled = false;
+            loadMoreBtn.innerHTML = originalBtnText;
+        });
+}
+
+/**
+ * Show the load more button only while there are more pages
+ */
+function updateLoadMoreButton() {
+    document.getElementById('load-more-container').classList.toggle('d-none', !nextCursor);
+}
+
 /**
  * Update the dashboard UI with leads data
  * @param {Array} leads - Array of lead objects
  */
 function updateDashboardUI(leads) {
-    // Update statistics
-    updateStatistics(leads);
-
     // Update leads list
     const leadsContainer = document.getElementById('leads-container');
     const noLeadsContainer = document.getElementById('no-leads-container');
@@ -106,99 +183,110 @@ function updateDashboardUI(leads) {
         noLeadsContainer.classList.remove('d-none');
     } else {
         noLeadsContainer.classList.add('d-none');
-        
-        let leadsHTML = '';
-        leads.forEach(lead => {
-            const scoreClass = lead.score >= 70 ? 'score-high' : (lead.score >= 40 ? 'score-medium' : 'score-low');
-            
-            let socialMediaHTML = '';
-            const socialMedia = lead.social_media || {};
-            
-            if (socialMedia.linkedin) {
-                socialMediaHTML += `<a href="${socialMedia.linkedin}" target="_blank" class="social-badge linkedin"><i class="fab fa-linkedin-in"></i> LinkedIn</a>`;
-            }
-            
-            if (socialMedia.twitter) {
-                socialMediaHTML += `<a href="${socialMedia.twitter}" target="_blank" class="social-badge twitter"><i class="fab fa-twitter"></i> Twitter</a>`;
-            }
-            
-            if (socialMedia.instagram) {
-                socialMediaHTML += `<a href="${socialMedia.instagram}" target="_blank" class="social-badge instagram"><i class="fab fa-instagram"></i> Instagram</a>`;
-            }
-            
-            if (socialMedia.facebook) {
-                socialMediaHTML += `<a href="${socialMedia.facebook}" target="_blank" class="social-badge facebook"><i class="fab fa-facebook-f"></i> Facebook</a>`;
-            }
-            
-            if (!socialMediaHTML) {
-                socialMediaHTML = '<p class="text-muted">No social media profiles found</p>';
-            }
-            
-            leadsHTML += `
-                <div class="lead-card" data-lead-id="${lead.id}">
-                    <div class="lead-card-header d-flex justify-content-between align-items-center">
-                        <h4>${lead.name}</h4>
-                        <div class="lead-score ${scoreClass}">${lead.score}</div>
+        leadsContainer.innerHTML = leads.map(renderLeadCard).join('');
+    }
+
+    updateLoadMoreButton();
+}
+
+/**
+ * Render the card for a single lead
+ * @param {Object} lead - Lead object
+ * @returns {string} - Card HTML
+ */
+function renderLeadCard(lead) {
+    const scoreClass = lead.score >= 70 ? 'score-high' : (lead.score >= 40 ? 'score-medium' : 'score-low');
+    
+    let socialMediaHTML = '';
+    const socialMedia = lead.social_media || {};
+    
+    if (socialMedia.linkedin) {
+        socialMediaHTML += `<a href="${socialMedia.linkedin}" target="_blank" class="social-badge linkedin"><i class="fab fa-linkedin-in"></i> LinkedIn</a>`;
+    }
+    
+    if (socialMedia.twitter) {
+        socialMediaHTML += `<a href="${socialMedia.twitter}" target="_blank" class="social-badge twitter"><i class="fab fa-twitter"></i> Twitter</a>`;
+    }
+    
+    if (socialMedia.instagram) {
+        socialMediaHTML += `<a href="${socialMedia.instagram}" target="_blank" class="social-badge instagram"><i class="fab fa-instagram"></i> Instagram</a>`;
+    }
+    
+    if (socialMedia.facebook) {
+        socialMediaHTML += `<a href="${socialMedia.facebook}" target="_blank" class="social-badge facebook"><i class="fab fa-facebook-f"></i> Facebook</a>`;
+    }
+    
+    if (!socialMediaHTML) {
+        socialMediaHTML = '<p class="text-muted">No social media profiles found</p>';
+    }
+    
+    return `
+        <div class="lead-card" data-lead-id="${lead.id}">
+            <div class="lead-card-header d-flex justify-content-between align-items-center">
+                <h4>${lead.name}</h4>
+                <div class="lead-score ${scoreClass}">${lead.score}</div>
+            </div>
+            <div class="lead-card-body">
+                <div class="row mb-3">
+                    <div class="col-md-6">
+                        <p><strong>Email:</strong> ${lead.email} <span class="badge bg-${getEmailStatusColor(lead.email_status)}">${lead.email_status}</span></p>
+                        <p><strong>Company:</strong> ${lead.company.name}</p>
+                        <p><strong>Industry:</strong> ${lead.company.industry || 'Unknown'}</p>
+                        <p><strong>Size:</strong> ${lead.company.size || 'Unknown'}</p>
                     </div>
-                    <div class="lead-card-body">
-                        <div class="row mb-3">
-                            <div class="col-md-6">
-                                <p><strong>Email:</strong> ${lead.email} <span class="badge bg-${getEmailStatusColor(lead.email_status)}">${lead.email_status}</span></p>
-                                <p><strong>Company:</strong> ${lead.company.name}</p>
-                                <p><strong>Industry:</strong> ${lead.company.industry || 'Unknown'}</p>
-                                <p><strong>Size:</strong> ${lead.company.size || 'Unknown'}</p>
-                            </div>
-                            <div class="col-md-6">
-                                <p><strong>Social Media</strong></p>
-                                <div class="mb-3">
-                                    ${socialMediaHTML}
-                                </div>
-                            </div>
-                        </div>
-                        <div class="d-flex flex-wrap lead-actions">
-                            <button class="btn btn-sm btn-primary view-details-btn" onclick="viewLeadDetails(${lead.id})">
-                                <i class="fas fa-info-circle me-1"></i> View Details
-                            </button>
-                            <button class="btn btn-sm btn-outline-primary generate-email-btn" onclick="generateEmail(${lead.id})">
-                                <i class="fas fa-envelope me-1"></i> Generate Email
-                            </button>
-                            <button class="btn btn-sm btn-outline-primary linkedin-connect-btn" onclick="linkedinConnect(${lead.id})">
-                                <i class="fab fa-linkedin me-1"></i> LinkedIn Connect
-                            </button>
-                            <button class="btn btn-sm btn-outline-primary schedule-btn" onclick="scheduleFollowUp(${lead.id})">
-                                <i class="fas fa-calendar me-1"></i> Schedule
-                            </button>
-                            <button class="btn btn-sm btn-outline-primary analyze-btn" onclick="analyzeLead(${lead.id})">
-                                <i class="fas fa-chart-pie me-1"></i> Analyze
-                            </button>
+                    <div class="col-md-6">
+                        <p><strong>Social Media</strong></p>
+                        <div class="mb-3">
+                            ${socialMediaHTML}
                         </div>
                     </div>
                 </div>
-            `;
-        });
-        
-        leadsContainer.innerHTML = leadsHTML;
-    }
+                <div class="d-flex flex-wrap lead-actions">
+                    <button class="btn btn-sm btn-primary view-details-btn" onclick="viewLeadDetails(${lead.id})">
+                        <i class="fas fa-info-circle me-1"></i> View Details
+                    </button>
+                    <button class="btn btn-sm btn-outline-primary generate-email-btn" onclick="generateEmail(${lead.id})">
+                        <i class="fas fa-envelope me-1"></i> Generate Email
+                    </button>
+                    <button class="btn btn-sm btn-outline-primary linkedin-connect-btn" onclick="linkedinConnect(${lead.id})">
+                        <i class="fab fa-linkedin me-1"></i> LinkedIn Connect
+                    </button>
+                    <button class="btn btn-sm btn-outline-primary schedule-btn" onclick="scheduleFollowUp(${lead.id})">
+                        <i class="fas fa-calendar me-1"></i> Schedule
+                    </button>
+                    <button class="btn btn-sm btn-outline-primary analyze-btn" onclick="analyzeLead(${lead.id})">
+                        <i class="fas fa-chart-pie me-1"></i> Analyze
+                    </button>
+                </div>
+            </div>
+        </div>
+    `;
 }
 
 /**
- * Update statistics based on leads data
- * @param {Array} leads - Array of lead objects
+ * Load headline statistics for the current filters from the server
  */
-function updateStatistics(leads) {
-    // Calculate statistics
-    const totalLeads = leads.length;
-    const highValueLeads = leads.filter(lead => lead.score >= 70).length;
-    const avgScore = leads.length > 0 
-        ? Math.round(leads.reduce((sum, lead) => sum + lead.score, 0) / leads.length) 
-        : 0;
-    const followUps = leads.filter(lead => lead.next_follow_up).length;
+function loadStatistics() {
+    const params = new URLSearchParams(buildLeadsQueryString(null));
+    ['sort', 'order', 'limit', 'cursor'].forEach(key => params.delete(key));
     
-    // Update UI
-    document.getElementById('stat-total-leads').textContent = totalLeads;
-    document.getElementById('stat-high-value-leads').textContent = highValueLeads;
-    document.getElementById('stat-avg-score').textContent = avgScore;
-    document.getElementById('stat-followups').textContent = followUps;
+    fetch(`/api/leads/stats?${params.toString()}`)
+        .then(response => response.json())
+        .then(stats => updateStatistics(stats))
+        .catch(error => {
+            console.error('Error loading statistics:', error);
+        });
+}
+
+/**
+ * Update statistics cards
+ * @param {Object} stats - Aggregates from /api/leads/stats
+ */
+function updateStatistics(stats) {
+    document.getElementById('stat-total-leads').textContent = stats.total;
+    document.getElementById('stat-high-value-leads').textContent = stats.high_value;
+    document.getElementById('stat-avg-score').textContent = Math.round(stats.avg_score);
+    document.getElementById('stat-followups').textContent = stats.follow_ups.scheduled;
 }
 
 /**
@@ -217,25 +305,46 @@ function getLeadById(leadId) {
     return leadsData.find(lead => lead.id === leadId);
 }
 
+/**
+ * Fetch the full record for a lead (the list only carries summary fields)
+ * @param {number} leadId - Lead ID
+ * @returns {Promise<Object>} - Lead object
+ */
+function fetchLeadDetails(leadId) {
+    return fetch(`/api/lead/${leadId}`)
+        .then(response => {
+            if (!response.ok) {
+                throw new Error(`Request failed with status ${response.status}`);
+            }
+            return response.json();
+        });
+}
+
 /**
  * View lead details
  * @param {number} leadId - Lead ID
  */
 function viewLeadDetails(leadId) {
-    const lead = getLeadById(leadId);
-    if (!lead) return;
-    
-    currentLead = lead;
-    
-    // Update modal title
-    document.getElementById('lead-detail-title').textContent = `${lead.name} - ${lead.company.name}`;
+    if (!getLeadById(leadId)) return;
     
-    // Update overview tab content
-    updateOverviewTabContent(lead);
-    
-    // Show the modal
-    const leadDetailModal = new bootstrap.Modal(document.getElementById('leadDetailModal'));
-    leadDetailModal.show();
+    fetchLeadDetails(leadId)
+        .then(lead => {
+            currentLead = lead;
+            
+            // Update modal title
+            document.getElementById('lead-detail-title').textContent = `${lead.name} - ${lead.company.name}`;
+            
+            // Update overview tab content
+            updateOverviewTabContent(lead);
+            
+            // Show the modal
+            const leadDetailModal = new bootstrap.Modal(document.getElementById('leadDetailModal'));
+            leadDetailModal.show();
+        })
+        .catch(error => {
+            console.error('Error loading lead details:', error);
+            showAlert('Could not load lead details', 'danger');
+        });
 }
 
 /**
@@ -634,20 +743,31 @@ function updateAnalysisTabContent(lead) {
  * @param {number} leadId - Lead ID
  */
 function scheduleFollowUp(leadId) {
-    const lead = getLeadById(leadId);
-    if (!lead) return;
-    
-    // Set lead ID in the form
-    document.getElementById('schedule-lead-id').value = leadId;
+    if (!getLeadById(leadId)) return;
     
-    // Clear form values
-    document.getElementById('follow-up-date').value = '';
-    document.getElementById('follow-up-type').value = 'email';
-    document.getElementById('follow-up-notes').value = lead.follow_up_notes || '';
+    // Notes aren't part of the list view, so reuse the open lead or fetch it
+    const leadPromise = currentLead && currentLead.id === leadId
+        ? Promise.resolve(currentLead)
+        : fetchLeadDetails(leadId);
     
-    // Show the modal
-    const scheduleModal = new bootstrap.Modal(document.getElementById('scheduleModal'));
-    scheduleModal.show();
+    leadPromise
+        .then(lead => {
+            // Set lead ID in the form
+            document.getElementById('schedule-lead-id').value = leadId;
+            
+            // Clear form values
+            document.getElementById('follow-up-date').value = '';
+            document.getElementById('follow-up-type').value = 'email';
+            document.getElementById('follow-up-notes').value = lead.follow_up_notes || '';
+            
+            // Show the modal
+            const scheduleModal = new bootstrap.Modal(document.getElementById('scheduleModal'));
+            scheduleModal.show();
+        })
+        .catch(error => {
+            console.error('Error loading lead details:', error);
+            showAlert('Could not load lead details', 'danger');
+        });
 }
 
 /**
@@ -1009,83 +1129,23 @@ function addCompetitor(companyId) {
  */
 function setupExportFeature() {
     window.exportLeads = function(format) {
-        if (leadsData.length === 0) {
+        if (totalLeads === 0) {
             showAlert('No leads to export', 'warning');
             return;
         }
         
-        // Get all lead IDs
-        const leadIds = leadsData.map(lead => lead.id);
+        // Export every lead matching the current filters. The server streams
+        // the file, so let the browser download it straight to disk instead
+        // of buffering it here.
+        const params = new URLSearchParams(buildLeadsQueryString(null));
+        ['sort', 'order', 'limit', 'cursor'].forEach(key => params.delete(key));
+        params.set('format', format);
         
-        // Send request to API
-        fetch('/api/leads/export', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-                format: format,
-                lead_ids: leadIds
-            })
-        })
-        .then(response => response.json())
-        .then(data => {
-            if (format === 'json') {
-                // For JSON, create and download a JSON file
-                const blob = new Blob([JSON.stringify(data, null, 2)], { type: 'application/json' });
-                const url = URL.createObjectURL(blob);
-                downloadFile(url, `leads_export_${getFormattedDate()}.json`);
-            } else if (format === 'csv' || format === 'excel') {
-                // For CSV/Excel, convert the data to CSV format
-                const csvContent = convertToCSV(data.data);
-                const blob = new Blob([csvContent], { type: 'text/csv;charset=utf-8;' });
-                const url = URL.createObjectURL(blob);
-                downloadFile(url, `leads_export_${getFormattedDate()}.${format === 'excel' ? 'xlsx' : 'csv'}`);
-            }
-            
-            showAlert(`Leads exported successfully as ${format.toUpperCase()}`, 'success');
-        })
-        .catch(error => {
-            console.error('Error exporting leads:', error);
-            showAlert('An error occurred while exporting leads', 'danger');
-        });
-    };
-}
-
-/**
- * Convert data to CSV format
- * @param {Array} data - Array of objects to convert
- * @returns {string} - CSV string
- */
-function convertToCSV(data) {
-    if (!data || !data.length) return '';
-    
-    // Get headers from the first object
-    const headers = Object.keys(data[0]);
-    
-    // Create CSV rows
-    const csvRows = [];
-    
-    // Add headers
-    csvRows.push(headers.join(','));
-    
-    // Add data rows
-    for (const row of data) {
-        const values = headers.map(header => {
-            const value = row[header];
-            
-            // Handle null values
-            if (value === null || value === undefined) return '';
-            
-            // Convert to string and handle commas
-            const stringValue = String(value);
-            return stringValue.includes(',') ? `"${stringValue}"` : stringValue;
-        });
+        const extension = format === 'excel' ? 'xlsx' : format;
+        downloadFile(`/api/leads/export?${params.toString()}`, `leads_export_${getFormattedDate()}.${extension}`);
         
-        csvRows.push(values.join(','));
-    }
-    
-    return csvRows.join('\n');
+        showAlert(`Exporting ${totalLeads} leads as ${format.toUpperCase()}`, 'success');
+    };
 }
 
 /**
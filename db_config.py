@@ -0,0 +1,208 @@
+import logging
+import os
+import threading
+import time
+from functools import wraps
+
+from flask import Response, current_app
+from flask_sqlalchemy.session import Session as FlaskSession
+from sqlalchemy import event, make_url
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+# Connection pool sizing per deployment. Without pre-ping (an extra round
+# trip per checkout) stale connections are avoided by recycling them
+# before the server's idle timeout.
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "300"))
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "0").lower() in ('1', 'true', 'yes')
+
+# Checkouts that wait longer than this for a connection are logged (seconds)
+SLOW_CHECKOUT_SECONDS = float(os.environ.get("DB_SLOW_CHECKOUT_MS", "100")) / 1000
+
+# Read-only endpoints marked with use_read_replica query this database
+# when set, e.g. a streaming replica of the primary
+DATABASE_REPLICA_URL = os.environ.get("DATABASE_REPLICA_URL")
+
+# SQLite production profile, applied to every new connection. WAL lets
+# readers run alongside the writer, synchronous=NORMAL fsyncs only at
+# checkpoints (safe in WAL mode: a power loss can drop the last commits
+# but never corrupts the database), and busy_timeout makes a writer wait
+# for the lock instead of failing with "database is locked".
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "30000"))
+SQLITE_CACHE_SIZE_KB = int(os.environ.get("SQLITE_CACHE_SIZE_KB", "65536"))
+SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+SQLITE_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('busy_timeout', SQLITE_BUSY_TIMEOUT_MS),
+    ('cache_size', -SQLITE_CACHE_SIZE_KB),  # negative: KiB rather than pages
+    ('mmap_size', SQLITE_MMAP_SIZE),
+)
+
+def is_file_sqlite(engine):
+    return engine.dialect.name == 'sqlite' and engine.url.database not in (None, '', ':memory:')
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma, value in SQLITE_PRAGMAS:
+            cursor.execute(f"PRAGMA {pragma}={value}")
+    finally:
+        cursor.close()
+
+def init_sqlite_profile(engine):
+    """
+    Apply SQLITE_PRAGMAS to every connection of a file-backed SQLite
+    engine. Does nothing for other databases. Must run before the engine
+    opens its first connection.
+
+    Returns:
+        bool: Whether the profile was applied
+    """
+    if not is_file_sqlite(engine):
+        return False
+    event.listen(engine, 'connect', set_sqlite_pragmas)
+    logger.info("SQLite profile: %s", ', '.join(f'{pragma}={value}' for pragma, value in SQLITE_PRAGMAS))
+    return True
+
+def begin_immediate(session):
+    """
+    Start a session's SQLite transaction with BEGIN IMMEDIATE, taking the
+    write lock up front (waiting up to busy_timeout for it). A deferred
+    transaction that reads and then writes can fail with "database is
+    locked" at once, without waiting, when another writer got in between.
+    """
+    connection = session.connection()
+    if connection.dialect.name == 'sqlite' and not connection.connection.dbapi_connection.in_transaction:
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+class CheckoutStats:
+    """Running totals of how long pool checkouts waited for a connection"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.slow_checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait):
+        with self.lock:
+            self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            if wait >= SLOW_CHECKOUT_SECONDS:
+                self.slow_checkouts += 1
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                'checkouts': self.checkouts,
+                'slow_checkouts': self.slow_checkouts,
+                'avg_wait_ms': round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                'max_wait_ms': round(self.max_wait * 1000, 3)
+            }
+
+class TimedQueuePool(QueuePool):
+    """
+    QueuePool that times every checkout, including waits for a free
+    connection when the pool and its overflow are exhausted, and logs
+    slow ones with the pool status.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_stats = CheckoutStats()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            wait = time.perf_counter() - started
+            self.checkout_stats.record(wait)
+            if wait >= SLOW_CHECKOUT_SECONDS:
+                logger.warning("Waited %.0fms for a database connection (%s)", wait * 1000, self.status())
+
+def engine_options(database_url):
+    """
+    SQLAlchemy engine options for a database URL: the pool settings above
+    with a TimedQueuePool, except for in-memory SQLite, which keeps its
+    single-connection pool.
+    """
+    options = {
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+    url = make_url(database_url)
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        return options
+    options.update(
+        poolclass=TimedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+    )
+    return options
+
+def pool_stats(engine):
+    """Pool occupancy and checkout wait totals for an engine"""
+    pool = engine.pool
+    stats = {'pool': pool.__class__.__name__}
+    if isinstance(pool, QueuePool):
+        stats.update(size=pool.size(), checked_out=pool.checkedout(), overflow=pool.overflow())
+    if isinstance(pool, TimedQueuePool):
+        stats.update(pool.checkout_stats.to_dict())
+    return stats
+
+class RoutingSession(FlaskSession):
+    """
+    Session that sends queries to the 'replica' bind while
+    info['read_replica'] is set (see use_read_replica). Flushes always go
+    to the primary, and without a replica bind every query does.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self.info.get('read_replica') and not self._flushing:
+            replica = self._db.engines.get('replica')
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def use_read_replica(view):
+    """
+    Route a read-only view's queries to the read replica, if one is
+    configured. Replication lag means it may not see the latest writes.
+
+    The session is only routed for the view (and, for a streamed
+    response, until the response is closed), since an app context that
+    was already pushed keeps the session for later work.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        info = current_app.extensions['sqlalchemy'].session.info
+        previous = info.get('read_replica')
+        info['read_replica'] = True
+
+        def restore():
+            if previous is None:
+                info.pop('read_replica', None)
+            else:
+                info['read_replica'] = previous
+
+        streamed = False
+        try:
+            response = view(*args, **kwargs)
+            if isinstance(response, Response) and response.is_streamed:
+                response.call_on_close(restore)
+                streamed = True
+            return response
+        finally:
+            if not streamed:
+                restore()
+    return wrapper
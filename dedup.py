@@ -0,0 +1,522 @@
+import logging
+import re
+import unicodedata
+import zlib
+from datetime import datetime
+from itertools import combinations
+
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.orm import Session, object_session
+
+from app import db
+from models import (
+    Lead, Company, SocialMedia, CompetitorAnalysis, SentimentAnalysis, EnrichmentTask, CompanyFingerprint
+)
+from enrichment import ENRICHED_FIELDS
+from index_sync import SyncedIndex
+from lead_import import normalize_domain
+from scoring import rescore_leads
+
+# MinHash needs NumPy; without it only exact name and domain matches are found
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+LEGAL_SUFFIXES = frozenset((
+    'inc', 'incorporated', 'llc', 'llp', 'ltd', 'limited', 'corp', 'corporation', 'co', 'company',
+    'plc', 'gmbh', 'ag', 'sa', 'sas', 'srl', 'bv', 'nv', 'pty', 'oy', 'ab', 'as', 'kg', 'group', 'holdings'
+))
+WORD_PATTERN = re.compile(r'[a-z0-9]+')
+
+# MinHash signatures of MINHASH_PERMUTATIONS values, split into (bands,
+# rows per band): two sets become candidates if any band matches, which is
+# likely above a Jaccard similarity of about (1 / bands) ** (1 / rows).
+# Names only count alone above NAME_THRESHOLD, so their bands are tuned
+# near it (~0.68); descriptions' are lower (~0.5) to also find pairs for
+# the combined thresholds.
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = {'name': (10, 6), 'description': (16, 4)}
+MINHASH_PRIME = (1 << 31) - 1
+MINHASH_SEED = 7
+
+# Estimated Jaccard similarity above which two companies are duplicates:
+# by name (character trigrams), by description (word pairs), or by both
+# at the lower combined thresholds
+NAME_THRESHOLD = 0.7
+DESCRIPTION_THRESHOLD = 0.8
+COMBINED_NAME_THRESHOLD = 0.4
+COMBINED_DESCRIPTION_THRESHOLD = 0.5
+
+# LSH buckets shared by more companies than this are boilerplate (e.g. a
+# placeholder description or a common word in names) and don't yield
+# candidates
+MAX_BUCKET_SIZE = 50
+
+# Companies whose signatures are computed together when loading the index,
+# and candidate pairs compared together when scanning it
+LOAD_BATCH_SIZE = 2000
+PAIR_BATCH_SIZE = 50000
+
+# Other processes' changes are picked up from the company table at most
+# this often (seconds)
+INDEX_SYNC_SECONDS = 30
+
+# Company fields the index is built from
+INDEXED_FIELDS = ('name', 'domain', 'website', 'description')
+
+# Match reasons certain enough to reuse a stored company without asking;
+# similar names and descriptions need a person to confirm
+EXACT_MATCH_REASONS = ('domain', 'name')
+
+# Similar companies offered to confirm when a new lead's company only
+# looks like stored ones
+MAX_SIMILAR_COMPANIES = 5
+
+def normalize_company_name(name):
+    """
+    Reduce a company name, domain or URL to a comparison key: accents,
+    punctuation, a leading 'the' and trailing legal suffixes are dropped,
+    and a domain becomes its first label, so 'Acme, Inc.', 'The ACME
+    Company' and 'https://www.acme.com' all become 'acme'.
+    """
+    name = (name or '').strip().lower()
+    if '://' in name or (' ' not in name and re.search(r'\.[a-z]{2,}$', name)):
+        name = (normalize_domain(name) or '').split('.')[0]
+    name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii')
+    words = WORD_PATTERN.findall(name.replace('&', ' and '))
+    while len(words) > 1 and words[-1] in LEGAL_SUFFIXES:
+        words.pop()
+    if len(words) > 1 and words[0] == 'the':
+        words = words[1:]
+    return ' '.join(words)
+
+def source_domain(source):
+    """Domain of a scrape source if it is a URL or domain, else None"""
+    source = (source or '').strip()
+    if '://' in source or (' ' not in source and '.' in source):
+        return normalize_domain(source)
+    return None
+
+def name_shingles(key):
+    compact = key.replace(' ', '')
+    if len(compact) < 3:
+        return {compact} if compact else set()
+    padded = f' {compact} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def description_shingles(description):
+    words = WORD_PATTERN.findall((description or '').lower())
+    return {f'{first} {second}' for first, second in zip(words, words[1:])}
+
+class MinHasher:
+    def __init__(self):
+        rng = np.random.default_rng(MINHASH_SEED)
+        self.a = rng.integers(1, MINHASH_PRIME, MINHASH_PERMUTATIONS, dtype=np.uint64)
+        self.b = rng.integers(0, MINHASH_PRIME, MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+    def signatures(self, shingle_sets):
+        """
+        MinHash signatures of many sets of strings in one vectorized pass.
+
+        Returns:
+            list: Signature arrays aligned with shingle_sets (None for an
+                empty set)
+        """
+        sizes = [len(shingles) for shingles in shingle_sets]
+        total = sum(sizes)
+        if not total:
+            return [None] * len(shingle_sets)
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode('utf-8')) for shingles in shingle_sets for shingle in shingles),
+            dtype=np.uint64, count=total
+        )
+        permuted = (hashes[:, None] * self.a + self.b) % MINHASH_PRIME
+        offsets = np.cumsum([0] + sizes[:-1])
+        non_empty = np.array(sizes) > 0
+        minimums = np.minimum.reduceat(permuted, offsets[non_empty], axis=0)
+        rows = iter(minimums.astype(np.int64))
+        return [next(rows) if size else None for size in sizes]
+
+    def signature(self, shingles):
+        """MinHash signature of a set of strings, or None for an empty set"""
+        return self.signatures([shingles])[0]
+
+def band_keys(kind, signature):
+    bands, rows = LSH_BANDS[kind]
+    return [(kind, band, values.tobytes()) for band, values in enumerate(signature[:bands * rows].reshape(bands, rows))]
+
+def signature_matrix(signatures):
+    """Stack signatures into rows, with -1 for missing ones"""
+    missing = np.full(MINHASH_PERMUTATIONS, -1, dtype=np.int64)
+    signatures = [missing if signature is None else signature for signature in signatures]
+    return np.stack(signatures) if signatures else np.empty((0, MINHASH_PERMUTATIONS), dtype=np.int64)
+
+def estimated_similarities(firsts, seconds):
+    """Fraction of equal MinHash values in each pair of signature rows (0 if either is missing)"""
+    present = (firsts[:, 0] >= 0) & (seconds[:, 0] >= 0)
+    return np.where(present, (firsts == seconds).mean(axis=1), 0.0)
+
+class DedupIndex(SyncedIndex):
+    """
+    In-memory index of companies by normalized name and domain, with
+    MinHash LSH buckets over name trigrams and description word pairs, so
+    near-duplicates are found without comparing against every company.
+    """
+    name = 'duplicate index'
+    sync_seconds = INDEX_SYNC_SECONDS
+
+    def __init__(self, hasher=None):
+        super().__init__()
+        self.hasher = hasher if hasher is not None or np is None else MinHasher()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.entries = {}  # company id -> (name key, domain, name signature, description signature)
+            self.by_key = {}
+            self.by_domain = {}
+            self.buckets = {}  # ('name' | 'description', band, rows) -> company ids
+
+    def entry_for(self, name, domain=None, website=None, description=None):
+        return self.entries_for([(name, domain, website, description)])[0]
+
+    def entries_for(self, companies):
+        """Index entries for (name, domain, website, description) tuples"""
+        keys = [normalize_company_name(name) for name, _, _, _ in companies]
+        domains = [normalize_domain(domain or website) for _, domain, website, _ in companies]
+        if self.hasher is None:
+            return [(key, domain, None, None) for key, domain in zip(keys, domains)]
+        return list(zip(
+            keys, domains,
+            self.hasher.signatures([name_shingles(key) for key in keys]),
+            self.hasher.signatures([description_shingles(company[3]) for company in companies])
+        ))
+
+    def entry_buckets(self, entry):
+        _, _, name_signature, description_signature = entry
+        buckets = []
+        for kind, signature in (('name', name_signature), ('description', description_signature)):
+            if signature is not None:
+                buckets.extend(band_keys(kind, signature))
+        return buckets
+
+    def add(self, company_id, entry):
+        with self.lock:
+            self.discard(company_id)
+            self.entries[company_id] = entry
+            key, domain = entry[0], entry[1]
+            if key:
+                self.by_key.setdefault(key, set()).add(company_id)
+            if domain:
+                self.by_domain.setdefault(domain, set()).add(company_id)
+            for bucket in self.entry_buckets(entry):
+                self.buckets.setdefault(bucket, set()).add(company_id)
+
+    def discard(self, company_id):
+        with self.lock:
+            entry = self.entries.pop(company_id, None)
+            if entry is None:
+                return
+            for index, value in ((self.by_key, entry[0]), (self.by_domain, entry[1])):
+                if value in index:
+                    index[value].discard(company_id)
+                    if not index[value]:
+                        del index[value]
+            for bucket in self.entry_buckets(entry):
+                self.buckets[bucket].discard(company_id)
+                if not self.buckets[bucket]:
+                    del self.buckets[bucket]
+
+    def match_pairs(self, firsts, seconds, name_similarity=None, description_similarity=None):
+        """
+        Compare index entries pairwise. The MinHash similarities of the
+        pairs are estimated in one vectorized pass unless given.
+
+        Returns:
+            list: For each pair, (similarity 0-1, reason) if they look like
+                the same company, else None
+        """
+        results = [
+            (1.0, 'domain') if first[1] and first[1] == second[1] else
+            (1.0, 'name') if first[0] and first[0] == second[0] else None
+            for first, second in zip(firsts, seconds)
+        ]
+        if self.hasher is None or not results:
+            return results
+
+        if name_similarity is None:
+            name_similarity = estimated_similarities(
+                signature_matrix(entry[2] for entry in firsts), signature_matrix(entry[2] for entry in seconds)
+            )
+            description_similarity = estimated_similarities(
+                signature_matrix(entry[3] for entry in firsts), signature_matrix(entry[3] for entry in seconds)
+            )
+        combined = (name_similarity >= COMBINED_NAME_THRESHOLD) & (description_similarity >= COMBINED_DESCRIPTION_THRESHOLD)
+        for index in np.flatnonzero(
+            (name_similarity >= NAME_THRESHOLD) | (description_similarity >= DESCRIPTION_THRESHOLD) | combined
+        ):
+            if results[index]:
+                continue
+            if name_similarity[index] >= NAME_THRESHOLD:
+                results[index] = float(name_similarity[index]), 'similar name'
+            elif description_similarity[index] >= DESCRIPTION_THRESHOLD:
+                results[index] = float(description_similarity[index]), 'similar description'
+            else:
+                similarity = (name_similarity[index] + description_similarity[index]) / 2
+                results[index] = float(similarity), 'similar name and description'
+        return results
+
+    def candidates(self, entry, exclude=None):
+        """
+        Companies that look like duplicates of an entry.
+
+        Returns:
+            list: (company id, similarity, reason), most similar first
+        """
+        with self.lock:
+            ids = set(self.by_key.get(entry[0], ())) | set(self.by_domain.get(entry[1], ()))
+            for bucket in self.entry_buckets(entry):
+                bucket_ids = self.buckets.get(bucket, ())
+                if len(bucket_ids) <= MAX_BUCKET_SIZE:
+                    ids.update(bucket_ids)
+            ids.discard(exclude)
+            ids = list(ids)
+            results = self.match_pairs([entry] * len(ids), [self.entries[company_id] for company_id in ids])
+
+        matches = [(company_id, *result) for company_id, result in zip(ids, results) if result]
+        return sorted(matches, key=lambda match: (-match[1], match[0]))
+
+    def duplicate_groups(self):
+        """
+        Groups of companies that look like duplicates of each other, from
+        the name/domain keys and every LSH bucket.
+
+        Returns:
+            list: Lists of company ids, lowest id first
+        """
+        parent = {}
+
+        def find(company_id):
+            parent.setdefault(company_id, company_id)
+            while parent[company_id] != company_id:
+                parent[company_id] = parent[parent[company_id]]
+                company_id = parent[company_id]
+            return company_id
+
+        with self.lock:
+            groups = list(self.by_key.values()) + list(self.by_domain.values())
+            for ids in groups:
+                if len(ids) > 1:
+                    first, *rest = ids
+                    for company_id in rest:
+                        parent[find(company_id)] = find(first)
+
+            pairs = set()
+            for ids in self.buckets.values():
+                if 1 < len(ids) <= MAX_BUCKET_SIZE:
+                    pairs.update(combinations(sorted(ids), 2))
+            pairs = sorted(pairs)
+
+            if self.hasher is not None:
+                # Stack every signature once and compare the pairs' rows
+                rows = {company_id: row for row, company_id in enumerate(self.entries)}
+                signatures = [
+                    signature_matrix(entry[field] for entry in self.entries.values()) for field in (2, 3)
+                ]
+            for start in range(0, len(pairs), PAIR_BATCH_SIZE):
+                batch = [(first, second) for first, second in pairs[start:start + PAIR_BATCH_SIZE]
+                         if find(first) != find(second)]
+                firsts = [self.entries[first] for first, _ in batch]
+                seconds = [self.entries[second] for _, second in batch]
+                if self.hasher is None:
+                    results = self.match_pairs(firsts, seconds)
+                else:
+                    first_rows = np.fromiter((rows[first] for first, _ in batch), dtype=np.int64, count=len(batch))
+                    second_rows = np.fromiter((rows[second] for _, second in batch), dtype=np.int64, count=len(batch))
+                    results = self.match_pairs(firsts, seconds, *[
+                        estimated_similarities(matrix[first_rows], matrix[second_rows]) for matrix in signatures
+                    ])
+                for (first, second), result in zip(batch, results):
+                    if result:
+                        parent[find(second)] = find(first)
+
+        members = {}
+        for company_id in parent:
+            members.setdefault(find(company_id), []).append(company_id)
+        return sorted((sorted(ids) for ids in members.values() if len(ids) > 1), key=lambda ids: ids[0])
+
+    def prepare_rows(self, rows, batch_size=LOAD_BATCH_SIZE):
+        """Index entries for (id, *INDEXED_FIELDS) rows, by company id"""
+        rows = list(rows)
+        entries = {}
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            entries.update(zip((row[0] for row in batch), self.entries_for([tuple(row[1:]) for row in batch])))
+        return entries
+
+    def indexed_columns(self):
+        return select(Company.id, *[getattr(Company, field) for field in INDEXED_FIELDS])
+
+    def build(self):
+        fresh = DedupIndex(self.hasher)
+        fresh.apply(self.prepare_rows(db.session.execute(self.indexed_columns())))
+        logger.info("Loaded %s companies into the duplicate index", len(fresh.entries))
+        return fresh
+
+    def swap(self, fresh):
+        self.entries, self.by_key, self.by_domain, self.buckets = \
+            fresh.entries, fresh.by_key, fresh.by_domain, fresh.buckets
+
+    def read_changes(self, since):
+        return self.prepare_rows(db.session.execute(self.indexed_columns().where(Company.updated_at >= since)))
+
+    def apply(self, changes):
+        with self.lock:
+            for company_id, entry in changes.items():
+                if entry is None:
+                    self.discard(company_id)
+                else:
+                    self.add(company_id, entry)
+
+dedup_index = DedupIndex()
+
+def find_duplicates(name, domain=None, website=None, description=None, exclude=None):
+    """
+    Companies that look like duplicates of the given details.
+
+    Returns:
+        list: (company id, similarity, reason), most similar first
+    """
+    dedup_index.ensure_current()
+    return dedup_index.candidates(dedup_index.entry_for(name, domain, website, description), exclude)
+
+def find_duplicate_company(name=None, domain=None, description=None, exact=False):
+    """
+    An existing company matching a name and/or domain (e.g. a scrape
+    source or new lead's company), so it isn't scraped and summarized
+    again.
+
+    Args:
+        exact (bool): Only match the same normalized name or domain, for
+            callers that reuse the company without asking
+
+    Returns:
+        Company: The closest match, or None
+    """
+    if not name and not domain:
+        return None
+    matches = find_duplicates(name or domain, domain=domain, description=description)
+    if exact:
+        matches = [match for match in matches if match[2] in EXACT_MATCH_REASONS]
+    return db.session.get(Company, matches[0][0]) if matches else None
+
+def duplicate_groups():
+    dedup_index.ensure_current()
+    return dedup_index.duplicate_groups()
+
+def merge_companies(target_id, source_ids):
+    """
+    Merge duplicate companies into one. Leads, competitor and sentiment
+    analyses and enrichment tasks move to the target, which also takes
+    any field (and social media link) it is missing from the sources;
+    the sources are then deleted and the target's leads rescored.
+
+    Args:
+        target_id (int): Company to keep
+        source_ids (list): Companies to merge into it
+
+    Returns:
+        dict: Number of companies merged and leads moved
+
+    Raises:
+        ValueError: If a company isn't found or the target is also a source
+    """
+    source_ids = sorted(set(source_ids))
+    if not source_ids:
+        raise ValueError('No companies to merge')
+    if target_id in source_ids:
+        raise ValueError('A company cannot be merged into itself')
+
+    target = db.session.get(Company, target_id)
+    sources = Company.query.filter(Company.id.in_(source_ids)).order_by(Company.id).all()
+    missing = set(source_ids) - {source.id for source in sources}
+    if not target or missing:
+        raise ValueError(f"Companies not found: {sorted(missing | ({target_id} if not target else set()))}")
+
+    for field in ENRICHED_FIELDS + ('summary',):
+        if getattr(target, field) in (None, '', 'Unknown'):
+            for source in sources:
+                if getattr(source, field) not in (None, '', 'Unknown'):
+                    setattr(target, field, getattr(source, field))
+                    break
+
+    target_social = SocialMedia.query.filter_by(company_id=target_id).first()
+    for social in SocialMedia.query.filter(SocialMedia.company_id.in_(source_ids)).order_by(SocialMedia.id):
+        if target_social is None:
+            social.company_id = target_id
+            target_social = social
+            continue
+        for network in ('linkedin', 'twitter', 'instagram', 'facebook'):
+            if not getattr(target_social, network) and getattr(social, network):
+                setattr(target_social, network, getattr(social, network))
+        db.session.delete(social)
+    db.session.flush()
+
+    now = datetime.utcnow()
+    leads_moved = db.session.execute(
+        update(Lead).where(Lead.company_id.in_(source_ids)).values(company_id=target_id, updated_at=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    for model in (CompetitorAnalysis, SentimentAnalysis, EnrichmentTask):
+        db.session.execute(
+            update(model).where(model.company_id.in_(source_ids)).values(company_id=target_id)
+            .execution_options(synchronize_session=False)
+        )
+    CompanyFingerprint.query.filter(CompanyFingerprint.company_id.in_(source_ids)).delete(synchronize_session=False)
+
+    # Relationship collections loaded before the bulk updates are stale
+    for source in sources:
+        db.session.expire(source)
+        db.session.delete(source)
+    db.session.flush()
+
+    rescore_leads(Lead.query.join(Lead.company).filter(Lead.company_id == target_id))
+    db.session.commit()
+    return {'merged': len(sources), 'leads_moved': leads_moved}
+
+# Keep the index current as companies change; it follows once the
+# transaction commits
+def pending_dedup_changes(target):
+    return object_session(target).info.setdefault('dedup_index_changes', {})
+
+@event.listens_for(Company, 'after_insert')
+def company_inserted(mapper, connection, target):
+    pending_dedup_changes(target)[target.id] = (target.name, target.domain, target.website, target.description)
+
+@event.listens_for(Company, 'after_update')
+def company_changed(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in INDEXED_FIELDS):
+        company_inserted(mapper, connection, target)
+
+@event.listens_for(Company, 'after_delete')
+def company_deleted(mapper, connection, target):
+    pending_dedup_changes(target)[target.id] = None
+
+@event.listens_for(Session, 'after_commit')
+def apply_dedup_changes(session):
+    changes = session.info.pop('dedup_index_changes', None)
+    # An index that hasn't started loading reads these from the table instead
+    if not changes or not dedup_index.tracks_commits():
+        return
+    dedup_index.apply_committed({
+        company_id: None if fields is None else dedup_index.entry_for(*fields)
+        for company_id, fields in changes.items()
+    })
+
+@event.listens_for(Session, 'after_rollback')
+def discard_dedup_changes(session):
+    session.info.pop('dedup_index_changes', None)
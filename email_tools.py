@@ -1,7 +1,32 @@
 import re
+import concurrent.futures
+from functools import lru_cache
 # Import properly from the package
 from email_validator import validate_email as check_email, EmailNotValidError
 
+from metrics import CACHE_REQUESTS
+
+DISPOSABLE_DOMAINS = {
+    'mailinator.com', 'tempmail.com', 'temp-mail.org', 'guerrillamail.com', 
+    'yopmail.com', 'maildrop.cc', '10minutemail.com', 'trashmail.com',
+    'disposablemail.com', 'sharklasers.com', 'throwawaymail.com'
+}
+
+WELL_KNOWN_DOMAINS = {
+    'gmail.com', 'yahoo.com', 'hotmail.com', 'outlook.com', 'aol.com', 
+    'icloud.com', 'protonmail.com', 'mail.com', 'zoho.com', 'yandex.com'
+}
+
+# Concurrent DNS lookups when validating emails in bulk
+BULK_DNS_WORKERS = 16
+
+# Plain ASCII addresses, whose local part needs no further checks; anything
+# else goes through email_validator in full
+SIMPLE_EMAIL_PATTERN = re.compile(
+    r"^([A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+(?:\.[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+)*)"
+    r"@((?:[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?\.)+[A-Za-z]{2,63})$"
+)
+
 def validate_email(email):
     """
     Validates an email address using multiple checks:
@@ -39,27 +64,119 @@ def validate_email(email):
         return result
     
     # Check for disposable email domains
-    disposable_domains = [
-        'mailinator.com', 'tempmail.com', 'temp-mail.org', 'guerrillamail.com', 
-        'yopmail.com', 'maildrop.cc', '10minutemail.com', 'trashmail.com',
-        'disposablemail.com', 'sharklasers.com', 'throwawaymail.com'
-    ]
     domain = email.split('@')[-1].lower()
-    if domain in disposable_domains:
+    if domain in DISPOSABLE_DOMAINS:
         result['is_disposable'] = True
         result['status'] = 'risky'
         result['reason'] = 'Disposable email domain detected'
         return result
     
     # Check for well-known domains
-    well_known_domains = [
-        'gmail.com', 'yahoo.com', 'hotmail.com', 'outlook.com', 'aol.com', 
-        'icloud.com', 'protonmail.com', 'mail.com', 'zoho.com', 'yandex.com'
-    ]
-    if domain in well_known_domains:
+    if domain in WELL_KNOWN_DOMAINS:
         result['status'] = 'valid'
     else:
         # For other domains, mark as valid but with lower confidence
         result['status'] = 'valid'
     
-    return result
\ No newline at end of file
+    return result
+
+
+@lru_cache(maxsize=65536)
+def check_domain_syntax(domain):
+    """Return why an email domain is invalid, or None if it's fine"""
+    try:
+        check_email(f'postmaster@{domain}', check_deliverability=False)
+        return None
+    except EmailNotValidError as e:
+        return str(e)
+
+CACHE_REQUESTS.watch_lru_cache('email_domain_syntax', check_domain_syntax)
+
+def validate_emails(emails, check_deliverability=True, domain_cache=None):
+    """
+    Validate many email addresses at once.
+    
+    Gives the same results as validate_email, but the DNS deliverability
+    check runs once per distinct domain (concurrently) instead of once per
+    address, which is what makes bulk imports fast.
+    
+    Args:
+        emails (list): Email addresses
+        check_deliverability (bool): Whether to check DNS MX records
+        domain_cache (dict): Optional domain -> error message (None when
+            deliverable) mapping shared across calls
+    
+    Returns:
+        list: One result dict per email, in order
+    """
+    domain_cache = domain_cache if domain_cache is not None else {}
+    results = []
+    pending_domains = {}
+    
+    # Syntax checks are local; simple addresses only have their domain
+    # checked, once per domain
+    for email in emails:
+        result = {
+            'status': 'unknown',
+            'reason': None,
+            'is_disposable': False,
+            'is_well_formed': False
+        }
+        results.append(result)
+        
+        if not email or not isinstance(email, str):
+            result['status'] = 'invalid'
+            result['reason'] = 'Empty or invalid email format'
+            continue
+        
+        match = SIMPLE_EMAIL_PATTERN.match(email) if len(email) <= 254 else None
+        if match and len(match.group(1)) <= 64:
+            domain = match.group(2).lower()
+            error = check_domain_syntax(domain)
+        else:
+            try:
+                domain = check_email(email, check_deliverability=False).domain.lower()
+                error = None
+            except EmailNotValidError as e:
+                error = str(e)
+        
+        if error:
+            result['status'] = 'invalid'
+            result['reason'] = error
+            continue
+        
+        result['is_well_formed'] = True
+        result['domain'] = domain
+        if check_deliverability and domain not in domain_cache:
+            pending_domains.setdefault(domain, email)
+    
+    # One deliverability lookup per new domain
+    def check_domain(email):
+        try:
+            check_email(email, check_deliverability=True)
+            return None
+        except EmailNotValidError as e:
+            return str(e)
+    
+    if pending_domains:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=BULK_DNS_WORKERS) as executor:
+            for domain, error in zip(pending_domains, executor.map(check_domain, pending_domains.values())):
+                domain_cache[domain] = error
+    
+    for result in results:
+        domain = result.pop('domain', None)
+        if not result['is_well_formed']:
+            continue
+        
+        error = domain_cache.get(domain) if check_deliverability else None
+        if error:
+            result['status'] = 'invalid'
+            result['reason'] = error
+        elif domain in DISPOSABLE_DOMAINS:
+            result['is_disposable'] = True
+            result['status'] = 'risky'
+            result['reason'] = 'Disposable email domain detected'
+        else:
+            result['status'] = 'valid'
+    
+    return results
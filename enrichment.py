@@ -0,0 +1,205 @@
+import logging
+from datetime import datetime
+from sqlalchemy import update
+
+from app import db
+from models import Lead, Company, SocialMedia, EnrichmentTask
+from scraper import scrape_company_data
+from social_media_detector import detect_social_media
+from ai_summarizer import summarize_company
+from scoring import count_social_profiles, get_scoring_weights, score_lead
+from write_batcher import submit_write
+
+logger = logging.getLogger(__name__)
+
+# Company fields filled from scraped data when they're empty or 'Unknown'
+ENRICHED_FIELDS = (
+    'industry', 'size', 'description', 'website', 'domain', 'country',
+    'revenue', 'linkedin_activity', 'target_audience', 'owner_name',
+    'owner_email', 'owner_email_status', 'owner_phone', 'owner_linkedin'
+)
+
+def apply_company_data(company, company_data, overwrite=False):
+    """
+    Write scraped data to a company and rescore its leads.
+
+    Only writes what company_data holds: it never scrapes, summarizes or
+    searches for social media, so it's safe to run inside a batched write
+    transaction. Use fetch_summary_and_social_media beforehand to fill in
+    what's missing.
+
+    Args:
+        company (Company): Company to update
+        company_data (dict): Scraped company data, optionally with a
+            'summary' and 'social_media' (stored as the company's social
+            media if it has none yet, even when every link is None)
+        overwrite (bool): Replace fields that already have a value (for
+            re-scrapes of a changed site), not just empty/'Unknown' ones
+    """
+    for field in ENRICHED_FIELDS:
+        value = company_data.get(field)
+        if value and value != 'Unknown' and (overwrite or getattr(company, field) in (None, '', 'Unknown')):
+            setattr(company, field, value)
+
+    if company_data.get('summary') and (overwrite or not company.summary):
+        company.summary = company_data['summary']
+
+    social_media = SocialMedia.query.filter_by(company_id=company.id).first()
+    social_links = company_data.get('social_media')
+    if not social_media and social_links is not None:
+        social_media = SocialMedia(
+            company_id=company.id,
+            linkedin=social_links.get('linkedin'),
+            twitter=social_links.get('twitter'),
+            instagram=social_links.get('instagram'),
+            facebook=social_links.get('facebook')
+        )
+        db.session.add(social_media)
+    db.session.flush()
+
+    # Company details feed into the score, so rescore its leads
+    social_profile_count = count_social_profiles(social_media)
+    weights = get_scoring_weights()
+    leads = db.session.query(Lead.id, Lead.email_status).filter(Lead.company_id == company.id).all()
+    if leads:
+        db.session.execute(update(Lead), [
+            {
+                'id': lead.id,
+                'score': score_lead(lead.email_status, company.size, company.industry, social_profile_count, weights)
+            }
+            for lead in leads
+        ])
+
+def fetch_summary_and_social_media(company_data, name, description=None, summary=None, has_social_media=False):
+    """
+    Summarize a company and look up its social media where company_data
+    doesn't have them and the company doesn't either. Makes network calls
+    only, without database access, so it can run on worker threads.
+
+    Args:
+        company_data (dict): Scraped company data, updated in place
+        name (str): Company name
+        description (str): Description to summarize
+        summary (str): The company's current summary, if any
+        has_social_media (bool): Whether the company has social media
+            stored already
+
+    Returns:
+        dict: company_data
+    """
+    if not company_data.get('summary') and not summary and description:
+        try:
+            company_data['summary'] = summarize_company(description)
+        except Exception as e:
+            logger.error("Error generating summary for %s: %s", name, e)
+
+    social_links = company_data.get('social_media')
+    if (not social_links or not any(social_links.values())) and not has_social_media:
+        company_data['social_media'] = detect_social_media(name)
+
+    return company_data
+
+def fetch_enrichment_data(company):
+    """
+    Do the slow part of enriching a company without writing anything:
+    scrape it, and summarize it and look up its social media if it's
+    missing them.
+
+    Args:
+        company (Company): Company to enrich
+
+    Returns:
+        dict: Company data for apply_company_data
+    """
+    company_data = scrape_company_data(company.website or company.domain or company.name) or {}
+
+    description = company.description
+    if description in (None, '', 'Unknown'):
+        description = company_data.get('description') or description
+    return fetch_summary_and_social_media(
+        company_data, company.name,
+        description=description,
+        summary=company.summary,
+        has_social_media=SocialMedia.query.filter_by(company_id=company.id).count() > 0
+    )
+
+def apply_enrichment(company_id, company_data):
+    """Write fetched enrichment data to a company; see fetch_enrichment_data"""
+    company = db.session.get(Company, company_id)
+    if not company:
+        raise ValueError(f"Company {company_id} not found")
+    apply_company_data(company, company_data)
+    return company_id
+
+def enrich_company(company):
+    """
+    Scrape, summarize and find social media for a company, filling in any
+    fields that are still missing, then rescore its leads.
+
+    Args:
+        company (Company): Company to enrich
+    """
+    apply_company_data(company, fetch_enrichment_data(company))
+
+def finish_enrichment_task(task_id, company_id, company_data=None, error=None):
+    """Apply a task's fetched data, or record why fetching it failed"""
+    task = db.session.get(EnrichmentTask, task_id)
+    if error is None:
+        apply_enrichment(company_id, company_data)
+        task.status = 'done'
+        task.error = None
+    else:
+        task.status = 'failed'
+        task.error = error
+    task.processed_at = datetime.utcnow()
+
+def fail_enrichment_task(task_id, error):
+    finish_enrichment_task(task_id, None, error=error)
+
+def process_enrichment_tasks(limit=50):
+    """
+    Run pending enrichment tasks, oldest first.
+
+    Companies are scraped one after another while their writes go to the
+    write batcher behind them, so commits are grouped rather than one per
+    company.
+
+    Args:
+        limit (int): Maximum number of tasks to run
+
+    Returns:
+        dict: Number of tasks done and failed
+    """
+    counts = {'done': 0, 'failed': 0}
+    tasks = (
+        EnrichmentTask.query
+        .filter_by(status='pending')
+        .order_by(EnrichmentTask.id)
+        .limit(limit)
+        .all()
+    )
+
+    writes = []
+    for task in tasks:
+        task_id, company_id = task.id, task.company_id
+        try:
+            company_data = fetch_enrichment_data(db.session.get(Company, company_id))
+        except Exception as e:
+            logger.error("Error enriching company %s: %s", company_id, e)
+            logger.debug("Enrichment error details", exc_info=True)
+            writes.append((task_id, company_id, submit_write(fail_enrichment_task, task_id, str(e)), False))
+            continue
+        writes.append((task_id, company_id, submit_write(finish_enrichment_task, task_id, company_id, company_data), True))
+
+    # Wait for the writes; a task whose data couldn't be written is marked failed
+    for task_id, company_id, write, fetched in writes:
+        try:
+            write.result()
+        except Exception as e:
+            logger.error("Error saving enrichment of company %s: %s", company_id, e)
+            if fetched:
+                submit_write(fail_enrichment_task, task_id, str(e)).result()
+            fetched = False
+        counts['done' if fetched else 'failed'] += 1
+
+    return counts
@@ -0,0 +1,269 @@
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, event, inspect, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, load_only, object_session
+
+from app import db
+from models import Lead, ReminderCursor
+from lead_queries import (
+    DEFAULT_PAGE_SIZE, LIST_FIELDSET, decode_cursor, encode_cursor, lead_load_options, serialize_lead
+)
+
+logger = logging.getLogger(__name__)
+
+# Reminders due within the same bucket (seconds) are sent together, so a
+# burst of follow-ups costs one wake-up rather than one each; a reminder
+# goes out at most this late
+REMINDER_BUCKET_SECONDS = int(os.environ.get("REMINDER_BUCKET_SECONDS", "60"))
+
+# Longest the dispatcher sleeps without checking for follow-ups scheduled
+# by other processes (seconds). Changes made in this process wake it
+# straight away.
+REMINDER_MAX_SLEEP_SECONDS = float(os.environ.get("REMINDER_MAX_SLEEP_SECONDS", "300"))
+
+# Leads claimed and handed to the reminder handler at a time
+REMINDER_BATCH_SIZE = 500
+
+REMINDER_CURSOR_NAME = 'followups'
+
+# What a reminder handler receives for each lead: the list view plus notes
+REMINDER_FIELDSET = LIST_FIELDSET._replace(lead=LIST_FIELDSET.lead + ('follow_up_notes',))
+
+# Set when a transaction that scheduled or changed a follow-up commits
+followups_changed = threading.Event()
+
+def due_followups(due_before=None, follow_up_type=None, limit=DEFAULT_PAGE_SIZE, cursor=None,
+                  fieldset=LIST_FIELDSET):
+    """
+    One page of leads with a follow-up due by a time, soonest first.
+
+    The page is a range scan of the (next_follow_up, id) index, or of
+    (follow_up_type, next_follow_up, id) when filtered by type, starting
+    at the cursor, so its cost doesn't grow with the number of leads.
+
+    Args:
+        due_before (datetime): Latest due time to include (default: now)
+        follow_up_type (str): Only this follow-up type, e.g. 'email'
+        limit (int): Page size
+        cursor (str): Cursor returned with the previous page, if any
+        fieldset (FieldSet): Fields to serialize
+
+    Returns:
+        tuple: (serialized leads, cursor for the next page or None)
+
+    Raises:
+        ValueError: For a bad cursor
+    """
+    due_before = due_before or datetime.utcnow()
+    query = (
+        Lead.query.join(Lead.company)
+        .options(*lead_load_options(fieldset, extra_columns=('next_follow_up',)))
+        .filter(Lead.next_follow_up <= due_before)
+    )
+    if follow_up_type:
+        query = query.filter(Lead.follow_up_type == follow_up_type)
+    if cursor:
+        due_at, last_id = decode_cursor(cursor, 'next_follow_up', 'asc')
+        query = query.filter(after_position(due_at, last_id))
+
+    rows = query.order_by(Lead.next_follow_up, Lead.id).limit(limit + 1).all()
+    leads = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor('next_follow_up', 'asc', leads[-1].next_follow_up, leads[-1].id)
+    return [serialize_lead(lead, fieldset) for lead in leads], next_cursor
+
+def after_position(due_at, lead_id):
+    """
+    Leads after a (next_follow_up, id) position. The leading
+    'next_follow_up >= due_at' bound keeps it an index range.
+    """
+    return and_(
+        Lead.next_follow_up >= due_at,
+        or_(Lead.next_follow_up > due_at, Lead.id > lead_id)
+    )
+
+def bucket_end(due_at):
+    """End of the REMINDER_BUCKET_SECONDS bucket a due time falls in"""
+    seconds = (due_at - datetime.min).total_seconds()
+    return datetime.min + timedelta(seconds=-(-seconds // REMINDER_BUCKET_SECONDS) * REMINDER_BUCKET_SECONDS)
+
+def reminder_cursor(now=None):
+    """
+    The dispatcher's position, created at the current time on first use
+    so follow-ups that were already overdue aren't all sent at once.
+    """
+    cursor = db.session.get(ReminderCursor, REMINDER_CURSOR_NAME)
+    if cursor is None:
+        try:
+            db.session.add(ReminderCursor(name=REMINDER_CURSOR_NAME, due_at=now or datetime.utcnow(), lead_id=0))
+            db.session.commit()
+        except IntegrityError:
+            # Another dispatcher created it first
+            db.session.rollback()
+        cursor = db.session.get(ReminderCursor, REMINDER_CURSOR_NAME)
+    return cursor
+
+def next_reminder_due():
+    """Due time of the next follow-up the dispatcher hasn't sent, or None"""
+    cursor = reminder_cursor()
+    return db.session.query(Lead.next_follow_up) \
+        .filter(after_position(cursor.due_at, cursor.lead_id)) \
+        .order_by(Lead.next_follow_up, Lead.id).limit(1).scalar()
+
+def claim_reminders(now=None, limit=REMINDER_BATCH_SIZE):
+    """
+    Claim the next follow-ups due by now, by moving the reminder cursor
+    past them with a compare-and-swap, so concurrent dispatchers never
+    send the same reminder.
+
+    Returns:
+        list: Ids of the claimed leads, oldest due first
+    """
+    now = now or datetime.utcnow()
+    while True:
+        cursor = reminder_cursor(now)
+        due_at, lead_id = cursor.due_at, cursor.lead_id
+        due = (
+            Lead.query.options(load_only(Lead.id, Lead.next_follow_up))
+            .filter(after_position(due_at, lead_id), Lead.next_follow_up <= now)
+            .order_by(Lead.next_follow_up, Lead.id)
+            .limit(limit)
+            .all()
+        )
+        if not due:
+            db.session.rollback()
+            return []
+
+        claimed = db.session.execute(
+            update(ReminderCursor)
+            .where(
+                ReminderCursor.name == REMINDER_CURSOR_NAME,
+                ReminderCursor.due_at == due_at,
+                ReminderCursor.lead_id == lead_id
+            )
+            .values(due_at=due[-1].next_follow_up, lead_id=due[-1].id, updated_at=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount == 1
+        db.session.commit()
+        if claimed:
+            return [lead.id for lead in due]
+        # Another dispatcher moved the cursor; continue from its position
+        db.session.expire_all()
+
+def log_reminders(leads):
+    """Default reminder handler: log each due follow-up"""
+    for lead in leads:
+        logger.info(
+            "Follow-up due for %s <%s> at %s: %s at %s",
+            lead['name'], lead['email'], lead['company']['name'],
+            lead.get('follow_up_type') or 'follow-up', lead['next_follow_up']
+        )
+
+class FollowUpDispatcher:
+    """
+    Sends follow-up reminders as they come due.
+
+    Rather than polling, it sleeps until the end of the bucket holding the
+    next unsent follow-up (an index seek), then claims everything due and
+    passes it to the handler in batches. Scheduling a follow-up in this
+    process wakes it early; follow-ups scheduled by other processes are
+    picked up within REMINDER_MAX_SLEEP_SECONDS.
+
+    Reminders are sent at most once: a batch whose handler fails is
+    logged, not retried. Follow-ups scheduled for a time the dispatcher
+    has already passed get no reminder, but are still listed by
+    /api/followups.
+    """
+
+    def __init__(self, app, handler=log_reminders, max_sleep_seconds=REMINDER_MAX_SLEEP_SECONDS):
+        self.app = app
+        self.handler = handler
+        self.max_sleep_seconds = max_sleep_seconds
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def dispatch(self, now=None):
+        """
+        Send the reminders due by now.
+
+        Returns:
+            int: Number of reminders sent
+        """
+        sent = 0
+        with self.app.app_context():
+            while True:
+                lead_ids = claim_reminders(now)
+                if not lead_ids:
+                    break
+                leads = (
+                    Lead.query.join(Lead.company)
+                    .options(*lead_load_options(REMINDER_FIELDSET))
+                    .filter(Lead.id.in_(lead_ids))
+                    .order_by(Lead.next_follow_up, Lead.id)
+                    .all()
+                )
+                try:
+                    self.handler([serialize_lead(lead, REMINDER_FIELDSET) for lead in leads])
+                    sent += len(leads)
+                except Exception as e:
+                    logger.error("Error sending %s follow-up reminders: %s", len(leads), e)
+                    logger.debug("Reminder error details", exc_info=True)
+                db.session.expunge_all()
+                if len(lead_ids) < REMINDER_BATCH_SIZE:
+                    break
+            db.session.remove()
+        return sent
+
+    def seconds_until_next_bucket(self):
+        """Seconds until the bucket of the next unsent follow-up ends, capped at max_sleep_seconds"""
+        with self.app.app_context():
+            due_at = next_reminder_due()
+            db.session.remove()
+        if due_at is None:
+            return self.max_sleep_seconds
+        return max(0.0, min(self.max_sleep_seconds, (bucket_end(due_at) - datetime.utcnow()).total_seconds()))
+
+    def run_forever(self):
+        logger.info("Follow-up reminder dispatcher started")
+        while not self.stop_event.is_set():
+            followups_changed.clear()
+            try:
+                self.dispatch()
+                wait = self.seconds_until_next_bucket()
+            except Exception as e:
+                logger.error("Follow-up dispatch failed: %s", e)
+                wait = self.max_sleep_seconds
+            followups_changed.wait(wait)
+
+    def start(self):
+        """Run the dispatcher loop in a background thread"""
+        self.thread = threading.Thread(target=self.run_forever, name='followup-reminders', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        followups_changed.set()
+        if self.thread:
+            self.thread.join()
+
+# Wake the dispatcher when a follow-up is scheduled or moved, once the
+# change commits
+@event.listens_for(Lead, 'after_insert')
+@event.listens_for(Lead, 'after_update')
+def lead_followup_changed(mapper, connection, target):
+    if target.next_follow_up is not None and inspect(target).attrs.next_follow_up.history.has_changes():
+        object_session(target).info['followups_changed'] = True
+
+@event.listens_for(Session, 'after_commit')
+def wake_dispatcher(session):
+    if session.info.pop('followups_changed', None):
+        followups_changed.set()
+
+@event.listens_for(Session, 'after_rollback')
+def discard_followup_changes(session):
+    session.info.pop('followups_changed', None)
@@ -0,0 +1,154 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func, select
+
+from app import db
+from models import DeletedCompany
+
+logger = logging.getLogger(__name__)
+
+# Rows changed by other processes are re-read from a little before the
+# last sync, to cover commits that were in flight while it ran (seconds)
+SYNC_OVERLAP_SECONDS = 60
+
+class SyncedIndex:
+    """
+    Base for in-memory indexes of the company table that are loaded and
+    kept in sync without holding up requests.
+
+    The first load runs in a background thread (started with
+    start_loading, e.g. at app startup), and requests only wait for it
+    if it hasn't finished. Afterwards, changes committed in this process
+    are applied from the session's after_commit hook, and other
+    processes' changes are picked up every sync_seconds by a background
+    sync: rows whose updated_at is newer than the last sync, and
+    deletions from the DeletedCompany tombstones. Slow reads and
+    computation happen outside self.lock, which is only held to swap in
+    or apply the results.
+
+    Subclasses implement build, swap, read_changes and apply.
+    """
+    name = 'index'
+    sync_seconds = 30
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        # One load or sync at a time; a thread starting one in the
+        # background acquires it and the background thread releases it
+        self.refresh_lock = threading.Lock()
+        self.loaded = threading.Event()
+        self.committed = None  # changes committed during a load, replayed after it
+        self.synced_at = None
+        self.tombstone_id = 0
+
+    def build(self):
+        """Read every indexed company and build the index state, without self.lock"""
+        raise NotImplementedError
+
+    def swap(self, state):
+        """Replace the index with state from build, under self.lock"""
+        raise NotImplementedError
+
+    def read_changes(self, since):
+        """
+        Read companies changed since a time and prepare their entries,
+        without self.lock
+
+        Returns:
+            dict: Company id -> entry for apply
+        """
+        raise NotImplementedError
+
+    def apply(self, changes):
+        """Apply {company id: entry, or None if deleted}, under self.lock"""
+        raise NotImplementedError
+
+    def start_loading(self, app):
+        """Load the index in a background thread, unless it is loaded or loading"""
+        if not self.loaded.is_set():
+            self.run_in_background(app, self.load)
+
+    def run_in_background(self, app, refresh):
+        if not self.refresh_lock.acquire(blocking=False):
+            return
+
+        def run():
+            try:
+                # The app context's teardown removes the thread's session
+                with app.app_context():
+                    refresh()
+            except Exception as e:
+                logger.error("Error refreshing the %s: %s", self.name, e)
+                logger.debug("Index refresh error details", exc_info=True)
+            finally:
+                self.refresh_lock.release()
+
+        threading.Thread(target=run, name=f'{self.name}-sync', daemon=True).start()
+
+    def ensure_current(self):
+        """
+        Wait for the index to load (loading it here if no background load
+        is running, or it failed), and start a background sync if it is
+        due. Needs an app context.
+        """
+        if not self.loaded.is_set():
+            # Waits for a background load that is running
+            with self.refresh_lock:
+                if not self.loaded.is_set():
+                    self.load()
+            return
+        if time.time() - self.synced_at.timestamp() >= self.sync_seconds:
+            self.run_in_background(current_app._get_current_object(), self.sync)
+
+    def last_tombstone_id(self):
+        return db.session.scalar(select(func.coalesce(func.max(DeletedCompany.id), 0)))
+
+    def load(self):
+        with self.lock:
+            self.committed = []
+        try:
+            started = datetime.utcnow()
+            tombstone_id = self.last_tombstone_id()
+            state = self.build()
+            with self.lock:
+                self.swap(state)
+                # Changes committed while reading may be missing from it
+                for changes in self.committed:
+                    self.apply(changes)
+                self.synced_at = started
+                self.tombstone_id = tombstone_id
+                self.loaded.set()
+        finally:
+            with self.lock:
+                self.committed = None
+
+    def sync(self):
+        started = datetime.utcnow()
+        tombstones = db.session.execute(
+            select(DeletedCompany.id, DeletedCompany.company_id)
+            .where(DeletedCompany.id > self.tombstone_id)
+            .order_by(DeletedCompany.id)
+        ).all()
+        changes = {company_id: None for _, company_id in tombstones}
+        changes.update(self.read_changes(self.synced_at - timedelta(seconds=SYNC_OVERLAP_SECONDS)))
+        with self.lock:
+            self.apply(changes)
+            self.synced_at = started
+            if tombstones:
+                self.tombstone_id = tombstones[-1].id
+
+    def tracks_commits(self):
+        """Whether changes committed now need applying (the index is loaded or loading)"""
+        return self.loaded.is_set() or self.committed is not None
+
+    def apply_committed(self, changes):
+        """Apply changes committed in this process (see apply)"""
+        with self.lock:
+            if self.committed is not None:
+                self.committed.append(changes)
+            elif self.loaded.is_set():
+                self.apply(changes)
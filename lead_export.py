@@ -0,0 +1,115 @@
+import csv
+import io
+import json
+import tempfile
+
+from lead_queries import serialize_lead_for_export
+
+# openpyxl is only needed for XLSX exports
+try:
+    from openpyxl import Workbook
+except ImportError:
+    Workbook = None
+
+# Rows fetched from the database per round trip while exporting
+EXPORT_BATCH_SIZE = 500
+
+# Column order of the flat export rows
+EXPORT_COLUMNS = [
+    'id', 'name', 'email', 'email_status', 'score', 'position', 'phone',
+    'linkedin_profile', 'priority', 'last_contact_date', 'next_follow_up',
+    'follow_up_notes', 'follow_up_type', 'company_name', 'industry',
+    'company_size', 'company_description', 'company_summary',
+    'company_website', 'company_domain', 'company_country', 'owner_name',
+    'owner_email', 'owner_phone', 'owner_linkedin', 'linkedin', 'twitter',
+    'instagram', 'facebook'
+]
+
+# format name -> (mimetype, file extension)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'json': ('application/json', 'json'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+}
+FORMAT_ALIASES = {'excel': 'xlsx'}
+
+def normalize_export_format(format_type):
+    """
+    Resolve a requested export format to one of EXPORT_FORMATS.
+
+    Raises:
+        ValueError: For unknown formats, or XLSX when openpyxl is missing
+    """
+    format_type = FORMAT_ALIASES.get(format_type, format_type)
+    if format_type not in EXPORT_FORMATS:
+        raise ValueError("'format' must be one of: csv, ndjson, json, xlsx")
+    if format_type == 'xlsx' and Workbook is None:
+        raise ValueError('XLSX export requires the openpyxl package')
+    return format_type
+
+def iter_export_rows(query):
+    """
+    Yield flat export rows for a lead query, a batch at a time.
+
+    The query runs with yield_per, which uses a server-side cursor where the
+    driver supports one, so only EXPORT_BATCH_SIZE leads (plus their social
+    media, fetched per batch by selectinload) are in memory at once.
+    """
+    for lead in query.yield_per(EXPORT_BATCH_SIZE):
+        yield serialize_lead_for_export(lead)
+
+def iter_csv(rows):
+    """Encode rows as CSV, yielding one chunk per batch of rows"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS, extrasaction='ignore')
+    writer.writeheader()
+
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+def iter_ndjson(rows):
+    """Encode rows as newline-delimited JSON"""
+    for row in rows:
+        yield json.dumps(row) + '\n'
+
+def iter_json_array(rows):
+    """Encode rows as a single JSON array without building it in memory"""
+    yield '['
+    for count, row in enumerate(rows):
+        yield (',\n' if count else '\n') + json.dumps(row)
+    yield '\n]\n'
+
+def write_xlsx(rows):
+    """
+    Write rows to an XLSX workbook in a temporary file.
+
+    Uses openpyxl's write-only mode, which streams rows to disk instead of
+    keeping the sheet in memory. XLSX is a zip archive so it can't be sent
+    until it's complete; the caller streams the returned file.
+
+    Returns:
+        file: Temporary file positioned at the start of the workbook
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Leads')
+    sheet.append(EXPORT_COLUMNS)
+    for row in rows:
+        sheet.append([row.get(column) for column in EXPORT_COLUMNS])
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+STREAM_WRITERS = {
+    'csv': iter_csv,
+    'ndjson': iter_ndjson,
+    'json': iter_json_array,
+}
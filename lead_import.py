@@ -0,0 +1,423 @@
+import csv
+import io
+import json
+import logging
+from datetime import datetime
+from functools import lru_cache
+from urllib.parse import urlparse
+from sqlalchemy import insert, select, update
+
+from app import db
+from models import Lead, Company, SocialMedia, EnrichmentTask
+from email_tools import validate_emails
+from metrics import CACHE_REQUESTS
+from scoring import count_social_profiles, get_scoring_weights, score_lead
+
+logger = logging.getLogger(__name__)
+
+# Rows written per INSERT ... ON CONFLICT statement (and per commit)
+IMPORT_BATCH_SIZE = 1000
+
+# Row errors kept in the import summary
+MAX_REPORTED_ERRORS = 100
+
+# format name -> accepted upload mimetypes
+IMPORT_FORMATS = {
+    'csv': ('text/csv', 'application/csv', 'application/vnd.ms-excel'),
+    'ndjson': ('application/x-ndjson', 'application/jsonl', 'application/json-lines'),
+}
+FORMAT_ALIASES = {'jsonl': 'ndjson'}
+
+# Alternative column names, so exports and hand-made sheets import as-is
+COLUMN_ALIASES = {
+    'company': 'company_name',
+    'size': 'company_size',
+    'website': 'company_website',
+    'domain': 'company_domain',
+    'country': 'company_country',
+    'linkedin': 'linkedin_profile',
+    'title': 'position',
+}
+
+PRIORITIES = ('low', 'medium', 'high')
+
+# Lead columns taken from the import rows (besides name and email)
+OPTIONAL_LEAD_FIELDS = ('position', 'phone', 'linkedin_profile', 'priority')
+
+def normalize_import_format(format_type=None, filename=None, mimetype=None):
+    """
+    Work out the import format from an explicit name, the file extension or
+    the upload's mimetype, in that order.
+
+    Raises:
+        ValueError: If the format is unknown or can't be determined
+    """
+    if not format_type and filename and '.' in filename:
+        format_type = filename.rsplit('.', 1)[1].lower()
+    if not format_type and mimetype:
+        format_type = next((name for name, mimetypes in IMPORT_FORMATS.items() if mimetype in mimetypes), None)
+
+    format_type = FORMAT_ALIASES.get(format_type, format_type)
+    if format_type not in IMPORT_FORMATS:
+        raise ValueError("'format' must be one of: csv, ndjson")
+    return format_type
+
+@lru_cache(maxsize=65536)
+def normalize_domain(value):
+    """Reduce a domain or website URL to a bare lower-case host name"""
+    if not value:
+        return None
+    value = value.strip().lower()
+    if '://' not in value:
+        value = '//' + value
+    host = urlparse(value).hostname or ''
+    if host.startswith('www.'):
+        host = host[4:]
+    return host or None
+
+CACHE_REQUESTS.watch_lru_cache('normalize_domain', normalize_domain)
+
+def normalize_row(row):
+    """Apply column aliases and turn blank values into None"""
+    normalized = {}
+    for key, value in row.items():
+        if key is None:
+            continue
+        key = key.strip().lower()
+        key = COLUMN_ALIASES.get(key, key)
+        if isinstance(value, str):
+            value = value.strip() or None
+        if key not in normalized or value is not None:
+            normalized[key] = value
+    return normalized
+
+def iter_import_rows(stream, format_type):
+    """
+    Read lead rows from a binary upload stream without loading it whole.
+
+    Args:
+        stream: Binary file-like object
+        format_type (str): csv or ndjson
+
+    Yields:
+        tuple: (line number, normalized row dict or None, error message or None)
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+    if format_type == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, normalize_row(row), None
+        return
+
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f'Invalid JSON: {e}'
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, 'Each line must be a JSON object'
+            continue
+        yield line_number, normalize_row(row), None
+
+class CompanyMap:
+    """
+    In-memory name/domain -> company lookup for an import.
+
+    Loaded with one query up front, so resolving a row's company never
+    touches the database. Also keeps the company fields the lead score
+    needs.
+    """
+
+    def __init__(self):
+        self.by_domain = {}
+        self.by_name = {}
+        self.scoring = {}
+
+        rows = db.session.execute(
+            select(
+                Company.id, Company.name, Company.domain, Company.website,
+                Company.size, Company.industry,
+                SocialMedia.linkedin, SocialMedia.twitter,
+                SocialMedia.instagram, SocialMedia.facebook
+            )
+            .outerjoin(SocialMedia, SocialMedia.company_id == Company.id)
+            .order_by(Company.id, SocialMedia.id)
+        )
+        for row in rows:
+            if row.id in self.scoring:
+                continue  # company's first social media row wins, as elsewhere
+            self.add(row.id, row.name, normalize_domain(row.domain) or normalize_domain(row.website),
+                     row.size, row.industry, count_social_profiles(row))
+
+    def add(self, company_id, name, domain, size, industry, social_profile_count=0):
+        if domain:
+            self.by_domain.setdefault(domain, company_id)
+        if name:
+            self.by_name.setdefault(name.lower(), company_id)
+        self.scoring[company_id] = (size, industry, social_profile_count)
+
+    def resolve(self, name, domain):
+        """Find a company id by domain, then by name"""
+        if domain and domain in self.by_domain:
+            return self.by_domain[domain]
+        if name:
+            return self.by_name.get(name.lower())
+        return None
+
+def company_key(row):
+    """Key identifying the company a row belongs to, for companies created within a batch"""
+    domain = normalize_domain(row.get('company_domain') or row.get('company_website'))
+    return domain or (row.get('company_name') or '').lower() or None
+
+def create_companies(rows, company_map, now):
+    """
+    Insert the companies referenced by rows that the map doesn't know yet,
+    and queue their enrichment.
+
+    Returns:
+        int: Number of companies created
+    """
+    new_companies = {}
+    new_names = {}  # lower-cased name -> key of the first new company with it
+    for row in rows:
+        domain = normalize_domain(row.get('company_domain') or row.get('company_website'))
+        name = row.get('company_name')
+        if company_map.resolve(name, domain) is not None:
+            continue
+        key = company_key(row)
+        named = new_names.get(name.lower()) if name else None
+        if key in new_companies or (not domain and named):
+            continue
+        if domain and named and not new_companies[named]['domain']:
+            # An earlier row only had the name: it's this company, which
+            # resolve() matches by domain or name afterwards
+            values = new_companies.pop(named)
+            values['website'] = values['website'] or row.get('company_website') or f'https://{domain}'
+            values['domain'] = domain
+            new_companies[key] = values
+            new_names[name.lower()] = key
+            continue
+        if name:
+            new_names.setdefault(name.lower(), key)
+        if key:
+            new_companies[key] = {
+                'name': name or domain.split('.')[0].capitalize(),
+                'industry': row.get('industry') or 'Unknown',
+                'size': row.get('company_size') or 'Unknown',
+                'website': row.get('company_website') or (f'https://{domain}' if domain else ''),
+                'domain': domain or '',
+                'country': row.get('company_country') or 'Unknown',
+                'description': row.get('company_description') or '',
+                'created_at': now,
+                'updated_at': now,
+            }
+
+    if not new_companies:
+        return 0
+
+    # Match the new ids back through the returned name/domain, since asking
+    # for RETURNING rows in parameter order makes some drivers insert
+    # row by row
+    result = db.session.execute(
+        insert(Company).returning(Company.id, Company.name, Company.domain),
+        list(new_companies.values())
+    )
+    company_ids = []
+    for company_id, name, domain in result:
+        values = new_companies[domain or name.lower()]
+        company_map.add(company_id, name, domain or None, values['size'], values['industry'])
+        company_ids.append(company_id)
+
+    # Scraping, summaries and social media lookups are slow, so they run
+    # later from the enrichment queue instead of during the import
+    db.session.execute(
+        insert(EnrichmentTask),
+        [{'company_id': company_id, 'status': 'pending', 'created_at': now} for company_id in company_ids]
+    )
+    return len(company_ids)
+
+def upsert_leads(values):
+    """
+    Write lead rows with one INSERT ... ON CONFLICT (email) DO UPDATE.
+
+    Falls back to separate bulk INSERT and UPDATE statements on databases
+    without ON CONFLICT support.
+    """
+    dialect = db.session.get_bind().dialect.name
+    update_columns = [key for key in values[0] if key not in ('email', 'created_at')]
+
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+
+        # Executed with a parameter list so the statement compiles once. On
+        # PostgreSQL (psycopg2) it is sent as multi-row VALUES batches; on
+        # SQLite, without RETURNING, as one executemany
+        statement = dialect_insert(Lead)
+        statement = statement.on_conflict_do_update(
+            index_elements=['email'],
+            set_={column: statement.excluded[column] for column in update_columns}
+        )
+        db.session.execute(statement, values)
+        return
+
+    existing = dict(db.session.execute(
+        select(Lead.email, Lead.id).where(Lead.email.in_([v['email'] for v in values]))
+    ).all())
+    new_rows = [v for v in values if v['email'] not in existing]
+    if new_rows:
+        db.session.execute(insert(Lead), new_rows)
+    updates = [
+        dict({column: v[column] for column in update_columns}, id=existing[v['email']])
+        for v in values if v['email'] in existing
+    ]
+    if updates:
+        db.session.execute(update(Lead), updates)
+
+def import_batch(rows, company_map, summary, check_deliverability, domain_cache):
+    """Validate, resolve companies for, score and upsert one batch of rows"""
+    now = datetime.utcnow()
+    weights = get_scoring_weights()
+
+    # Existing leads keep values the file doesn't provide
+    existing = {
+        row.email: row for row in db.session.execute(
+            select(Lead.email, Lead.name, Lead.company_id, *[getattr(Lead, f) for f in OPTIONAL_LEAD_FIELDS])
+            .where(Lead.email.in_(list(rows)))
+        )
+    }
+
+    pending = []
+    for email, (line_number, row) in rows.items():
+        current = existing.get(email)
+        if not current and not row.get('name'):
+            record_error(summary, line_number, 'name is required for new leads')
+            continue
+        if not current and not company_key(row):
+            record_error(summary, line_number, 'company_name or company_domain is required for new leads')
+            continue
+        if row.get('priority') and row['priority'].lower() not in PRIORITIES:
+            record_error(summary, line_number, f"priority must be one of: {', '.join(PRIORITIES)}")
+            continue
+        pending.append((email, row, current))
+
+    created = create_companies([row for _, row, _ in pending if company_key(row)], company_map, now)
+    summary['companies_created'] += created
+    summary['enrichment_queued'] += created
+
+    email_results = validate_emails(
+        [email for email, _, _ in pending],
+        check_deliverability=check_deliverability,
+        domain_cache=domain_cache
+    )
+
+    values = []
+    for (email, row, current), email_result in zip(pending, email_results):
+        company_id = None
+        if company_key(row):
+            company_id = company_map.resolve(
+                row.get('company_name'),
+                normalize_domain(row.get('company_domain') or row.get('company_website'))
+            )
+        company_id = company_id or current.company_id
+        size, industry, social_profile_count = company_map.scoring[company_id]
+
+        lead = {
+            'email': email,
+            'name': row.get('name') or current.name,
+            'email_status': email_result['status'],
+            'score': score_lead(email_result['status'], size, industry, social_profile_count, weights),
+            'company_id': company_id,
+            'created_at': now,
+            'updated_at': now,
+        }
+        for field in OPTIONAL_LEAD_FIELDS:
+            lead[field] = row.get(field) if row.get(field) is not None else getattr(current, field, None)
+        lead['priority'] = (lead['priority'] or 'medium').lower()
+        values.append(lead)
+
+        if current:
+            summary['updated'] += 1
+        else:
+            summary['inserted'] += 1
+
+    if values:
+        upsert_leads(values)
+    db.session.commit()
+
+def record_error(summary, line_number, message):
+    summary['skipped'] += 1
+    if len(summary['errors']) < MAX_REPORTED_ERRORS:
+        summary['errors'].append({'line': line_number, 'message': message})
+
+def import_leads(rows, check_deliverability=True, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Import leads in batches, inserting new ones and updating existing ones
+    matched by email.
+
+    Each batch is validated, written with a single upsert statement and
+    committed, so a failure part way through keeps the batches before it.
+    Companies are matched by domain or name against an in-memory map;
+    unknown ones are created with the row's details and queued for
+    enrichment (see enrichment.process_enrichment_tasks).
+
+    Args:
+        rows: Iterable of (line number, row dict, error) from iter_import_rows
+        check_deliverability (bool): Whether to check email domains' MX records
+        batch_size (int): Rows per upsert statement
+
+    Returns:
+        dict: Counts of processed, inserted, updated, skipped and duplicate
+            (merged into an earlier row) rows, companies created and enrichment tasks queued, plus row errors
+    """
+    summary = {
+        'processed': 0,
+        'inserted': 0,
+        'updated': 0,
+        'skipped': 0,
+        'duplicates': 0,
+        'companies_created': 0,
+        'enrichment_queued': 0,
+        'errors': [],
+    }
+    company_map = CompanyMap()
+    domain_cache = {}
+    batch = {}
+
+    for line_number, row, error in rows:
+        summary['processed'] += 1
+        if error:
+            record_error(summary, line_number, error)
+            continue
+
+        email = row.get('email')
+        if not email:
+            record_error(summary, line_number, 'email is required')
+            continue
+
+        # A repeated email within a batch updates the earlier row, since one
+        # upsert statement can't touch the same row twice
+        if email in batch:
+            summary['duplicates'] += 1
+            previous = batch[email][1]
+            row = dict(previous, **{k: v for k, v in row.items() if v is not None})
+        batch[email] = (line_number, row)
+
+        if len(batch) >= batch_size:
+            import_batch(batch, company_map, summary, check_deliverability, domain_cache)
+            batch = {}
+
+    if batch:
+        import_batch(batch, company_map, summary, check_deliverability, domain_cache)
+
+    logger.info(
+        "Imported leads: %s inserted, %s updated, %s skipped, %s companies created",
+        summary['inserted'], summary['updated'], summary['skipped'], summary['companies_created']
+    )
+    return summary
@@ -0,0 +1,510 @@
+import base64
+import hashlib
+import json
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import and_, or_, func, case
+from sqlalchemy.orm import contains_eager, load_only
+
+from models import Lead, Company, SocialMedia, DeletedLead
+
+# Page size limits for the lead listing endpoints
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Columns the listing can be sorted on (keyset pagination needs a stable,
+# comparable value, so only these are allowed)
+SORT_COLUMNS = {
+    'score': Lead.score,
+    'created_at': Lead.created_at,
+    'next_follow_up': Lead.next_follow_up,
+}
+DATETIME_SORTS = {'created_at', 'next_follow_up'}
+
+# The change feed re-sends the last few seconds of changes on the next
+# poll, so rows committed slightly out of timestamp order aren't missed
+CHANGE_FEED_SETTLE_SECONDS = 5
+
+# Fields that can be requested with the 'fields' parameter
+LEAD_FIELDS = (
+    'id', 'name', 'email', 'email_status', 'score', 'position', 'phone',
+    'linkedin_profile', 'priority', 'last_contact_date', 'next_follow_up',
+    'follow_up_notes', 'follow_up_type', 'ai_analysis', 'cold_email_template'
+)
+COMPANY_FIELDS = (
+    'id', 'name', 'industry', 'size', 'description', 'summary', 'website',
+    'domain', 'country', 'revenue', 'target_audience', 'linkedin_activity',
+    'owner_name', 'owner_email', 'owner_phone', 'owner_linkedin'
+)
+SOCIAL_MEDIA_FIELDS = ('linkedin', 'twitter', 'instagram', 'facebook')
+
+# Which lead, company and social media fields a response carries
+FieldSet = namedtuple('FieldSet', ['lead', 'company', 'social_media'])
+
+FULL_FIELDSET = FieldSet(LEAD_FIELDS, COMPANY_FIELDS, True)
+
+# Compact projection for list views: what the dashboard cards show, without
+# the Text columns (descriptions, AI output, notes)
+LIST_FIELDSET = FieldSet(
+    ('id', 'name', 'email', 'email_status', 'score', 'priority', 'next_follow_up', 'follow_up_type'),
+    ('id', 'name', 'industry', 'size'),
+    True
+)
+
+VIEWS = {
+    'list': LIST_FIELDSET,
+    'full': FULL_FIELDSET,
+}
+
+def parse_fieldset(fields=None, view='list'):
+    """
+    Resolve the 'fields' / 'view' request parameters to a FieldSet.
+
+    'fields' is a comma separated list such as
+    ``name,email,company.industry,social_media``. ``company`` on its own
+    selects every company field. Ids are always included.
+
+    Raises:
+        ValueError: For an unknown view or field
+    """
+    if not fields:
+        if view not in VIEWS:
+            raise ValueError(f"'view' must be one of: {', '.join(VIEWS)}")
+        return VIEWS[view]
+
+    lead_fields = ['id']
+    company_fields = []
+    include_social = False
+
+    for field in (f.strip() for f in fields.split(',')):
+        if not field:
+            continue
+        if field == 'company':
+            company_fields.extend(COMPANY_FIELDS)
+        elif field == 'social_media':
+            include_social = True
+        elif field.startswith('company.') and field[len('company.'):] in COMPANY_FIELDS:
+            company_fields.append(field[len('company.'):])
+        elif field in LEAD_FIELDS:
+            lead_fields.append(field)
+        else:
+            raise ValueError(f"Unknown field '{field}'")
+
+    if company_fields:
+        company_fields.insert(0, 'id')
+
+    return FieldSet(
+        tuple(dict.fromkeys(lead_fields)),
+        tuple(dict.fromkeys(company_fields)),
+        include_social
+    )
+
+def lead_load_options(fieldset, extra_columns=()):
+    """
+    Loader options that fetch only the columns a FieldSet needs.
+
+    Every other column, including the large Text ones, stays deferred.
+    The query must already be joined to Company.
+
+    Args:
+        fieldset (FieldSet): Fields being serialized
+        extra_columns (tuple): Additional Lead attribute names to load,
+            e.g. the sort column needed for the next page cursor
+    """
+    lead_columns = [getattr(Lead, name) for name in dict.fromkeys(fieldset.lead + tuple(extra_columns))]
+    options = [load_only(*lead_columns)]
+
+    # Company is always joined for filtering, so load it from the join
+    company_loader = contains_eager(Lead.company).load_only(
+        *[getattr(Company, name) for name in fieldset.company or ('id',)]
+    )
+    if fieldset.social_media:
+        company_loader = company_loader.selectinload(Company.social_media).load_only(
+            SocialMedia.company_id, *[getattr(SocialMedia, name) for name in SOCIAL_MEDIA_FIELDS]
+        )
+    options.append(company_loader)
+
+    return options
+
+def serialize_value(value):
+    """Convert a column value to its JSON representation"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def get_company_social_media(company):
+    """
+    Return the social media record for a company, if any.
+    
+    Uses the ``Company.social_media`` relationship so callers that eager
+    loaded it (``selectinload``) don't issue a query per company.
+    """
+    return company.social_media[0] if company.social_media else None
+
+def serialize_lead(lead, fieldset=FULL_FIELDSET):
+    """
+    Serialize a lead with its company and social media profiles for the API
+
+    Args:
+        lead (Lead): Lead to serialize
+        fieldset (FieldSet): Fields to include, everything by default
+    """
+    data = {field: serialize_value(getattr(lead, field)) for field in fieldset.lead}
+
+    if fieldset.company:
+        company = lead.company
+        data['company'] = {field: serialize_value(getattr(company, field)) for field in fieldset.company}
+
+    if fieldset.social_media:
+        social_media = get_company_social_media(lead.company)
+        data['social_media'] = {
+            field: getattr(social_media, field) if social_media else None
+            for field in SOCIAL_MEDIA_FIELDS
+        }
+
+    return data
+
+def serialize_lead_for_export(lead):
+    """Serialize a lead as a flat row for exports"""
+    company = lead.company
+    social_media = get_company_social_media(company)
+    return {
+        'id': lead.id,
+        'name': lead.name,
+        'email': lead.email,
+        'email_status': lead.email_status,
+        'score': lead.score,
+        'position': lead.position,
+        'phone': lead.phone,
+        'linkedin_profile': lead.linkedin_profile,
+        'priority': lead.priority,
+        'last_contact_date': lead.last_contact_date.isoformat() if lead.last_contact_date else None,
+        'next_follow_up': lead.next_follow_up.isoformat() if lead.next_follow_up else None,
+        'follow_up_notes': lead.follow_up_notes,
+        'follow_up_type': lead.follow_up_type,
+        'company_name': company.name,
+        'industry': company.industry,
+        'company_size': company.size,
+        'company_description': company.description,
+        'company_summary': company.summary,
+        'company_website': company.website,
+        'company_domain': company.domain,
+        'company_country': company.country,
+        'owner_name': company.owner_name,
+        'owner_email': company.owner_email,
+        'owner_phone': company.owner_phone,
+        'owner_linkedin': company.owner_linkedin,
+        'linkedin': social_media.linkedin if social_media else None,
+        'twitter': social_media.twitter if social_media else None,
+        'instagram': social_media.instagram if social_media else None,
+        'facebook': social_media.facebook if social_media else None
+    }
+
+def filter_leads_query(query, args):
+    """
+    Apply the listing filters from the request arguments to a lead query.
+    The query must already be joined to Company.
+
+    Args:
+        query: Lead query joined to Company
+        args (dict): Request arguments
+
+    Returns:
+        The filtered query
+
+    Raises:
+        ValueError: If a numeric filter can't be parsed
+    """
+    industry = args.get('industry')
+    email_status = args.get('email_status')
+    company_size = args.get('company_size')
+    priority = args.get('priority')
+    min_score = args.get('min_score')
+    max_score = args.get('max_score')
+    search = (args.get('q') or '').strip()
+
+    if industry:
+        query = query.filter(Company.industry == industry)
+    if email_status:
+        query = query.filter(Lead.email_status == email_status)
+    if company_size:
+        query = query.filter(Company.size == company_size)
+    if priority:
+        query = query.filter(Lead.priority == priority)
+    if min_score not in (None, ''):
+        query = query.filter(Lead.score >= parse_int(min_score, 'min_score'))
+    if max_score not in (None, ''):
+        query = query.filter(Lead.score <= parse_int(max_score, 'max_score'))
+    if search:
+        query = query.filter(or_(
+            Lead.name.icontains(search, autoescape=True),
+            Company.name.icontains(search, autoescape=True)
+        ))
+
+    return query
+
+def parse_int(value, name):
+    """Parse an integer request argument, raising ValueError with the argument name"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{name}' must be an integer")
+
+def parse_datetime(value, name):
+    """
+    Parse an ISO 8601 request argument. Times with an offset are converted
+    to naive UTC, like the stored timestamps.
+    """
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{name}' must be an ISO 8601 date or datetime")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def parse_page_size(value):
+    """Parse the 'limit' argument, clamped to MAX_PAGE_SIZE"""
+    if value in (None, ''):
+        return DEFAULT_PAGE_SIZE
+    limit = parse_int(value, 'limit')
+    if limit < 1:
+        raise ValueError("'limit' must be at least 1")
+    return min(limit, MAX_PAGE_SIZE)
+
+def encode_cursor(sort, order, value, lead_id):
+    """Encode the position after a row as an opaque cursor string"""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([sort, order, value, lead_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, sort, order):
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Returns:
+        tuple: (sort value, lead id)
+
+    Raises:
+        ValueError: If the cursor is malformed or was issued for another sort
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_sort, cursor_order, value, lead_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+    # Checked before parsing the value, which has another type for another sort
+    if cursor_sort != sort or cursor_order != order:
+        raise ValueError('Cursor does not match the requested sort order')
+    try:
+        if value is not None and sort in DATETIME_SORTS:
+            value = datetime.fromisoformat(value)
+        return value, int(lead_id)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+def paginate_leads(query, sort='created_at', order='desc', limit=DEFAULT_PAGE_SIZE, cursor=None):
+    """
+    Fetch one page of leads using keyset (seek) pagination.
+
+    Rows are ordered by the sort column (NULLs last) with the lead id as a
+    tie breaker, and the cursor holds the (value, id) of the last row on the
+    previous page, so every page is an index range scan instead of an
+    OFFSET that gets slower the deeper you go.
+
+    Args:
+        query: Filtered lead query
+        sort (str): One of SORT_COLUMNS
+        order (str): 'asc' or 'desc'
+        limit (int): Page size
+        cursor (str): Cursor returned with the previous page, if any
+
+    Returns:
+        tuple: (list of leads, cursor for the next page or None)
+
+    Raises:
+        ValueError: For an unknown sort/order or a bad cursor
+    """
+    if sort not in SORT_COLUMNS:
+        raise ValueError(f"'sort' must be one of: {', '.join(SORT_COLUMNS)}")
+    if order not in ('asc', 'desc'):
+        raise ValueError("'order' must be 'asc' or 'desc'")
+
+    column = SORT_COLUMNS[sort]
+    descending = order == 'desc'
+
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort, order)
+        id_after = Lead.id < last_id if descending else Lead.id > last_id
+        if value is None:
+            # Already into the trailing NULLs
+            query = query.filter(and_(column.is_(None), id_after))
+        else:
+            value_after = column < value if descending else column > value
+            query = query.filter(or_(
+                value_after,
+                and_(column == value, id_after),
+                column.is_(None)
+            ))
+
+    # NULLS LAST rather than a leading 'column IS NULL' term, so the
+    # (column, id) index can supply the order without a sort
+    query = query.order_by(
+        (column.desc() if descending else column.asc()).nulls_last(),
+        Lead.id.desc() if descending else Lead.id.asc()
+    )
+
+    rows = query.limit(limit + 1).all()
+    leads = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last = leads[-1]
+        next_cursor = encode_cursor(sort, order, getattr(last, sort), last.id)
+
+    return leads, next_cursor
+
+def make_etag(*parts):
+    """Build a strong ETag from the values that determine a response"""
+    return hashlib.sha1(json.dumps(parts, default=str).encode()).hexdigest()
+
+def leads_version(query):
+    """
+    Return (count, max updated_at) for a filtered lead query.
+
+    Together they change whenever a matching lead (or, through the model
+    events, its company or social media) is added, updated or deleted, so
+    they make a cheap validator for the listing.
+    """
+    return query.with_entities(func.count(Lead.id), func.max(Lead.updated_at)).one()
+
+def encode_change_token(updated_at, lead_id, tombstone_id):
+    """Encode a change feed position as an opaque token"""
+    payload = json.dumps([
+        updated_at.isoformat() if updated_at else None, lead_id, tombstone_id
+    ], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_change_token(token):
+    """
+    Decode a change feed token.
+
+    Returns:
+        tuple: (updated_at or None, lead id, tombstone id)
+
+    Raises:
+        ValueError: If the token is malformed
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        updated_at, lead_id, tombstone_id = json.loads(base64.urlsafe_b64decode(padded))
+        return (
+            datetime.fromisoformat(updated_at) if updated_at else None,
+            int(lead_id),
+            int(tombstone_id)
+        )
+    except (ValueError, TypeError):
+        raise ValueError('Invalid change token')
+
+def get_lead_changes(since=None, limit=DEFAULT_PAGE_SIZE, fieldset=LIST_FIELDSET):
+    """
+    Return leads created, updated or deleted after a change feed position.
+
+    Changed leads are read in (updated_at, id) order, so each poll is an
+    index range scan starting at the token. The returned token never moves
+    past CHANGE_FEED_SETTLE_SECONDS ago; leads changed in that window are
+    sent again on the next poll, and clients apply changes by id.
+
+    Args:
+        since (str): Token from a previous call, or None to start from the beginning
+        limit (int): Maximum leads (and deletions) per call
+        fieldset (FieldSet): Fields to serialize for changed leads
+
+    Returns:
+        dict: changed leads, deleted lead ids, next token and has_more flag
+    """
+    updated_after, last_id, tombstone_id = decode_change_token(since) if since else (None, 0, 0)
+
+    query = Lead.query.join(Lead.company).options(*lead_load_options(fieldset, extra_columns=('updated_at',)))
+    if updated_after is not None:
+        query = query.filter(or_(
+            Lead.updated_at > updated_after,
+            and_(Lead.updated_at == updated_after, Lead.id > last_id)
+        ))
+    rows = query.order_by(Lead.updated_at, Lead.id).limit(limit + 1).all()
+    leads = rows[:limit]
+
+    tombstones = DeletedLead.query.filter(DeletedLead.id > tombstone_id) \
+        .order_by(DeletedLead.id).limit(limit + 1).all()
+    has_more = len(rows) > limit or len(tombstones) > limit
+    tombstones = tombstones[:limit]
+
+    if leads:
+        updated_after, last_id = leads[-1].updated_at, leads[-1].id
+    settled = datetime.utcnow() - timedelta(seconds=CHANGE_FEED_SETTLE_SECONDS)
+    if not has_more and updated_after is not None and updated_after > settled:
+        updated_after, last_id = settled, 0
+    if tombstones:
+        tombstone_id = tombstones[-1].id
+
+    return {
+        'changes': [serialize_lead(lead, fieldset) for lead in leads],
+        'deleted': [tombstone.lead_id for tombstone in tombstones],
+        'next_since': encode_change_token(updated_after, last_id, tombstone_id),
+        'has_more': has_more
+    }
+
+def get_lead_stats(query, now=None):
+    """
+    Compute dashboard aggregates for a filtered lead query in SQL.
+
+    Each figure is a single aggregate or GROUP BY over the filtered set, so
+    the cost doesn't include transferring or serializing any leads.
+
+    Args:
+        query: Lead query joined to Company, with filters applied
+        now (datetime): Reference time for due follow-ups, defaults to utcnow
+
+    Returns:
+        dict: totals, score histogram (with leads that have no score
+        counted separately as unscored) and breakdowns
+    """
+    now = now or datetime.utcnow()
+    query = query.order_by(None)
+
+    total, avg_score, high_value, scheduled, due = query.with_entities(
+        func.count(Lead.id),
+        func.avg(Lead.score),
+        func.sum(case((Lead.score >= 70, 1), else_=0)),
+        func.count(Lead.next_follow_up),
+        func.sum(case((Lead.next_follow_up <= now, 1), else_=0))
+    ).one()
+
+    def counts_by(column):
+        rows = query.with_entities(column, func.count(Lead.id)).group_by(column).all()
+        return {(value if value is not None else 'Unknown'): count for value, count in rows}
+
+    # Bucket scores into 0-9, 10-19, ... with 100 folded into the top bucket;
+    # leads without a score (also left out of avg_score) get a NULL bucket
+    bucket = case((Lead.score >= 90, 9), else_=Lead.score // 10)
+    histogram = dict(query.with_entities(bucket, func.count(Lead.id)).group_by(bucket).all())
+
+    return {
+        'total': total,
+        'high_value': high_value or 0,
+        'avg_score': round(float(avg_score), 1) if avg_score is not None else 0,
+        'follow_ups': {
+            'scheduled': scheduled,
+            'due': due or 0
+        },
+        'score_histogram': [
+            {'min': index * 10, 'max': index * 10 + 9 if index < 9 else 100, 'count': histogram.get(index, 0)}
+            for index in range(10)
+        ],
+        'unscored': histogram.get(None, 0),
+        'by_industry': counts_by(Company.industry),
+        'by_size': counts_by(Company.size),
+        'by_email_status': counts_by(Lead.email_status),
+        'by_priority': counts_by(Lead.priority)
+    }
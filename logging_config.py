@@ -0,0 +1,162 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+from tracing import current_span
+
+# Root log level, plus per-logger levels as "name=LEVEL,..." (loggers are
+# named after their modules), e.g. "scraper=DEBUG,urllib3=WARNING"
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+LOG_LEVELS = os.environ.get("LOG_LEVELS", "")
+
+# "text", or "json" for one JSON object per line with the scrape, batch,
+# job and trace ids of the work being logged
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text")
+
+# Records let through per logger, level and message template in each
+# interval (seconds). Later ones are dropped, and the next record let
+# through reports how many were. 0 disables the limit.
+LOG_RATE_LIMIT = int(os.environ.get("LOG_RATE_LIMIT", "20"))
+LOG_RATE_LIMIT_INTERVAL = float(os.environ.get("LOG_RATE_LIMIT_INTERVAL", "60"))
+
+# Message templates the rate limiter tracks before it starts over
+MAX_RATE_LIMIT_KEYS = 10000
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Ids added to every record logged in the current thread or task
+log_context = ContextVar('log_context', default={})
+
+@contextmanager
+def bind_log_context(**ids):
+    """Add ids, e.g. scrape_id or job_id, to the records logged in the block"""
+    token = log_context.set({**log_context.get(), **ids})
+    try:
+        yield
+    finally:
+        log_context.reset(token)
+
+class ContextFilter(logging.Filter):
+    """Attach the bound ids and the current trace id to a record as record.context"""
+
+    def filter(self, record):
+        context = log_context.get()
+        span = current_span.get()
+        if span is not None:
+            context = {**context, 'trace_id': span.trace.trace_id}
+        record.context = context
+        return True
+
+class RateLimitFilter(logging.Filter):
+    """
+    Let through at most 'limit' records per logger, level and message
+    template in each 'interval' seconds. With lazy %-style arguments,
+    the same message about many URLs shares one template, and so one
+    limit. The first record of a new interval carries the number dropped
+    in the last one as record.suppressed.
+    """
+
+    def __init__(self, limit=LOG_RATE_LIMIT, interval=LOG_RATE_LIMIT_INTERVAL):
+        super().__init__()
+        self.limit = limit
+        self.interval = interval
+        self.windows = {}  # key -> [interval start, records let through, records dropped]
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        key = (record.name, record.levelno, record.msg if isinstance(record.msg, str) else str(record.msg))
+        now = time.monotonic()
+        with self.lock:
+            window = self.windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                if window is None and len(self.windows) >= MAX_RATE_LIMIT_KEYS:
+                    self.windows.clear()
+                record.suppressed = window[2] if window else 0
+                self.windows[key] = [now, 1, 0]
+                return True
+            if window[1] < self.limit:
+                window[1] += 1
+                record.suppressed = 0
+                return True
+            window[2] += 1
+            return False
+
+class TextFormatter(logging.Formatter):
+    """TEXT_FORMAT lines, followed by the record's context ids"""
+
+    def formatMessage(self, record):
+        text = super().formatMessage(record)
+        context = getattr(record, 'context', None)
+        if context:
+            text += ' [' + ' '.join(f'{key}={value}' for key, value in context.items()) + ']'
+        if getattr(record, 'suppressed', 0):
+            text += f' ({record.suppressed} similar messages suppressed)'
+        return text
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record, with its context ids as top-level keys"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'thread': record.threadName,
+            **getattr(record, 'context', {})
+        }
+        if getattr(record, 'suppressed', 0):
+            entry['suppressed'] = record.suppressed
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+handler = None
+
+def parse_levels(levels):
+    """
+    Parse per-logger levels.
+
+    Args:
+        levels (str): "name=LEVEL" pairs separated by commas
+
+    Returns:
+        dict: Logger name -> level name
+
+    Raises:
+        ValueError: For a malformed pair or unknown level
+    """
+    parsed = {}
+    for pair in filter(None, (pair.strip() for pair in levels.split(','))):
+        name, _, level = pair.partition('=')
+        level = level.strip().upper()
+        if not name.strip() or not isinstance(logging.getLevelName(level), int):
+            raise ValueError(f"Invalid log level setting '{pair}', expected name=LEVEL")
+        parsed[name.strip()] = level
+    return parsed
+
+def configure_logging(level=LOG_LEVEL, levels=LOG_LEVELS, log_format=LOG_FORMAT, rate_limit=LOG_RATE_LIMIT):
+    """
+    Send log records to stderr in text or JSON format with context ids,
+    rate-limited, at the root level and per-logger levels given. Calling
+    it again replaces the handler it installed.
+    """
+    global handler
+    root = logging.getLogger()
+    if handler is not None:
+        root.removeHandler(handler)
+
+    handler = logging.StreamHandler()
+    handler.setFormatter(JSONFormatter() if log_format == 'json' else TextFormatter(TEXT_FORMAT))
+    if rate_limit:
+        handler.addFilter(RateLimitFilter(rate_limit))
+    handler.addFilter(ContextFilter())
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+    for name, logger_level in parse_levels(levels).items():
+        logging.getLogger(name).setLevel(logger_level)
@@ -0,0 +1,274 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import partial
+from urllib.parse import urlparse
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from db_config import pool_stats
+
+# Distinct label combinations kept per metric. Labels taken from input,
+# like fetch hosts, fold into "other" beyond this so a large batch scrape
+# can't grow the registry without bound.
+METRICS_MAX_LABEL_SETS = int(os.environ.get("METRICS_MAX_LABEL_SETS", "500"))
+
+# Latency histogram buckets (seconds), from sub-millisecond cache and DB
+# work up to slow page downloads and AI calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Every metric, in /metrics order
+REGISTRY = []
+
+def escape_label_value(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(
+        f'{name}="{escape_label_value("" if value is None else str(value))}"' for name, value in pairs
+    ) + '}'
+
+def label_order(item):
+    return tuple('' if value is None else str(value) for value in item[0])
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    """
+    A metric family with a value per combination of label values, in the
+    Prometheus text exposition format.
+    """
+
+    type = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def key(self, labels):
+        """Label values for a sample, in labelnames order. Call with the lock held."""
+        key = tuple(map(labels.get, self.labelnames))
+        if key not in self.values and len(self.values) >= METRICS_MAX_LABEL_SETS:
+            key = ('other',) * len(self.labelnames)
+        return key
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.values)
+
+    def samples(self):
+        """(suffix, label values, extra labels, value) for every sample"""
+        for key, value in sorted(self.snapshot().items(), key=label_order):
+            yield '', key, (), value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type}']
+        for suffix, key, extra, value in self.samples():
+            lines.append(f'{self.name}{suffix}{format_labels(self.labelnames, key, extra)} {format_value(value)}')
+        return '\n'.join(lines)
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        with self.lock:
+            key = self.key(labels)
+            self.values[key] = self.values.get(key, 0) + amount
+
+class Gauge(Metric):
+    """A gauge read from a callback returning {label values: value} when scraped"""
+
+    type = 'gauge'
+
+    def __init__(self, name, help, labelnames=(), collect=None):
+        super().__init__(name, help, labelnames)
+        self.collect = collect
+
+    def snapshot(self):
+        return self.collect() if self.collect else {}
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        # bucket bounds are inclusive (le), so the first bound >= value
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            key = self.key(labels)
+            state = self.values.get(key)
+            if state is None:
+                # [per-bucket counts (last is +Inf), sum, count]
+                state = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {key: (list(counts), total, count) for key, (counts, total, count) in self.values.items()}
+
+    def samples(self):
+        bounds = self.buckets + (float('inf'),)
+        for key, (counts, total, count) in sorted(self.snapshot().items(), key=label_order):
+            cumulative = 0
+            for bound, bucket_count in zip(bounds, counts):
+                cumulative += bucket_count
+                yield '_bucket', key, (('le', format_value(bound)),), cumulative
+            yield '_sum', key, (), total
+            yield '_count', key, (), count
+
+class CacheCounter(Counter):
+    """cache_requests_total, plus the hit and miss counts of watched lru_caches"""
+
+    def __init__(self, name, help, labelnames=('cache', 'result')):
+        super().__init__(name, help, labelnames)
+        self.lru_caches = {}
+
+    def watch_lru_cache(self, cache, fn):
+        self.lru_caches[cache] = fn
+
+    def snapshot(self):
+        values = super().snapshot()
+        for cache, fn in self.lru_caches.items():
+            info = fn.cache_info()
+            values[(cache, 'hit')] = info.hits
+            values[(cache, 'miss')] = info.misses
+        return values
+
+@contextmanager
+def timed(histogram, **labels):
+    """
+    Observe the seconds spent in a block (or, used as a decorator, a
+    function call) in a histogram, whether or not it raises
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - started, **labels)
+
+SCRAPE_STAGE_SECONDS = Histogram(
+    'scrape_stage_seconds', 'Time spent in each scrape pipeline stage', ('stage',)
+)
+FETCH_SECONDS = Histogram('scrape_fetch_seconds', 'Page download time by host', ('host',))
+FETCHES = Counter(
+    'scrape_fetches_total', 'Page downloads by host and outcome (2xx, not_modified, 4xx, 5xx, error)',
+    ('host', 'outcome')
+)
+EXTRACTION_SECONDS = Histogram(
+    'scrape_extraction_seconds', 'Page text extraction time by method (trafilatura or bs4)', ('method',)
+)
+EXTRACTIONS = Counter(
+    'scrape_extractions_total', 'Page text extractions by method and outcome (text, empty, error)',
+    ('method', 'outcome')
+)
+AI_REQUEST_SECONDS = Histogram('ai_request_seconds', 'OpenAI request time by operation', ('operation',))
+AI_REQUESTS = Counter('ai_requests_total', 'OpenAI requests by operation and outcome', ('operation', 'outcome'))
+DB_COMMIT_SECONDS = Histogram('db_commit_seconds', 'Session commit time, including the final flush')
+CACHE_REQUESTS = CacheCounter('cache_requests_total', 'Cache lookups by cache and result (hit or miss)')
+HTTP_REQUEST_SECONDS = Histogram(
+    'http_request_seconds', 'API request handling time by method and route', ('method', 'endpoint')
+)
+HTTP_REQUESTS = Counter(
+    'http_requests_total', 'API requests by method, route and status code', ('method', 'endpoint', 'status')
+)
+
+def record_fetch(url, seconds, status=None):
+    """
+    Count a page download by host, with its outcome from the status code
+    (None when the request failed)
+    """
+    host = urlparse(url).hostname or 'unknown'
+    if status is None:
+        outcome = 'error'
+    elif status == 304:
+        outcome = 'not_modified'
+    else:
+        outcome = f'{status // 100}xx'
+    FETCH_SECONDS.observe(seconds, host=host)
+    FETCHES.inc(host=host, outcome=outcome)
+
+# Connection pool gauges: (metric, pool_stats key, scale, help)
+POOL_GAUGES = (
+    ('db_pool_size', 'size', 1, 'Connections the pool keeps open'),
+    ('db_pool_checked_out', 'checked_out', 1, 'Connections currently checked out'),
+    ('db_pool_overflow', 'overflow', 1, 'Connections open beyond the pool size (negative: not yet opened)'),
+    ('db_pool_checkouts', 'checkouts', 1, 'Connection checkouts so far'),
+    ('db_pool_slow_checkouts', 'slow_checkouts', 1, 'Checkouts that waited longer than DB_SLOW_CHECKOUT_MS'),
+    ('db_pool_avg_checkout_wait_seconds', 'avg_wait_ms', 0.001, 'Mean time checkouts waited for a connection'),
+    ('db_pool_max_checkout_wait_seconds', 'max_wait_ms', 0.001, 'Longest time a checkout waited for a connection'),
+)
+
+def collect_pool_stat(engines, stat, scale):
+    values = {}
+    for name, engine in engines.items():
+        stats = pool_stats(engine)
+        if stat in stats:
+            values[(name,)] = round(stats[stat] * scale, 9)
+    return values
+
+def watch_pools(engines):
+    """
+    Export connection pool occupancy and checkout waits (see pool_stats)
+    for engines, a bind name -> engine mapping where None is the primary
+    """
+    engines = {name or 'primary': engine for name, engine in engines.items()}
+    for name, stat, scale, help in POOL_GAUGES:
+        Gauge(name, help, ('engine',), collect=partial(collect_pool_stat, engines, stat, scale))
+
+def init_metrics(app):
+    """Time every request to the app by method and route"""
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            elapsed = time.perf_counter() - started
+            # one context lookup rather than one per attribute
+            current = request._get_current_object()
+            endpoint = current.url_rule.rule if current.url_rule else 'unmatched'
+            HTTP_REQUEST_SECONDS.observe(elapsed, method=current.method, endpoint=endpoint)
+            HTTP_REQUESTS.inc(method=current.method, endpoint=endpoint, status=response.status_code)
+        return response
+
+def render_metrics():
+    """Every metric in the Prometheus text exposition format"""
+    return '\n'.join(metric.render() for metric in REGISTRY) + '\n'
+
+# Time commits of every session, from before_commit (ahead of the final
+# flush) to after_commit
+@event.listens_for(Session, 'before_commit')
+def start_commit_timer(session):
+    session.info['metrics_commit_started'] = time.perf_counter()
+
+@event.listens_for(Session, 'after_commit')
+def record_commit(session):
+    started = session.info.pop('metrics_commit_started', None)
+    if started is not None:
+        DB_COMMIT_SECONDS.observe(time.perf_counter() - started)
+
+@event.listens_for(Session, 'after_rollback')
+def discard_commit_timer(session):
+    session.info.pop('metrics_commit_started', None)
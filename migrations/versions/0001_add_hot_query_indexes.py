@@ -0,0 +1,50 @@
+"""Add indexes for hot lead and company query columns
+
+Revision ID: 0001_hot_query_indexes
+Revises:
+Create Date: 2026-10-19 00:00:00.000000
+
+Tables are created by db.create_all() at startup, which also creates these
+indexes on new databases, so every index is created/dropped only if
+(not) present. Run 'flask db upgrade' once on databases created before the
+indexes were declared in models.py.
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_hot_query_indexes'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# (index name, table, columns)
+INDEXES = [
+    ('ix_lead_company_id', 'lead', ['company_id']),
+    ('ix_lead_priority', 'lead', ['priority']),
+    ('ix_lead_created_at_id', 'lead', ['created_at', 'id']),
+    ('ix_lead_score_id', 'lead', ['score', 'id']),
+    ('ix_lead_next_follow_up_id', 'lead', ['next_follow_up', 'id']),
+    ('ix_lead_updated_at_id', 'lead', ['updated_at', 'id']),
+    ('ix_lead_email_status_created_at', 'lead', ['email_status', 'created_at']),
+    ('ix_lead_email_status_score', 'lead', ['email_status', 'score']),
+    ('ix_company_name', 'company', ['name']),
+    ('ix_company_size', 'company', ['size']),
+    ('ix_company_domain', 'company', ['domain']),
+    ('ix_company_industry_size', 'company', ['industry', 'size']),
+    ('ix_social_media_company_id', 'social_media', ['company_id']),
+    ('ix_competitor_analysis_company_id', 'competitor_analysis', ['company_id']),
+    ('ix_sentiment_analysis_company_id', 'sentiment_analysis', ['company_id']),
+    ('ix_enrichment_task_company_id', 'enrichment_task', ['company_id']),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade():
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,28 @@
+"""Add the scheduler's due-schedule index
+
+Revision ID: 0002_schedule_due_index
+Revises: 0001_hot_query_indexes
+Create Date: 2026-10-19 00:00:00.000000
+
+Like 0001, the index is also created by db.create_all() on new databases,
+so it is created/dropped only if (not) present.
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_schedule_due_index'
+down_revision = '0001_hot_query_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_auto_scraper_schedule_is_active_next_run', 'auto_scraper_schedule',
+                    ['is_active', 'next_run'], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_auto_scraper_schedule_is_active_next_run', table_name='auto_scraper_schedule',
+                  if_exists=True)
@@ -0,0 +1,48 @@
+"""Add the job table for the work queue
+
+Revision ID: 0003_job_queue
+Revises: 0002_schedule_due_index
+Create Date: 2026-10-19 00:00:00.000000
+
+db.create_all() also creates the table on new databases, so it is only
+created here if missing.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_job_queue'
+down_revision = '0002_schedule_due_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not sa.inspect(op.get_bind()).has_table('job'):
+        op.create_table(
+            'job',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('kind', sa.String(length=50), nullable=False),
+            sa.Column('payload', sa.Text()),
+            sa.Column('status', sa.String(length=20), nullable=False),
+            sa.Column('attempts', sa.Integer(), nullable=False),
+            sa.Column('max_attempts', sa.Integer(), nullable=False),
+            sa.Column('run_at', sa.DateTime(), nullable=False),
+            sa.Column('locked_by', sa.String(length=100)),
+            sa.Column('locked_until', sa.DateTime()),
+            sa.Column('result', sa.Text()),
+            sa.Column('error', sa.Text()),
+            sa.Column('created_at', sa.DateTime()),
+            sa.Column('updated_at', sa.DateTime()),
+            sa.Column('finished_at', sa.DateTime()),
+        )
+    op.create_index('ix_job_status_run_at', 'job', ['status', 'run_at'], if_not_exists=True)
+    op.create_index('ix_job_status_locked_until', 'job', ['status', 'locked_until'], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_job_status_locked_until', table_name='job', if_exists=True)
+    op.drop_index('ix_job_status_run_at', table_name='job', if_exists=True)
+    op.drop_table('job')
@@ -0,0 +1,38 @@
+"""Add company fingerprints for incremental re-scrapes
+
+Revision ID: 0004_company_fingerprint
+Revises: 0003_job_queue
+Create Date: 2026-10-19 00:00:00.000000
+
+db.create_all() also creates the table on new databases, so it is only
+created here if missing.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_company_fingerprint'
+down_revision = '0003_job_queue'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not sa.inspect(op.get_bind()).has_table('company_fingerprint'):
+        op.create_table(
+            'company_fingerprint',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('company_id', sa.Integer(), sa.ForeignKey('company.id'), nullable=False, unique=True),
+            sa.Column('url', sa.String(length=255)),
+            sa.Column('etag', sa.String(length=255)),
+            sa.Column('last_modified', sa.String(length=100)),
+            sa.Column('content_hash', sa.String(length=64)),
+            sa.Column('checked_at', sa.DateTime()),
+            sa.Column('changed_at', sa.DateTime()),
+        )
+
+
+def downgrade():
+    op.drop_table('company_fingerprint')
@@ -0,0 +1,36 @@
+"""Add company vectors for the similar-companies index
+
+Revision ID: 0005_company_vector
+Revises: 0004_company_fingerprint
+Create Date: 2026-10-19 00:00:00.000000
+
+db.create_all() also creates the table on new databases, so it is only
+created here if missing. Vectors are filled in by 'flask index-companies'
+or on the first similar-companies query.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_company_vector'
+down_revision = '0004_company_fingerprint'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not sa.inspect(op.get_bind()).has_table('company_vector'):
+        op.create_table(
+            'company_vector',
+            sa.Column('company_id', sa.Integer(), sa.ForeignKey('company.id', ondelete='CASCADE'), primary_key=True),
+            sa.Column('vector', sa.LargeBinary(), nullable=False),
+            sa.Column('updated_at', sa.DateTime()),
+        )
+    op.create_index('ix_company_vector_updated_at', 'company_vector', ['updated_at'], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_company_vector_updated_at', table_name='company_vector', if_exists=True)
+    op.drop_table('company_vector')
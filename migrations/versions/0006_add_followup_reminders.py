@@ -0,0 +1,37 @@
+"""Add the follow-up reminder cursor and due follow-ups index
+
+Revision ID: 0006_followup_reminders
+Revises: 0005_company_vector
+Create Date: 2026-10-19 00:00:00.000000
+
+db.create_all() also creates the table on new databases, so it is only
+created here if missing; likewise the index.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_followup_reminders'
+down_revision = '0005_company_vector'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not sa.inspect(op.get_bind()).has_table('reminder_cursor'):
+        op.create_table(
+            'reminder_cursor',
+            sa.Column('name', sa.String(length=50), primary_key=True),
+            sa.Column('due_at', sa.DateTime(), nullable=False),
+            sa.Column('lead_id', sa.Integer(), nullable=False),
+            sa.Column('updated_at', sa.DateTime()),
+        )
+    op.create_index('ix_lead_follow_up_type_next_follow_up_id', 'lead',
+                    ['follow_up_type', 'next_follow_up', 'id'], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_lead_follow_up_type_next_follow_up_id', table_name='lead', if_exists=True)
+    op.drop_table('reminder_cursor')
@@ -0,0 +1,33 @@
+"""Add company tombstones for the in-memory company indexes
+
+Revision ID: 0007_deleted_company
+Revises: 0006_followup_reminders
+Create Date: 2026-10-19 00:00:00.000000
+
+db.create_all() also creates the table on new databases, so it is only
+created here if missing.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_deleted_company'
+down_revision = '0006_followup_reminders'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not sa.inspect(op.get_bind()).has_table('deleted_company'):
+        op.create_table(
+            'deleted_company',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('company_id', sa.Integer(), nullable=False),
+            sa.Column('deleted_at', sa.DateTime()),
+        )
+
+
+def downgrade():
+    op.drop_table('deleted_company')
@@ -1,5 +1,6 @@
 from app import db
 from datetime import datetime
+from sqlalchemy import event
 
 class Lead(db.Model):
     """Model for lead data"""
@@ -21,7 +22,7 @@ class Lead(db.Model):
     follow_up_type = db.Column(db.String(50))  # email, call, message, etc.
     
     # Lead prioritization
-    priority = db.Column(db.String(20), default='medium')  # low, medium, high
+    priority = db.Column(db.String(20), default='medium', index=True)  # low, medium, high
     ai_analysis = db.Column(db.Text)  # AI-generated insights about the lead
     cold_email_template = db.Column(db.Text)  # AI-generated email template
     
@@ -29,24 +30,55 @@ class Lead(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
-    company_id = db.Column(db.Integer, db.ForeignKey('company.id'), nullable=False)
+    company_id = db.Column(db.Integer, db.ForeignKey('company.id'), nullable=False, index=True)
     company = db.relationship('Company', backref=db.backref('leads', lazy=True))
     
+    # (sort column, id) indexes serve the keyset-paginated listing and the
+    # change feed; (email_status, ...) the most common dashboard filter;
+    # (follow_up_type, ...) the due follow-ups queue filtered by type
+    __table_args__ = (
+        db.Index('ix_lead_created_at_id', 'created_at', 'id'),
+        db.Index('ix_lead_score_id', 'score', 'id'),
+        db.Index('ix_lead_next_follow_up_id', 'next_follow_up', 'id'),
+        db.Index('ix_lead_follow_up_type_next_follow_up_id', 'follow_up_type', 'next_follow_up', 'id'),
+        db.Index('ix_lead_updated_at_id', 'updated_at', 'id'),
+        db.Index('ix_lead_email_status_created_at', 'email_status', 'created_at'),
+        db.Index('ix_lead_email_status_score', 'email_status', 'score'),
+    )
+    
     def __repr__(self):
         return f'<Lead {self.name} ({self.email})>'
 
+class DeletedLead(db.Model):
+    """Tombstone for a deleted lead, so the change feed can report deletions"""
+    id = db.Column(db.Integer, primary_key=True)
+    lead_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<DeletedLead {self.lead_id}>'
+
+class DeletedCompany(db.Model):
+    """Tombstone for a deleted company, so in-memory indexes in other processes can drop it"""
+    id = db.Column(db.Integer, primary_key=True)
+    company_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<DeletedCompany {self.company_id}>'
+
 class Company(db.Model):
     """Model for company data"""
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
+    name = db.Column(db.String(100), nullable=False, index=True)
     industry = db.Column(db.String(100))
-    size = db.Column(db.String(50))  # SMB, Mid-Market, Enterprise
+    size = db.Column(db.String(50), index=True)  # SMB, Mid-Market, Enterprise
     description = db.Column(db.Text)
     summary = db.Column(db.Text)  # AI-generated summary
     website = db.Column(db.String(255))
     
     # New fields
-    domain = db.Column(db.String(255))  # Company domain name
+    domain = db.Column(db.String(255), index=True)  # Company domain name
     country = db.Column(db.String(100))
     revenue = db.Column(db.String(100))
     linkedin_activity = db.Column(db.String(100))  # High, Medium, Low
@@ -62,13 +94,17 @@ class Company(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_company_industry_size', 'industry', 'size'),
+    )
+    
     def __repr__(self):
         return f'<Company {self.name}>'
 
 class SocialMedia(db.Model):
     """Model for social media presence"""
     id = db.Column(db.Integer, primary_key=True)
-    company_id = db.Column(db.Integer, db.ForeignKey('company.id'), nullable=False)
+    company_id = db.Column(db.Integer, db.ForeignKey('company.id'), nullable=False, index=True)
     linkedin = db.Column(db.String(255))
     twitter = db.Column(db.String(255))
     instagram = db.Column(db.String(255))
@@ -84,7 +120,7 @@ class SocialMedia(db.Model):
 class CompetitorAnalysis(db.Model):
     """Model for competitor analysis data"""
     id = db.Column(db.Integer, primary_key=True)
-    company_id = db.Column(db.Integer, db.ForeignKey('company.id'), nullable=False)
+    company_id = db.Column(db.Integer, db.ForeignKey('company.id'), nullable=False, index=True)
     competitor_name = db.Column(db.String(100), nullable=False)
     competitor_website = db.Column(db.String(255))
     competitor_industry = db.Column(db.String(100))
@@ -105,7 +141,7 @@ class CompetitorAnalysis(db.Model):
 class SentimentAnalysis(db.Model):
     """Model for sentiment analysis of reviews and online presence"""
     id = db.Column(db.Integer, primary_key=True)
-    company_id = db.Column(db.Integer, db.ForeignKey('company.id'), nullable=False)
+    company_id = db.Column(db.Integer, db.ForeignKey('company.id'), nullable=False, index=True)
     source = db.Column(db.String(100))  # Trustpilot, G2, etc.
     rating = db.Column(db.Float)  # Average rating (0-5)
     review_count = db.Column(db.Integer)
@@ -121,6 +157,43 @@ class SentimentAnalysis(db.Model):
     def __repr__(self):
         return f'<SentimentAnalysis for {self.company.name} from {self.source}>'
         
+class EnrichmentTask(db.Model):
+    """Deferred scrape/summary/social media enrichment for a company"""
+    id = db.Column(db.Integer, primary_key=True)
+    company_id = db.Column(db.Integer, db.ForeignKey('company.id'), nullable=False, index=True)
+    status = db.Column(db.String(20), default='pending', index=True)  # pending, done, failed
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    processed_at = db.Column(db.DateTime)
+    
+    company = db.relationship('Company')
+    
+    def __repr__(self):
+        return f'<EnrichmentTask {self.id} for company {self.company_id} ({self.status})>'
+        
+class CompanyFingerprint(db.Model):
+    """HTTP validators and extracted-text hash from a company's last scrape, to skip unchanged sites"""
+    id = db.Column(db.Integer, primary_key=True)
+    company_id = db.Column(db.Integer, db.ForeignKey('company.id'), nullable=False, unique=True)
+    url = db.Column(db.String(255))
+    etag = db.Column(db.String(255))
+    last_modified = db.Column(db.String(100))
+    content_hash = db.Column(db.String(64))  # SHA-256 of the whitespace-normalized text
+    checked_at = db.Column(db.DateTime)
+    changed_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<CompanyFingerprint for company {self.company_id}>'
+        
+class CompanyVector(db.Model):
+    """Hashed text embedding of a company for the similar-companies index"""
+    company_id = db.Column(db.Integer, db.ForeignKey('company.id', ondelete='CASCADE'), primary_key=True)
+    vector = db.Column(db.LargeBinary, nullable=False)  # float32, L2-normalized
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    def __repr__(self):
+        return f'<CompanyVector for company {self.company_id}>'
+        
 class AutoScraperSchedule(db.Model):
     """Model for automated scraping schedule"""
     id = db.Column(db.Integer, primary_key=True)
@@ -137,6 +210,81 @@ class AutoScraperSchedule(db.Model):
     next_run = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # The scheduler polls for active schedules by next_run
+    __table_args__ = (
+        db.Index('ix_auto_scraper_schedule_is_active_next_run', 'is_active', 'next_run'),
+    )
     
     def __repr__(self):
         return f'<AutoScraperSchedule {self.name} ({self.frequency})>'
+
+class Job(db.Model):
+    """Queued background work (scrapes, enrichment, competitor batches) claimed by worker processes"""
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)  # scrape, enrich, competitors
+    payload = db.Column(db.Text)  # JSON handler arguments
+    status = db.Column(db.String(20), default='queued', nullable=False)  # queued, running, done, dead
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    max_attempts = db.Column(db.Integer, default=5, nullable=False)
+    run_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)  # Not before (retry backoff)
+    locked_by = db.Column(db.String(100))  # Worker holding the lease
+    locked_until = db.Column(db.DateTime)  # Lease expiry, extended by heartbeats
+    result = db.Column(db.Text)  # JSON handler result
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    # Workers claim queued jobs by run_at and reap running jobs by lease expiry
+    __table_args__ = (
+        db.Index('ix_job_status_run_at', 'status', 'run_at'),
+        db.Index('ix_job_status_locked_until', 'status', 'locked_until'),
+    )
+
+    def __repr__(self):
+        return f'<Job {self.id} {self.kind} ({self.status})>'
+
+class ReminderCursor(db.Model):
+    """How far the follow-up reminder dispatcher has got, as a (next_follow_up, lead id) position"""
+    name = db.Column(db.String(50), primary_key=True)
+    due_at = db.Column(db.DateTime, nullable=False)
+    lead_id = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ReminderCursor {self.name} at {self.due_at}>'
+
+# Change tracking for the lead change feed and ETags. A lead's API
+# representation includes its company and social media, so changes to
+# those bump the lead's updated_at too, and deletions leave a tombstone.
+@event.listens_for(Lead, 'after_delete')
+def record_deleted_lead(mapper, connection, target):
+    connection.execute(DeletedLead.__table__.insert().values(
+        lead_id=target.id,
+        deleted_at=datetime.utcnow()
+    ))
+
+@event.listens_for(Company, 'after_delete')
+def record_deleted_company(mapper, connection, target):
+    connection.execute(DeletedCompany.__table__.insert().values(
+        company_id=target.id,
+        deleted_at=datetime.utcnow()
+    ))
+
+def touch_company_leads(connection, company_id):
+    """Mark every lead of a company as updated"""
+    connection.execute(
+        Lead.__table__.update()
+        .where(Lead.__table__.c.company_id == company_id)
+        .values(updated_at=datetime.utcnow())
+    )
+
+@event.listens_for(Company, 'after_update')
+def company_updated(mapper, connection, target):
+    touch_company_leads(connection, target.id)
+
+@event.listens_for(SocialMedia, 'after_insert')
+@event.listens_for(SocialMedia, 'after_update')
+def social_media_updated(mapper, connection, target):
+    touch_company_leads(connection, target.company_id)
@@ -0,0 +1,194 @@
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from app import db
+from models import Company, CompanyFingerprint, SocialMedia
+from enrichment import apply_company_data, fetch_summary_and_social_media
+from scraper import extract_page_text, fetch_page, infer_company_info_from_text
+
+logger = logging.getLogger(__name__)
+
+# Concurrent site downloads during a re-scrape
+RESCRAPE_WORKERS = int(os.environ.get("RESCRAPE_WORKERS", "16"))
+
+# Companies loaded, checked and written per batch
+RESCRAPE_BATCH_SIZE = 500
+
+MAX_REPORTED_ERRORS = 100
+
+def content_hash(text):
+    """SHA-256 of page text with whitespace normalized, so reflowed markup doesn't count as a change"""
+    return hashlib.sha256(' '.join(text.split()).encode('utf-8')).hexdigest()
+
+def company_url(company):
+    return company.website or (f'https://{company.domain}' if company.domain else None)
+
+def check_company(snapshot, force=False):
+    """
+    Download a company's site and extract its details only if it changed.
+
+    Runs on a worker thread without database access: snapshot holds the
+    company's name, url, description, summary, whether it has social
+    media, and previous fingerprint values. Changed companies are
+    summarized and their social media looked up here, if needed, so
+    applying the result makes no network calls.
+
+    Returns:
+        dict: 'status' ('skipped', 'refreshed' or 'failed'), the new
+            validators and hash, and for refreshed sites 'company_data'
+    """
+    try:
+        response = fetch_page(
+            snapshot['url'],
+            etag=None if force else snapshot['etag'],
+            last_modified=None if force else snapshot['last_modified']
+        )
+        if response.status_code == 304:
+            return {'status': 'skipped'}
+        if response.status_code != 200:
+            return {'status': 'failed', 'error': f'HTTP {response.status_code}'}
+
+        text = extract_page_text(response.text)
+        if not text:
+            return {'status': 'failed', 'error': 'No text extracted'}
+
+        outcome = {
+            'status': 'skipped',
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'content_hash': content_hash(text)
+        }
+        if outcome['content_hash'] == snapshot['content_hash'] and not force:
+            return outcome
+
+        company_data = infer_company_info_from_text(text, snapshot['name'])
+        # A changed description replaces the summary, so summarize it afresh
+        description = company_data.get('description')
+        changed = description and description != snapshot['description']
+        fetch_summary_and_social_media(
+            company_data, snapshot['name'],
+            description=description if changed else snapshot['description'],
+            summary=None if changed else snapshot['summary'],
+            has_social_media=snapshot['has_social_media']
+        )
+
+        outcome.update(status='refreshed', company_data=company_data)
+        return outcome
+    except Exception as e:
+        logger.debug("Re-scrape error details", exc_info=True)
+        return {'status': 'failed', 'error': str(e) or e.__class__.__name__}
+
+def rescrape_batch(companies, executor, force, counts, now):
+    fingerprints = {
+        fingerprint.company_id: fingerprint
+        for fingerprint in CompanyFingerprint.query.filter(
+            CompanyFingerprint.company_id.in_([company.id for company in companies])
+        )
+    }
+    with_social_media = {
+        company_id for company_id, in db.session.query(SocialMedia.company_id).filter(
+            SocialMedia.company_id.in_([company.id for company in companies])
+        )
+    }
+
+    snapshots = []
+    for company in companies:
+        url = company_url(company)
+        if not url:
+            counts['failed'] += 1
+            record_error(counts, company, 'No website or domain')
+            continue
+        fingerprint = fingerprints.get(company.id)
+        # A changed URL invalidates the old validators and hash
+        if fingerprint and fingerprint.url != url:
+            fingerprint = None
+        snapshots.append({
+            'company': company,
+            'name': company.name,
+            'url': url,
+            'description': company.description,
+            'summary': company.summary,
+            'has_social_media': company.id in with_social_media,
+            'etag': fingerprint.etag if fingerprint else None,
+            'last_modified': fingerprint.last_modified if fingerprint else None,
+            'content_hash': fingerprint.content_hash if fingerprint else None
+        })
+
+    outcomes = executor.map(lambda snapshot: check_company(snapshot, force), snapshots)
+    for snapshot, outcome in zip(snapshots, outcomes):
+        company = snapshot['company']
+        counts[outcome['status']] += 1
+        if outcome['status'] == 'failed':
+            record_error(counts, company, outcome['error'])
+            continue
+
+        fingerprint = fingerprints.get(company.id)
+        if not fingerprint:
+            fingerprint = CompanyFingerprint(company_id=company.id)
+            db.session.add(fingerprint)
+        fingerprint.url = snapshot['url']
+        fingerprint.checked_at = now
+        if 'content_hash' in outcome:
+            fingerprint.etag = outcome['etag']
+            fingerprint.last_modified = outcome['last_modified']
+            fingerprint.content_hash = outcome['content_hash']
+
+        if outcome['status'] == 'refreshed':
+            fingerprint.changed_at = now
+            try:
+                with db.session.begin_nested():
+                    apply_company_data(company, outcome['company_data'], overwrite=True)
+            except Exception as e:
+                logger.error("Error updating company %s from re-scrape: %s", company.id, e)
+                counts['refreshed'] -= 1
+                counts['failed'] += 1
+                record_error(counts, company, str(e))
+
+    db.session.commit()
+
+def record_error(counts, company, error):
+    if len(counts['errors']) < MAX_REPORTED_ERRORS:
+        counts['errors'].append({'company_id': company.id, 'name': company.name, 'error': error})
+
+def rescrape_companies(query=None, force=False, workers=RESCRAPE_WORKERS, batch_size=RESCRAPE_BATCH_SIZE):
+    """
+    Re-scrape companies, skipping those whose site hasn't changed.
+
+    Each site is downloaded with the ETag/Last-Modified validators from
+    its previous scrape, so unchanged sites answer 304 without a body;
+    otherwise the extracted text is hashed and compared with the stored
+    hash. Only changed companies go through extraction, summarization
+    and rescoring.
+
+    Args:
+        query: Company query to re-scrape (default: all companies)
+        force (bool): Re-extract every company, ignoring fingerprints
+        workers (int): Concurrent downloads
+        batch_size (int): Companies loaded and committed per batch
+
+    Returns:
+        dict: Counts of companies skipped, refreshed and failed, plus the
+            first errors
+    """
+    query = query if query is not None else Company.query
+    counts = {'checked': 0, 'skipped': 0, 'refreshed': 0, 'failed': 0, 'errors': []}
+    last_id = 0
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='rescrape') as executor:
+        while True:
+            companies = query.filter(Company.id > last_id).order_by(Company.id).limit(batch_size).all()
+            if not companies:
+                break
+            last_id = companies[-1].id
+            counts['checked'] += len(companies)
+            rescrape_batch(companies, executor, force, counts, datetime.utcnow())
+            db.session.expunge_all()
+            logger.info(
+                "Re-scraped %s companies: %s skipped, %s refreshed, %s failed",
+                counts['checked'], counts['skipped'], counts['refreshed'], counts['failed']
+            )
+
+    return counts
@@ -0,0 +1,452 @@
+import calendar
+import logging
+import os
+import random
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+from sqlalchemy import func, update
+
+from app import db
+from models import Lead, Company, SocialMedia, AutoScraperSchedule
+from email_tools import validate_email
+from lead_import import normalize_domain
+from dedup import find_duplicate_company, source_domain
+from scoring import count_social_profiles, score_lead
+from scraper import http_get, search_company
+from scrape_jobs import ScrapeError, normalize_scrape_sources, run_scrape_pipeline
+
+logger = logging.getLogger(__name__)
+
+# Schedule runs executing at once per process
+SCHEDULER_WORKERS = int(os.environ.get("SCHEDULER_WORKERS", "2"))
+
+# Longest sleep between checks for due schedules (seconds)
+SCHEDULER_POLL_SECONDS = float(os.environ.get("SCHEDULER_POLL_SECONDS", "30"))
+
+# Random delay added to each next_run (seconds, capped at a tenth of the
+# schedule's interval) so schedules sharing a time don't all fire at once
+SCHEDULER_JITTER_SECONDS = float(os.environ.get("SCHEDULER_JITTER_SECONDS", "300"))
+
+# Candidate companies scraped per lead wanted, for directory schedules
+# whose filters reject some companies
+DIRECTORY_CANDIDATES_PER_LEAD = 3
+
+FREQUENCIES = ('daily', 'weekly', 'monthly', 'custom')
+
+CRON_MACROS = {
+    '@hourly': '0 * * * *',
+    '@daily': '0 0 * * *',
+    '@midnight': '0 0 * * *',
+    '@weekly': '0 0 * * 0',
+    '@monthly': '0 0 1 * *',
+    '@yearly': '0 0 1 1 *',
+    '@annually': '0 0 1 1 *',
+}
+MONTH_NAMES = {name.lower(): index for index, name in enumerate(calendar.month_abbr) if name}
+DAY_NAMES = {name: index for index, name in enumerate(('sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat'))}
+
+# Parsed cron expression: allowed values per field, and whether the day of
+# month / day of week fields were restricted (cron ORs them when both are)
+CronSchedule = namedtuple('CronSchedule', [
+    'minutes', 'hours', 'days', 'months', 'weekdays', 'days_restricted', 'weekdays_restricted'
+])
+
+def parse_cron_field(field, low, high, names=None):
+    """Parse one cron field (*, lists, ranges, steps, names) into a set of values"""
+    values = set()
+    for part in field.lower().split(','):
+        part, _, step = part.partition('/')
+        step = int(step) if step else 1
+        if step < 1:
+            raise ValueError(f"Invalid step in cron field '{field}'")
+
+        if part == '*':
+            start, end = low, high
+        else:
+            start, _, end = part.partition('-')
+            start = names[start] if names and start in names else int(start)
+            end = (names[end] if names and end in names else int(end)) if end else (high if step > 1 else start)
+        if start < low or end > high or start > end:
+            raise ValueError(f"Cron field '{field}' must be within {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return values
+
+def parse_cron(expression):
+    """
+    Parse a five-field cron expression (minute hour day month weekday) or
+    a macro such as @daily.
+
+    Raises:
+        ValueError: If the expression is invalid
+    """
+    expression = CRON_MACROS.get(expression.strip().lower(), expression)
+    fields = expression.split()
+    if len(fields) != 5:
+        raise ValueError('Cron expressions need five fields: minute hour day month weekday')
+
+    try:
+        minute, hour, day, month, weekday = fields
+        weekdays = parse_cron_field(weekday, 0, 7, DAY_NAMES)
+        return CronSchedule(
+            minutes=parse_cron_field(minute, 0, 59),
+            hours=parse_cron_field(hour, 0, 23),
+            days=parse_cron_field(day, 1, 31),
+            months=parse_cron_field(month, 1, 12, MONTH_NAMES),
+            weekdays={value % 7 for value in weekdays},  # 7 is Sunday too
+            days_restricted=day != '*',
+            weekdays_restricted=weekday != '*'
+        )
+    except (KeyError, ValueError) as e:
+        raise ValueError(f"Invalid cron expression '{expression}': {e}")
+
+def cron_day_matches(cron, moment):
+    day_match = moment.day in cron.days
+    weekday_match = (moment.weekday() + 1) % 7 in cron.weekdays
+    if cron.days_restricted and cron.weekdays_restricted:
+        return day_match or weekday_match
+    return day_match and weekday_match
+
+def next_cron_time(cron, after):
+    """
+    First minute after 'after' matching a parsed cron expression. Skips
+    whole months, days and hours that can't match instead of testing
+    every minute.
+
+    Raises:
+        ValueError: If nothing matches within five years (e.g. 30 February)
+    """
+    moment = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    limit = after + timedelta(days=5 * 366)
+
+    while moment <= limit:
+        if moment.month not in cron.months:
+            year, month = (moment.year + 1, 1) if moment.month == 12 else (moment.year, moment.month + 1)
+            moment = datetime(year, month, 1)
+        elif not cron_day_matches(cron, moment):
+            moment = datetime(moment.year, moment.month, moment.day) + timedelta(days=1)
+        elif moment.hour not in cron.hours:
+            moment = moment.replace(minute=0) + timedelta(hours=1)
+        elif moment.minute not in cron.minutes:
+            moment += timedelta(minutes=1)
+        else:
+            return moment
+
+    raise ValueError('Cron expression never matches')
+
+def schedule_cron(schedule):
+    """
+    Cron expression for a schedule. Daily, weekly and monthly schedules
+    run at the time of day (and weekday / day of month) they were created,
+    so their runs don't drift by the jitter added each time.
+    """
+    if schedule.frequency == 'custom':
+        return schedule.custom_cron or ''
+
+    anchor = schedule.created_at or datetime.utcnow()
+    if schedule.frequency == 'weekly':
+        return f'{anchor.minute} {anchor.hour} * * {(anchor.weekday() + 1) % 7}'
+    if schedule.frequency == 'monthly':
+        return f'{anchor.minute} {anchor.hour} {min(anchor.day, 28)} * *'
+    return f'{anchor.minute} {anchor.hour} * * *'
+
+def compute_next_run(schedule, now=None):
+    """
+    Next run time for a schedule after now, including jitter.
+
+    Raises:
+        ValueError: If the schedule's frequency or cron expression is invalid
+    """
+    if schedule.frequency not in FREQUENCIES:
+        raise ValueError(f"'frequency' must be one of: {', '.join(FREQUENCIES)}")
+
+    now = now or datetime.utcnow()
+    cron = parse_cron(schedule_cron(schedule))
+    next_run = next_cron_time(cron, now)
+    interval = (next_cron_time(cron, next_run) - next_run).total_seconds()
+    jitter = random.uniform(0, min(SCHEDULER_JITTER_SECONDS, interval / 10))
+    return next_run + timedelta(seconds=jitter)
+
+def directory_sources(url, limit):
+    """Websites linked from a directory page, one per domain, at most limit"""
+    response = http_get(url, timeout=15, headers={'User-Agent': 'Mozilla/5.0 (compatible; LeadScraper/1.0)'})
+    response.raise_for_status()
+    directory_domain = normalize_domain(url)
+
+    links = []
+    for anchor in BeautifulSoup(response.text, 'html.parser').find_all('a', href=True):
+        link = urljoin(url, anchor['href'])
+        if link.startswith(('http://', 'https://')) and normalize_domain(link) != directory_domain:
+            links.append(link)
+
+    sources, _, _ = normalize_scrape_sources(links)
+    return sources[:limit]
+
+def schedule_sources(schedule):
+    """
+    Websites or company names to scrape for a schedule run.
+
+    'website' schedules scrape the source URL(s), one per line; 'search'
+    schedules treat the source as a search query; 'directory' schedules
+    scrape the external sites a directory page links to.
+    """
+    source = (schedule.source_url or '').strip()
+    if not source:
+        return []
+    max_leads = schedule.max_leads or 20
+
+    if schedule.source_type == 'search':
+        return search_company(source)[:max_leads]
+    if schedule.source_type == 'directory':
+        return directory_sources(source, max_leads * DIRECTORY_CANDIDATES_PER_LEAD)
+
+    sources, _, _ = normalize_scrape_sources(source.splitlines())
+    return sources
+
+def matches_filters(company_data, schedule):
+    """Whether scraped company data passes a schedule's industry/country filters"""
+    for value, wanted in ((company_data.get('industry'), schedule.industry_filter),
+                          (company_data.get('country'), schedule.country_filter)):
+        if wanted and wanted.strip().lower() not in (value or '').lower():
+            return False
+    return True
+
+def save_scraped_lead(company_data):
+    """
+    Store scraped company data as a company (reused if one with the same
+    normalized name or domain is known) and a lead for its owner, or an
+    info@ address.
+
+    Returns:
+        bool: True if a new lead was created
+    """
+    domain = normalize_domain(company_data.get('domain') or company_data.get('website'))
+    company = find_duplicate_company(company_data['name'], domain=domain, exact=True)
+
+    if not company:
+        company = Company(
+            name=company_data['name'],
+            industry=company_data.get('industry', 'Unknown'),
+            size=company_data.get('size', 'Unknown'),
+            description=company_data.get('description', ''),
+            summary=company_data.get('summary', ''),
+            website=company_data.get('website', ''),
+            domain=domain or '',
+            country=company_data.get('country', 'Unknown'),
+            owner_name=company_data.get('owner_name', ''),
+            owner_email=company_data.get('owner_email', ''),
+            owner_email_status=company_data.get('owner_email_status', 'unknown'),
+            owner_phone=company_data.get('owner_phone', ''),
+            owner_linkedin=company_data.get('owner_linkedin', ''),
+            target_audience=company_data.get('target_audience', ''),
+            revenue=company_data.get('revenue', 'Unknown'),
+            linkedin_activity=company_data.get('linkedin_activity', 'Unknown')
+        )
+        db.session.add(company)
+        db.session.flush()
+        social_links = company_data.get('social_media') or {}
+        db.session.add(SocialMedia(
+            company_id=company.id,
+            linkedin=social_links.get('linkedin'),
+            twitter=social_links.get('twitter'),
+            instagram=social_links.get('instagram'),
+            facebook=social_links.get('facebook')
+        ))
+        db.session.flush()
+
+    email = company_data.get('owner_email') or (f'info@{domain}' if domain else None)
+    if not email or Lead.query.filter_by(email=email).first():
+        db.session.commit()
+        return False
+
+    email_status = validate_email(email)['status']
+    social_media = SocialMedia.query.filter_by(company_id=company.id).first()
+    db.session.add(Lead(
+        name=company_data.get('owner_name') or f'Contact {company.name}',
+        email=email,
+        email_status=email_status,
+        phone=company_data.get('owner_phone'),
+        linkedin_profile=company_data.get('owner_linkedin'),
+        score=score_lead(email_status, company.size, company.industry, count_social_profiles(social_media)),
+        company_id=company.id
+    ))
+    db.session.commit()
+    return True
+
+def run_schedule(schedule_id):
+    """
+    Execute one run of a schedule: scrape its sources until max_leads new
+    leads pass the industry/country filters.
+
+    Returns:
+        dict: Counts of leads created and sources failed, filtered out or
+            already known
+    """
+    schedule = db.session.get(AutoScraperSchedule, schedule_id)
+    counts = {'created': 0, 'failed': 0, 'filtered': 0, 'existing': 0}
+    max_leads = schedule.max_leads or 20
+
+    for source in schedule_sources(schedule):
+        if counts['created'] >= max_leads:
+            break
+        # Skip companies we already have before paying for the scrape; only
+        # exact matches, as nobody is there to confirm a similar name
+        if find_duplicate_company(source, domain=source_domain(source), exact=True):
+            counts['existing'] += 1
+            continue
+        try:
+            company_data = run_scrape_pipeline(source)
+        except ScrapeError as e:
+            logger.warning("Schedule %s: no data for %s: %s", schedule.name, source, e)
+            counts['failed'] += 1
+            continue
+        except Exception as e:
+            logger.error("Schedule %s: error scraping %s: %s", schedule.name, source, e)
+            counts['failed'] += 1
+            continue
+
+        if not matches_filters(company_data, schedule):
+            counts['filtered'] += 1
+        elif save_scraped_lead(company_data):
+            counts['created'] += 1
+        else:
+            counts['existing'] += 1
+
+    logger.info("Schedule %s run finished: %s", schedule.name, counts)
+    return counts
+
+def claim_schedule(schedule_id, expected_next_run, next_run, now):
+    """
+    Move a due schedule's next_run forward, but only if no other instance
+    already has (compare-and-swap on the next_run we read), so each due
+    run is claimed exactly once.
+
+    Returns:
+        bool: True if this caller claimed the run
+    """
+    result = db.session.execute(
+        update(AutoScraperSchedule)
+        .where(
+            AutoScraperSchedule.id == schedule_id,
+            AutoScraperSchedule.next_run == expected_next_run,
+            AutoScraperSchedule.is_active.is_(True)
+        )
+        .values(last_run=now, next_run=next_run)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+class Scheduler:
+    """
+    Polls for due schedules and runs them on a bounded thread pool.
+
+    Any number of app instances can run a Scheduler against the same
+    database: runs are claimed with claim_schedule, and an instance only
+    claims as many runs as it has free workers.
+    """
+
+    def __init__(self, app, workers=SCHEDULER_WORKERS, poll_seconds=SCHEDULER_POLL_SECONDS):
+        self.app = app
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='schedule')
+        self.running = 0
+        self.running_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def poll(self, now=None):
+        """
+        Claim and dispatch due schedules, up to the number of free workers.
+
+        Returns:
+            int: Number of runs dispatched
+        """
+        with self.running_lock:
+            free = self.workers - self.running
+        if free <= 0:
+            return 0
+
+        now = now or datetime.utcnow()
+        dispatched = 0
+        with self.app.app_context():
+            # New active schedules without a next_run are due straight away
+            db.session.execute(
+                update(AutoScraperSchedule)
+                .where(AutoScraperSchedule.is_active.is_(True), AutoScraperSchedule.next_run.is_(None))
+                .values(next_run=now)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+
+            due = (
+                AutoScraperSchedule.query
+                .filter(AutoScraperSchedule.is_active.is_(True), AutoScraperSchedule.next_run <= now)
+                .order_by(AutoScraperSchedule.next_run)
+                .limit(free)
+                .all()
+            )
+            for schedule in due:
+                try:
+                    next_run = compute_next_run(schedule, now)
+                except ValueError as e:
+                    logger.error("Schedule %s has an invalid timing, retrying in a day: %s", schedule.name, e)
+                    claim_schedule(schedule.id, schedule.next_run, now + timedelta(days=1), schedule.last_run)
+                    continue
+
+                if claim_schedule(schedule.id, schedule.next_run, next_run, now):
+                    with self.running_lock:
+                        self.running += 1
+                    self.executor.submit(self.execute, schedule.id)
+                    dispatched += 1
+            db.session.remove()
+
+        return dispatched
+
+    def execute(self, schedule_id):
+        try:
+            with self.app.app_context():
+                run_schedule(schedule_id)
+        except Exception as e:
+            logger.error("Error running schedule %s: %s", schedule_id, e)
+            logger.debug("Schedule error details", exc_info=True)
+        finally:
+            with self.running_lock:
+                self.running -= 1
+
+    def seconds_until_next_run(self):
+        """Seconds until the earliest active schedule is due, capped at poll_seconds"""
+        with self.app.app_context():
+            next_run = db.session.query(func.min(AutoScraperSchedule.next_run)) \
+                .filter(AutoScraperSchedule.is_active.is_(True)).scalar()
+            db.session.remove()
+        if next_run is None:
+            return self.poll_seconds
+        return max(1.0, min(self.poll_seconds, (next_run - datetime.utcnow()).total_seconds()))
+
+    def run_forever(self):
+        logger.info("Scheduler started with %s workers", self.workers)
+        while not self.stop_event.is_set():
+            try:
+                self.poll()
+                wait = self.seconds_until_next_run()
+            except Exception as e:
+                logger.error("Scheduler poll failed: %s", e)
+                wait = self.poll_seconds
+            self.stop_event.wait(wait)
+
+    def start(self):
+        """Run the scheduler loop in a background thread"""
+        self.thread = threading.Thread(target=self.run_forever, name='scheduler', daemon=True)
+        self.thread.start()
+
+    def stop(self, wait=True):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+        self.executor.shutdown(wait=wait)
@@ -0,0 +1,287 @@
+import copy
+from collections import namedtuple
+from flask import current_app, has_app_context
+from sqlalchemy import and_, case, func, select, update
+
+from app import db
+from models import Lead, Company, SocialMedia
+
+# NumPy is only needed to rescore leads in bulk
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Points awarded for each lead scoring factor. Override any of them with
+# the LEAD_SCORING_WEIGHTS setting (JSON, merged over these defaults).
+DEFAULT_WEIGHTS = {
+    'email_status': {'valid': 40, 'risky': 20},
+    'company_size': {'Enterprise': 20, 'Mid-Market': 15, 'SMB': 10},
+    'social_media_per_profile': 5,
+    'social_media_max': 20,
+    'relevant_industries': ['Technology', 'Finance', 'Healthcare', 'Retail'],
+    'relevant_industry': 20,
+    'other_industry': 10,
+}
+
+# Leads written per bulk UPDATE when saving new scores
+RESCORE_BATCH_SIZE = 5000
+
+PERCENTILES = (10, 25, 50, 75, 90)
+
+# Per-lead inputs to the score, one array (or list) per feature
+ScoringFeatures = namedtuple('ScoringFeatures', [
+    'ids', 'email_status', 'company_size', 'industry', 'social_profiles', 'scores'
+])
+
+def merge_weights(overrides=None):
+    """
+    Merge weight overrides over DEFAULT_WEIGHTS.
+
+    Args:
+        overrides (dict): Partial weights, e.g. {'email_status': {'valid': 50}}
+
+    Returns:
+        dict: Complete weights
+
+    Raises:
+        ValueError: For unknown keys or non-numeric points
+    """
+    weights = copy.deepcopy(DEFAULT_WEIGHTS)
+    if not overrides:
+        return weights
+    if not isinstance(overrides, dict):
+        raise ValueError("'weights' must be an object")
+
+    for key, value in overrides.items():
+        if key not in weights:
+            raise ValueError(f"Unknown scoring weight '{key}'")
+        if key == 'relevant_industries':
+            if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+                raise ValueError("'relevant_industries' must be a list of industry names")
+            weights[key] = value
+        elif isinstance(weights[key], dict):
+            if not isinstance(value, dict) or not all(is_number(points) for points in value.values()):
+                raise ValueError(f"'{key}' must map values to points")
+            weights[key].update(value)
+        elif is_number(value):
+            weights[key] = value
+        else:
+            raise ValueError(f"'{key}' must be a number")
+    return weights
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def get_scoring_weights():
+    """Weights in effect for the app: DEFAULT_WEIGHTS plus LEAD_SCORING_WEIGHTS"""
+    if has_app_context():
+        return merge_weights(current_app.config.get('LEAD_SCORING_WEIGHTS'))
+    return merge_weights()
+
+def count_social_profiles(social_media):
+    """Count the social media profiles a company has links for"""
+    if not social_media:
+        return 0
+    return sum(1 for link in [
+        social_media.linkedin,
+        social_media.twitter,
+        social_media.instagram,
+        social_media.facebook
+    ] if link)
+
+def score_lead(email_status, company_size, industry, social_profile_count, weights=None):
+    """
+    Calculate a lead score based on various factors:
+    - Email validity (0-40 points)
+    - Company size (0-20 points)
+    - Social media presence (0-20 points)
+    - Industry relevance (0-20 points)
+
+    Args:
+        email_status (str): valid, invalid, risky or unknown
+        company_size (str): Company size category
+        industry (str): Company industry
+        social_profile_count (int): Number of social media profiles
+        weights (dict): Scoring weights, defaults to get_scoring_weights()
+
+    Returns:
+        int: Lead score
+    """
+    weights = weights or get_scoring_weights()
+    score = weights['email_status'].get(email_status, 0)
+    score += weights['company_size'].get(company_size, 0)
+    score += min(social_profile_count * weights['social_media_per_profile'], weights['social_media_max'])
+
+    if industry in weights['relevant_industries']:
+        score += weights['relevant_industry']
+    else:
+        score += weights['other_industry']
+
+    return int(round(score))
+
+def social_profiles_column():
+    """
+    SQL expression counting a lead's company's social media profiles, and
+    the join it needs (to the company's first SocialMedia row, like
+    count_social_profiles(SocialMedia.query.filter_by(...).first())).
+    """
+    first_social = (
+        select(SocialMedia.company_id, func.min(SocialMedia.id).label('social_media_id'))
+        .group_by(SocialMedia.company_id)
+        .subquery()
+    )
+    count = sum(
+        case((and_(link.is_not(None), link != ''), 1), else_=0)
+        for link in (SocialMedia.linkedin, SocialMedia.twitter, SocialMedia.instagram, SocialMedia.facebook)
+    )
+    return first_social, count
+
+def load_scoring_features(query):
+    """
+    Load every scoring input for the leads in a query, in one query.
+
+    Args:
+        query: Lead query joined to Company (e.g. from filter_leads_query)
+
+    Returns:
+        ScoringFeatures: Columnar features, as NumPy arrays when available
+    """
+    first_social, social_count = social_profiles_column()
+    rows = (
+        query.order_by(None)
+        .outerjoin(first_social, first_social.c.company_id == Lead.company_id)
+        .outerjoin(SocialMedia, SocialMedia.id == first_social.c.social_media_id)
+        .with_entities(
+            Lead.id, Lead.email_status, Company.size, Company.industry,
+            func.coalesce(social_count, 0), Lead.score
+        )
+        .all()
+    )
+    columns = list(zip(*rows)) if rows else [()] * 6
+
+    if np is None:
+        return ScoringFeatures(*[list(column) for column in columns[:5]], [value or 0 for value in columns[5]])
+
+    return ScoringFeatures(
+        ids=np.array(columns[0], dtype=np.int64),
+        email_status=np.array([value or '' for value in columns[1]], dtype=object),
+        company_size=np.array([value or '' for value in columns[2]], dtype=object),
+        industry=np.array([value or '' for value in columns[3]], dtype=object),
+        social_profiles=np.array(columns[4], dtype=np.int64),
+        scores=np.array([value or 0 for value in columns[5]], dtype=np.int64),
+    )
+
+def category_points(values, points, default=0):
+    """Map an array of category labels to points, looking up each distinct label once"""
+    labels, inverse = np.unique(values, return_inverse=True)
+    lookup = np.array([points.get(label, default) for label in labels], dtype=np.float64)
+    return lookup[inverse.reshape(-1)]
+
+def compute_scores(features, weights=None):
+    """
+    Score every lead in a ScoringFeatures batch.
+
+    With NumPy each factor is computed for all leads at once; categorical
+    features are mapped to points per distinct value.
+
+    Returns:
+        Array (or list) of integer scores, aligned with features.ids
+    """
+    weights = weights or get_scoring_weights()
+
+    if np is None:
+        return [
+            score_lead(status, size, industry, social, weights)
+            for status, size, industry, social in zip(
+                features.email_status, features.company_size, features.industry, features.social_profiles
+            )
+        ]
+
+    if not len(features.ids):
+        return np.zeros(0, dtype=np.int64)
+
+    relevant = set(weights['relevant_industries'])
+    industry_points = {
+        label: weights['relevant_industry'] if label in relevant else weights['other_industry']
+        for label in np.unique(features.industry)
+    }
+    scores = (
+        category_points(features.email_status, weights['email_status'])
+        + category_points(features.company_size, weights['company_size'])
+        + np.minimum(features.social_profiles * weights['social_media_per_profile'], weights['social_media_max'])
+        + category_points(features.industry, industry_points)
+    )
+    return np.rint(scores).astype(np.int64)
+
+def score_distribution(scores):
+    """Summary of a set of scores: mean, percentiles and a 10-point histogram"""
+    scores = np.asarray(scores, dtype=np.int64) if np is not None else sorted(scores)
+    total = len(scores)
+    if not total:
+        return {'count': 0, 'mean': 0, 'percentiles': {}, 'histogram': []}
+
+    if np is not None:
+        mean = float(scores.mean())
+        percentiles = {f'p{p}': float(value) for p, value in zip(PERCENTILES, np.percentile(scores, PERCENTILES))}
+        buckets = np.bincount(np.clip(scores // 10, 0, 9), minlength=10)
+    else:
+        mean = sum(scores) / total
+        percentiles = {f'p{p}': float(scores[min(total - 1, total * p // 100)]) for p in PERCENTILES}
+        buckets = [0] * 10
+        for score in scores:
+            buckets[min(max(score // 10, 0), 9)] += 1
+
+    # Same buckets as the score_histogram in /api/leads/stats
+    return {
+        'count': total,
+        'mean': round(mean, 1),
+        'percentiles': percentiles,
+        'histogram': [
+            {'min': index * 10, 'max': index * 10 + 9 if index < 9 else 100, 'count': int(buckets[index])}
+            for index in range(10)
+        ]
+    }
+
+def rescore_leads(query, weights=None, dry_run=False):
+    """
+    Recompute the scores of every lead in a query.
+
+    Features are loaded in one query, scored in one vectorized pass, and
+    only the leads whose score changed are written back, with bulk UPDATEs
+    by primary key.
+
+    Args:
+        query: Lead query joined to Company
+        weights (dict): Scoring weights, defaults to get_scoring_weights()
+        dry_run (bool): Report the resulting distribution without saving
+
+    Returns:
+        dict: Number of leads and changed scores, with the current and new
+            score distributions
+    """
+    features = load_scoring_features(query)
+    scores = compute_scores(features, weights)
+
+    if np is not None:
+        changed = np.flatnonzero(scores != features.scores)
+        updates = [{'id': int(features.ids[i]), 'score': int(scores[i])} for i in changed]
+    else:
+        updates = [
+            {'id': lead_id, 'score': score}
+            for lead_id, score, current in zip(features.ids, scores, features.scores)
+            if score != current
+        ]
+
+    if not dry_run:
+        for start in range(0, len(updates), RESCORE_BATCH_SIZE):
+            db.session.execute(update(Lead), updates[start:start + RESCORE_BATCH_SIZE])
+        db.session.commit()
+
+    return {
+        'count': len(features.ids),
+        'changed': len(updates),
+        'dry_run': dry_run,
+        'current': score_distribution(features.scores),
+        'rescored': score_distribution(scores),
+    }
@@ -0,0 +1,462 @@
+import copy
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from datetime import datetime
+
+from scraper import scrape_company_data
+from lead_import import normalize_domain
+from social_media_detector import detect_social_media
+from ai_summarizer import summarize_company
+from tracing import trace
+from logging_config import bind_log_context
+
+logger = logging.getLogger(__name__)
+
+# Scrapes running at once in this process; more jobs wait in the queue
+SCRAPE_WORKERS = int(os.environ.get("SCRAPE_WORKERS", "4"))
+
+# Finished jobs are kept this long (seconds) for status and event replay
+SCRAPE_JOB_TTL = 3600
+MAX_SCRAPE_JOBS = 1000
+
+# Seconds between SSE keepalive comments while a stage is running
+SSE_KEEPALIVE_SECONDS = 15
+
+# Batch scrape limits: sources per batch and scrapes running at once per batch
+MAX_BATCH_SOURCES = 5000
+DEFAULT_BATCH_CONCURRENCY = 8
+MAX_BATCH_CONCURRENCY = 16
+
+# Batch scrapes running at once across all batches in this process; each
+# batch still runs at most its own concurrency of them
+BATCH_SCRAPE_WORKERS = int(os.environ.get("BATCH_SCRAPE_WORKERS", str(MAX_BATCH_CONCURRENCY)))
+
+# Progress events, in pipeline order, then one of the terminal events
+SCRAPE_STAGES = ('started', 'website_found', 'text_extracted', 'company_info', 'summary_ready', 'socials_found')
+TERMINAL_EVENTS = ('done', 'failed')
+
+class ScrapeError(Exception):
+    """The scrape finished but found no usable company data"""
+
+class ScrapeJob:
+    """
+    A scrape running in the background, with the progress events it has
+    emitted so far. Readers wait on the condition for new events.
+    """
+
+    def __init__(self, source):
+        self.id = uuid.uuid4().hex
+        self.source = source
+        self.status = 'queued'  # queued, running, done, failed
+        self.events = []
+        self.result = None
+        self.error = None
+        self.created_at = datetime.utcnow()
+        self.finished_at = None
+        self.trace = None
+        self.condition = threading.Condition()
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed')
+
+    def emit(self, event, data=None):
+        """
+        Record a progress event and wake up anyone streaming the job. The
+        data is copied, as the pipeline keeps adding to the dicts it
+        reports while other threads serialize the events.
+        """
+        data = copy.deepcopy(data)
+        with self.condition:
+            self.events.append({'id': len(self.events) + 1, 'event': event, 'data': data})
+            self.condition.notify_all()
+
+    def finish(self, result=None, error=None):
+        """Mark the job done or failed, emitting the terminal event"""
+        with self.condition:
+            self.result = result
+            self.error = error
+            self.status = 'failed' if error else 'done'
+            self.finished_at = datetime.utcnow()
+            self.emit('failed' if error else 'done', {'message': error} if error else result)
+
+    def wait_for_events(self, after, timeout):
+        """
+        Events with an id greater than 'after', waiting up to timeout
+        seconds for one if there are none yet.
+        """
+        with self.condition:
+            if len(self.events) <= after and not self.finished:
+                self.condition.wait(timeout)
+            return self.events[after:]
+
+    def to_dict(self, timings=False):
+        """With timings, include the scrape's span timeline (see Trace.timings)"""
+        job = {
+            'job_id': self.id,
+            'source': self.source,
+            'status': self.status,
+            'events': self.events,
+            'company_data': self.result,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+        if timings:
+            job['timings'] = self.trace.timings() if self.trace else None
+        return job
+
+class BatchScrapeJob:
+    """
+    Many scrapes run with bounded concurrency. Results are appended in
+    completion order, so they can be streamed while the batch runs.
+    """
+
+    def __init__(self, sources, concurrency=DEFAULT_BATCH_CONCURRENCY, timings=False):
+        self.id = uuid.uuid4().hex
+        self.sources = sources
+        self.concurrency = concurrency
+        self.timings = timings  # add each scrape's span timeline to its result
+        self.status = 'queued'  # queued, running, done, cancelled
+        self.cancelled = False
+        self.results = []
+        self.succeeded = 0
+        self.failed = 0
+        self.created_at = datetime.utcnow()
+        self.finished_at = None
+        self.condition = threading.Condition()
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'cancelled')
+
+    def add_result(self, result):
+        with self.condition:
+            self.results.append(result)
+            if result['status'] == 'done':
+                self.succeeded += 1
+            elif result['status'] == 'failed':
+                self.failed += 1
+            self.condition.notify_all()
+
+    def finish(self):
+        with self.condition:
+            self.status = 'cancelled' if self.cancelled else 'done'
+            self.finished_at = datetime.utcnow()
+            self.condition.notify_all()
+
+    def wait_for_results(self, after, timeout):
+        """Results after the first 'after', waiting up to timeout seconds for more"""
+        with self.condition:
+            if len(self.results) <= after and not self.finished:
+                self.condition.wait(timeout)
+            return self.results[after:]
+
+    def to_dict(self):
+        return {
+            'batch_id': self.id,
+            'status': self.status,
+            'total': len(self.sources),
+            'completed': len(self.results),
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'cancelled': len(self.results) - self.succeeded - self.failed,
+            'concurrency': self.concurrency,
+            'failures': [
+                {'source': result['source'], 'error': result['error']}
+                for result in self.results if result['status'] == 'failed'
+            ],
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+# In-process job registry. Jobs and batches are only visible to the
+# process that runs them: run a single app process (with threads), or
+# with several nodes behind a load balancer, route /api/scrape requests
+# with sticky sessions. Work that any node can follow goes through the
+# Job table instead (work_queue.py, /api/jobs).
+jobs = OrderedDict()
+batches = OrderedDict()
+jobs_lock = threading.Lock()
+executor = ThreadPoolExecutor(max_workers=SCRAPE_WORKERS, thread_name_prefix='scrape')
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_SCRAPE_WORKERS, thread_name_prefix='batch-scrape')
+
+def run_scrape_pipeline(source, progress=None):
+    """
+    Scrape a company, then summarize it and find its social media.
+
+    Args:
+        source (str): Website URL or company name
+        progress (callable): Optional progress(stage, data) callback
+
+    Returns:
+        dict: Company data, with 'summary' and 'social_media'
+
+    Raises:
+        ScrapeError: If no company information was found
+    """
+    progress = progress or (lambda stage, data: None)
+    company_data = scrape_company_data(source, progress=progress)
+
+    if not company_data or not company_data.get('name'):
+        raise ScrapeError((company_data or {}).get('error') or 'No company information found')
+
+    logger.info("Successfully scraped data for %s", company_data.get('name'))
+
+    # Generate a summary if we have a description
+    if company_data.get('description'):
+        try:
+            company_data['summary'] = summarize_company(company_data['description'])
+            logger.info("Generated summary for %s", company_data.get('name'))
+        except Exception as e:
+            logger.error("Error generating summary: %s", e)
+            company_data['summary'] = "Summary generation failed."
+        progress('summary_ready', {'summary': company_data['summary']})
+
+    # Detect social media profiles
+    try:
+        if not company_data.get('social_media') or not any(company_data.get('social_media', {}).values()):
+            social_media_data = detect_social_media(company_data.get('name', ''))
+            company_data['social_media'] = social_media_data
+            logger.info("Detected social media for %s", company_data.get('name'))
+    except Exception as e:
+        logger.error("Error detecting social media: %s", e)
+        company_data['social_media'] = {
+            'linkedin': None,
+            'twitter': None,
+            'instagram': None,
+            'facebook': None
+        }
+    progress('socials_found', company_data['social_media'])
+
+    return company_data
+
+def run_job(job):
+    job.status = 'running'
+    job.emit('started', {'source': job.source})
+    with bind_log_context(scrape_id=job.id):
+        try:
+            with trace('scrape', source=job.source) as scrape_trace:
+                job.trace = scrape_trace
+                company_data = run_scrape_pipeline(job.source, job.emit)
+        except ScrapeError as e:
+            job.finish(error=f'Failed to scrape company data: {e}')
+        except Exception as e:
+            logger.error("Error during scraping: %s", e)
+            logger.debug("Scraping error details", exc_info=True)
+            job.finish(error=f'Error during scraping process: {e}')
+        else:
+            job.finish(result=company_data)
+
+def prune_jobs():
+    """Forget finished jobs past their TTL, and the oldest ones over MAX_SCRAPE_JOBS"""
+    cutoff = datetime.utcnow().timestamp() - SCRAPE_JOB_TTL
+    with jobs_lock:
+        for registry in (jobs, batches):
+            for job_id, job in list(registry.items()):
+                expired = job.finished and job.finished_at.timestamp() < cutoff
+                if expired or (len(registry) > MAX_SCRAPE_JOBS and job.finished):
+                    del registry[job_id]
+
+def start_scrape_job(source):
+    """
+    Queue a scrape in the background.
+
+    Returns:
+        ScrapeJob: The queued job
+    """
+    prune_jobs()
+    job = ScrapeJob(source)
+    with jobs_lock:
+        jobs[job.id] = job
+    executor.submit(run_job, job)
+    return job
+
+def get_scrape_job(job_id):
+    """The job with this id, or None if it's unknown or expired"""
+    with jobs_lock:
+        return jobs.get(job_id)
+
+def format_sse(event):
+    """Encode a job event as a Server-Sent Event"""
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+def stream_job_events(job, last_event_id=0):
+    """
+    Yield a job's events as Server-Sent Events until it finishes.
+
+    Events after last_event_id are replayed first, so a reconnecting
+    EventSource (which sends Last-Event-ID) picks up where it left off.
+    """
+    yield 'retry: 3000\n\n'
+    while True:
+        events = job.wait_for_events(last_event_id, SSE_KEEPALIVE_SECONDS)
+        if not events:
+            if job.finished:
+                return
+            yield ': keepalive\n\n'
+            continue
+        for event in events:
+            yield format_sse(event)
+            last_event_id = event['id']
+        if events[-1]['event'] in TERMINAL_EVENTS:
+            return
+
+def normalize_scrape_sources(sources):
+    """
+    Clean up a list of URLs, domains and company names and drop duplicates.
+
+    URLs and bare domains become https URLs and are deduplicated by domain
+    (so http://www.acme.io/about and acme.io are one scrape); company names
+    are deduplicated case-insensitively.
+
+    Returns:
+        tuple: (unique sources, number of duplicates, invalid entries)
+    """
+    unique = OrderedDict()
+    duplicates = 0
+    invalid = []
+
+    for source in sources:
+        if not isinstance(source, str):
+            invalid.append(source)
+            continue
+        source = ' '.join(source.split())
+        if not source:
+            continue
+        if len(source) > 2048:
+            invalid.append(source[:100])
+            continue
+
+        looks_like_url = '://' in source or ('.' in source and ' ' not in source)
+        if looks_like_url:
+            domain = normalize_domain(source)
+            if not domain or '.' not in domain:
+                invalid.append(source)
+                continue
+            key = domain
+            if '://' not in source:
+                source = f'https://{source}'
+        else:
+            key = source.lower()
+
+        if key in unique:
+            duplicates += 1
+        else:
+            unique[key] = source
+
+    return list(unique.values()), duplicates, invalid
+
+def scrape_batch_item(batch, source):
+    """Scrape one source of a batch, capturing any failure in the result"""
+    if batch.cancelled:
+        return {'source': source, 'status': 'cancelled'}
+    scrape_trace = None
+    with bind_log_context(batch_id=batch.id):
+        try:
+            with trace('scrape', source=source, batch_id=batch.id) as scrape_trace:
+                result = {'source': source, 'status': 'done', 'company_data': run_scrape_pipeline(source)}
+        except ScrapeError as e:
+            result = {'source': source, 'status': 'failed', 'error': f'Failed to scrape company data: {e}'}
+        except Exception as e:
+            logger.error("Error scraping %s in batch %s: %s", source, batch.id, e)
+            logger.debug("Scraping error details", exc_info=True)
+            result = {'source': source, 'status': 'failed', 'error': f'Error during scraping process: {e}'}
+    if batch.timings and scrape_trace:
+        result['timings'] = scrape_trace.timings()
+    return result
+
+def run_bounded(fn, items, concurrency):
+    """
+    Run fn over items on the shared batch executor, submitting at most
+    concurrency of them at a time.
+
+    Yields:
+        tuple: (index of the item, fn's result), as each call finishes
+    """
+    futures = {}
+    for index, item in enumerate(items):
+        if len(futures) >= concurrency:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield futures.pop(future), future.result()
+        futures[batch_executor.submit(fn, item)] = index
+    for future in as_completed(futures):
+        yield futures[future], future.result()
+
+def run_batch(batch):
+    batch.status = 'running'
+    for _, result in run_bounded(lambda source: scrape_batch_item(batch, source), batch.sources, batch.concurrency):
+        batch.add_result(result)
+    batch.finish()
+    logger.info("Batch scrape %s finished: %s succeeded, %s failed", batch.id, batch.succeeded, batch.failed)
+
+def scrape_company_item(source):
+    """Scrape one source without summary or social media lookups, capturing any failure in the result"""
+    try:
+        with trace('scrape_company', source=source):
+            company_data = scrape_company_data(source)
+        if not company_data or not company_data.get('name'):
+            error = (company_data or {}).get('error') or 'No company information found'
+            return {'source': source, 'status': 'failed', 'error': f'Failed to scrape company data: {error}'}
+        return {'source': source, 'status': 'done', 'company_data': company_data}
+    except Exception as e:
+        logger.error("Error scraping %s: %s", source, e)
+        logger.debug("Scraping error details", exc_info=True)
+        return {'source': source, 'status': 'failed', 'error': f'Error during scraping process: {e}'}
+
+def scrape_companies(sources, concurrency=DEFAULT_BATCH_CONCURRENCY):
+    """
+    Scrape sources concurrently and wait for all of them.
+
+    Returns:
+        list: Results in the order of sources, shaped like batch results
+    """
+    results = [None] * len(sources)
+    for index, result in run_bounded(scrape_company_item, sources, max(1, concurrency)):
+        results[index] = result
+    return results
+
+def start_batch_scrape(sources, concurrency=DEFAULT_BATCH_CONCURRENCY, timings=False):
+    """
+    Start scraping a list of sources in the background.
+
+    Args:
+        sources (list): Normalized sources (see normalize_scrape_sources)
+        concurrency (int): Scrapes running at once
+        timings (bool): Add each scrape's span timeline to its result
+
+    Returns:
+        BatchScrapeJob: The started batch
+    """
+    prune_jobs()
+    batch = BatchScrapeJob(sources, concurrency, timings)
+    with jobs_lock:
+        batches[batch.id] = batch
+    threading.Thread(target=run_batch, args=(batch,), name=f'batch-{batch.id[:8]}', daemon=True).start()
+    return batch
+
+def get_batch_scrape(batch_id):
+    """The batch with this id, or None if it's unknown or expired"""
+    with jobs_lock:
+        return batches.get(batch_id)
+
+def stream_batch_results(batch, offset=0, follow=True):
+    """
+    Yield a batch's results as NDJSON lines, starting at offset.
+
+    With follow, keeps waiting for new results until the batch finishes;
+    otherwise stops after the results available now.
+    """
+    while True:
+        results = batch.wait_for_results(offset, SSE_KEEPALIVE_SECONDS) if follow else batch.results[offset:]
+        for result in results:
+            yield json.dumps(result) + '\n'
+        offset += len(results)
+        if not follow or (batch.finished and offset >= len(batch.results)):
+            return
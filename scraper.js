@@ -46,38 +46,23 @@ function handleScrapeFormSubmit(e) {
         return;
     }
     
-    // Show loading state
+    // Show progress while the scrape runs in the background
     const resultsContainer = document.getElementById('scrape-results');
     resultsContainer.classList.remove('d-none');
-    resultsContainer.innerHTML = `
-        <div class="text-center py-5">
-            <div class="spinner-border text-primary" role="status">
-                <span class="visually-hidden">Loading...</span>
-            </div>
-            <p class="mt-3">Scraping data... This may take a moment.</p>
-        </div>
-    `;
+    resultsContainer.innerHTML = renderScrapeProgress([]);
+    const steps = [];
     
-    // Call the scraping API
-    fetch('/api/scrape', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({ source_url: source })
+    runScrapeJob({ source_url: source }, (stage, data) => {
+        steps.push({ stage, data });
+        resultsContainer.innerHTML = renderScrapeProgress(steps);
     })
-    .then(response => response.json())
-    .then(data => {
-        if (data.success) {
-            scrapedCompanyData = data.company_data;
-            displayScrapedResults(data.company_data);
-        } else {
-            showScrapingError(data.message || 'Failed to scrape data');
-        }
+    .then(companyData => {
+        scrapedCompanyData = companyData;
+        displayScrapedResults(companyData);
     })
     .catch(error => {
         console.error('Error:', error);
-        showScrapingError('An error occurred while scraping the data');
+        showScrapingError(error.message || 'An error occurred while scraping the data');
     });
 }
 
@@ -106,49 +91,188 @@ function handleModalScrapeSubmit() {
         </div>
     `;
     
-    // Call the scraping API
-    fetch('/api/scrape', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({ 
-            source_url: source,
-            max_leads: leadCount,
-            industry_filter: industryFilter
-        })
+    const steps = [];
+    runScrapeJob({
+        source_url: source,
+        max_leads: leadCount,
+        industry_filter: industryFilter
+    }, (stage, data) => {
+        steps.push({ stage, data });
+        modalBody.innerHTML = renderScrapeProgress(steps);
     })
-    .then(response => response.json())
-    .then(data => {
-        if (data.success) {
-            // Hide modal and redirect to dashboard with success message
-            const bsModal = bootstrap.Modal.getInstance(document.getElementById('scrapeModal'));
-            bsModal.hide();
-            
-            // Show success notification
-            showAlert('Successfully scraped company data!', 'success');
-            
-            // Add the lead to the database
-            addLeadFromScrapedData(data.company_data);
-            
-            // Reload dashboard data if we're on the dashboard page
-            if (typeof loadDashboardData === 'function') {
-                loadDashboardData();
-            }
-        } else {
-            // Restore original form and show error
-            modalBody.innerHTML = originalContent;
-            showAlert(data.message || 'Failed to scrape data', 'danger');
+    .then(companyData => {
+        // Hide modal and redirect to dashboard with success message
+        const bsModal = bootstrap.Modal.getInstance(document.getElementById('scrapeModal'));
+        bsModal.hide();
+        modalBody.innerHTML = originalContent;
+        
+        // Show success notification
+        showAlert(companyData.already_stored
+            ? `Adding a lead to ${companyData.name}, already in the database`
+            : 'Successfully scraped company data!', 'success');
+        
+        // Add the lead to the database
+        addLeadFromScrapedData(companyData);
+        
+        // Reload dashboard data if we're on the dashboard page
+        if (typeof loadDashboardData === 'function') {
+            loadDashboardData();
         }
     })
     .catch(error => {
         console.error('Error:', error);
         // Restore original form and show error
         modalBody.innerHTML = originalContent;
-        showAlert('An error occurred while scraping the data', 'danger');
+        showAlert(error.message || 'An error occurred while scraping the data', 'danger');
+    });
+}
+
+// Progress stages reported by a scrape job, in order
+const SCRAPE_STAGE_LABELS = {
+    started: 'Scraping started',
+    website_found: 'Website found',
+    text_extracted: 'Website text extracted',
+    company_info: 'Company details extracted',
+    summary_ready: 'AI summary ready',
+    socials_found: 'Social media profiles found'
+};
+
+/**
+ * Add a lead. If its company only looks similar to stored ones, asks
+ * whether it is the closest of them; otherwise a new company is stored.
+ * @param {Object} leadData - Request body for POST /api/leads
+ * @returns {Promise<Object>} Resolves with the response data
+ */
+function postLead(leadData) {
+    return fetch('/api/leads', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify(leadData)
+    })
+    .then(response => response.json().then(data => ({ status: response.status, data })))
+    .then(({ status, data }) => {
+        if (status === 409 && data.similar_companies && data.similar_companies.length) {
+            const match = data.similar_companies[0];
+            const sameCompany = window.confirm(
+                `${leadData.company_name} looks like ${match.name}, which is already in the database.\n\n` +
+                `OK: add the lead to ${match.name}\nCancel: save ${leadData.company_name} as a new company`
+            );
+            return postLead(sameCompany ? { ...leadData, company_id: match.id } : { ...leadData, force: true });
+        }
+        return data;
     });
 }
 
+/**
+ * Start a background scrape job and follow its progress events.
+ * If the company is already stored, asks whether to scrape it again;
+ * otherwise the stored details are used (e.g. to add another contact).
+ * @param {Object} payload - Request body for POST /api/scrape
+ * @param {Function} onProgress - Called with (stage, data) for each progress event
+ * @returns {Promise<Object>} Resolves with the scraped company data, or the
+ *     stored company's data with already_stored set
+ */
+function runScrapeJob(payload, onProgress) {
+    return fetch('/api/scrape', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify(payload)
+    })
+    .then(response => response.json().then(data => ({ status: response.status, data })))
+    .then(({ status, data }) => {
+        if (status === 409 && data.company) {
+            const scrapeAgain = window.confirm(
+                `${data.company.name} is already in the database.\n\n` +
+                'OK: scrape it again\nCancel: use the saved company details'
+            );
+            if (scrapeAgain) {
+                return runScrapeJob({ ...payload, force: true }, onProgress);
+            }
+            return { ...data.company, already_stored: true };
+        }
+        if (!data.success) {
+            throw new Error(data.message || 'Failed to start scraping');
+        }
+        
+        return new Promise((resolve, reject) => {
+            const events = new EventSource(data.events_url);
+            
+            Object.keys(SCRAPE_STAGE_LABELS).forEach(stage => {
+                events.addEventListener(stage, e => onProgress(stage, JSON.parse(e.data)));
+            });
+            events.addEventListener('done', e => {
+                events.close();
+                resolve(JSON.parse(e.data));
+            });
+            events.addEventListener('failed', e => {
+                events.close();
+                reject(new Error(JSON.parse(e.data).message));
+            });
+            // Connection problems; EventSource reconnects by itself
+            // (resuming from the last event) unless the job is gone
+            events.onerror = () => {
+                if (events.readyState === EventSource.CLOSED) {
+                    reject(new Error('Lost connection to the scraping job'));
+                }
+            };
+        });
+    });
+}
+
+/**
+ * Render the progress list for a running scrape
+ * @param {Array} steps - {stage, data} progress events received so far
+ * @returns {string} HTML
+ */
+function renderScrapeProgress(steps) {
+    const done = new Set(steps.map(step => step.stage));
+    const details = {};
+    steps.forEach(({ stage, data }) => {
+        if (stage === 'website_found' && data.url) {
+            details[stage] = escapeHtml(data.url);
+        } else if (stage === 'text_extracted') {
+            details[stage] = `${data.characters} characters`;
+        } else if (stage === 'company_info' && data.name) {
+            details[stage] = escapeHtml([data.name, data.industry].filter(Boolean).join(' · '));
+        }
+    });
+    
+    const items = Object.entries(SCRAPE_STAGE_LABELS).map(([stage, label]) => {
+        const icon = done.has(stage)
+            ? '<i class="fas fa-check-circle text-success me-2"></i>'
+            : '<i class="far fa-circle text-muted me-2"></i>';
+        const detail = details[stage] ? ` <small class="text-muted">${details[stage]}</small>` : '';
+        return `<li class="list-group-item">${icon}${label}${detail}</li>`;
+    }).join('');
+    
+    return `
+        <div class="py-4">
+            <div class="d-flex align-items-center mb-3">
+                <div class="spinner-border spinner-border-sm text-primary me-2" role="status">
+                    <span class="visually-hidden">Loading...</span>
+                </div>
+                <span>Scraping data...</span>
+            </div>
+            <ul class="list-group">${items}</ul>
+        </div>
+    `;
+}
+
+/**
+ * Escape text for safe insertion into HTML
+ * @param {string} text - Text to escape
+ * @returns {string} Escaped text
+ */
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text;
+    return div.innerHTML;
+}
+
 /**
  * Handle manual lead form submission from the modal
  */
@@ -187,14 +311,7 @@ function handleManualLeadSubmit(e) {
     submitBtn.innerHTML = '<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span> Adding...';
     
     // Add the lead to the database
-    fetch('/api/leads', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json',
-        },
-        body: JSON.stringify(leadData)
-    })
-    .then(response => response.json())
+    postLead(leadData)
     .then(data => {
         if (data.success) {
             // Close modal and show success message
@@ -239,7 +356,8 @@ function handleAddLeadSubmit() {
         name: leadName,
         email: leadEmail,
         company_name: companyData.name,
-        company_data: companyData
+        company_data: companyData,
+        company_id: companyData.already_stored ? companyData.id : undefined
     };
     
     // Show loading state
@@ -249,14 +367,7 @@ function handleAddLeadSubmit() {
     submitBtn.innerHTML = '<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span> Adding...';
     
     // Add the lead to the database
-    fetch('/api/leads', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json',
-        },
-        body: JSON.stringify(leadData)
-    })
-    .then(response => response.json())
+    postLead(leadData)
     .then(data => {
         if (data.success) {
             // Close modal and show success message
@@ -293,18 +404,12 @@ function addLeadFromScrapedData(companyData) {
         name: companyData.owner_name || 'Contact ' + companyData.name,
         email: companyData.owner_email || `info@${companyData.domain || 'example.com'}`,
         company_name: companyData.name,
-        company_data: companyData
+        company_data: companyData,
+        company_id: companyData.already_stored ? companyData.id : undefined
     };
     
     // Add the lead to the database
-    fetch('/api/leads', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json',
-        },
-        body: JSON.stringify(leadData)
-    })
-    .then(response => response.json())
+    postLead(leadData)
     .then(data => {
         if (data.success) {
             showAlert('Lead added successfully!', 'success');
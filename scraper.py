@@ -7,10 +7,10 @@ import re
 import json
 from urllib.parse import urljoin, urlparse
 import concurrent.futures
-import traceback
 
-# Configure detailed logging
-logging.basicConfig(level=logging.DEBUG,   format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+from metrics import EXTRACTION_SECONDS, EXTRACTIONS, SCRAPE_STAGE_SECONDS, record_fetch, timed
+from tracing import set_span_attributes, set_span_error, span
+
 logger = logging.getLogger(__name__)
 
 # Import trafilatura with detailed error handling
@@ -18,31 +18,122 @@ try:
     import trafilatura
     logger.info("Successfully imported trafilatura")
 except ImportError as e:
-    logger.error(f"Failed to import trafilatura: {e}")
-    # Create a fallback implementation
-    def extract_text_with_bs4(html_content):
-        """Fallback text extraction using BeautifulSoup"""
+    logger.error("Failed to import trafilatura: %s", e)
+
+# Shared HTTP session, so repeated requests to a host reuse its connection
+http_session = requests.Session()
+http_session.headers['User-Agent'] = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+def http_get(url, **kwargs):
+    """
+    GET a URL with the shared session, recording the download time
+    (including the body) and outcome in the per-host fetch metrics
+    
+    Args:
+        url (str): URL to download
+        **kwargs: Passed to requests
+    
+    Returns:
+        requests.Response: The response
+    """
+    with span('fetch', url=url):
+        started = time.perf_counter()
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.extract()
-            # Get text
-            text = soup.get_text()
-            # Break into lines and remove leading and trailing space
-            lines = (line.strip() for line in text.splitlines())
-            # Break multi-headlines into a line each
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            # Drop blank lines
-            text = '\n'.join(chunk for chunk in chunks if chunk)
-            return text
+            response = http_session.get(url, **kwargs)
+            response.content  # read the body before stopping the clock
+        except Exception:
+            record_fetch(url, time.perf_counter() - started)
+            raise
+        record_fetch(url, time.perf_counter() - started, response.status_code)
+        set_span_attributes(status_code=response.status_code)
+        return response
+
+def run_extraction(method, extract, html_content):
+    """
+    Run a text extractor, recording its time and outcome by method
+    
+    Args:
+        method (str): 'trafilatura' or 'bs4'
+        extract (callable): Takes the HTML and returns the text
+        html_content (str): Page HTML
+    
+    Returns:
+        str: The extracted text
+    """
+    started = time.perf_counter()
+    outcome = 'error'
+    try:
+        with span('extract', method=method):
+            text = extract(html_content)
+            set_span_attributes(characters=len(text or ''))
+        outcome = 'text' if text else 'empty'
+        return text
+    finally:
+        EXTRACTION_SECONDS.observe(time.perf_counter() - started, method=method)
+        EXTRACTIONS.inc(method=method, outcome=outcome)
+
+def trafilatura_text(html_content):
+    return trafilatura.extract(html_content, include_comments=False, include_tables=False, no_fallback=False)
+
+def bs4_text(html_content):
+    soup = BeautifulSoup(html_content, 'html.parser')
+    for script in soup(["script", "style"]):
+        script.extract()
+    lines = (line.strip() for line in soup.get_text().splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return '\n'.join(chunk for chunk in chunks if chunk)
+
+def fetch_page(url, etag=None, last_modified=None, timeout=10):
+    """
+    Download a page, conditionally if validators from an earlier download
+    are given (the server answers 304 Not Modified if it hasn't changed)
+    
+    Args:
+        url (str): Page URL
+        etag (str): ETag header of the earlier response
+        last_modified (str): Last-Modified header of the earlier response
+        timeout (int): Request timeout in seconds
+    
+    Returns:
+        requests.Response: The response
+    """
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    return http_get(url, headers=headers, timeout=timeout)
+
+def extract_page_text(html_content):
+    """
+    Extract the main text of an HTML page with trafilatura, falling back
+    to BeautifulSoup
+    
+    Args:
+        html_content (str): Page HTML
+    
+    Returns:
+        str: The main content text of the page
+    """
+    if 'trafilatura' in globals():
+        try:
+            text = run_extraction('trafilatura', trafilatura_text, html_content)
+            if text:
+                return text
         except Exception as e:
-            logger.error(f"Error in fallback text extraction: {e}")
-            return ""
+            logger.error("Error using trafilatura to extract text: %s", e)
+    
+    return run_extraction('bs4', bs4_text, html_content)
 
+@span('get_website_text_content')
+@timed(SCRAPE_STAGE_SECONDS, stage='website_text')
 def get_website_text_content(url):
     """
-    Get the main text content from a website using trafilatura with fallbacks
+    Get the main text content from a website: one download through the
+    shared session, then extract_page_text (trafilatura, falling back to
+    BeautifulSoup)
     
     Args:
         url (str): Website URL
@@ -51,81 +142,36 @@ def get_website_text_content(url):
         str: The main content text of the website
     """
     try:
-        logger.info(f"Attempting to scrape text content from {url}")
-        
-        # Check if URL is valid
-        if not url or not url.startswith(('http://', 'https://')):
-            if not url.startswith(('http://', 'https://')):
-                url = 'https://' + url
+        logger.info("Attempting to scrape text content from %s", url)
         
-        # Try to use trafilatura first if available
-        if 'trafilatura' in globals():
-            try:
-                logger.debug(f"Using trafilatura to download {url}")
-                downloaded = trafilatura.fetch_url(url)
-                if downloaded:
-                    logger.debug(f"Successfully downloaded content from {url}, extracting text...")
-                    text = trafilatura.extract(downloaded, include_comments=False, include_tables=False, no_fallback=False)
-                    if text:
-                        logger.info(f"Successfully extracted text from {url} (length: {len(text)})")
-                        return text
-                    else:
-                        logger.warning(f"Trafilatura download succeeded but text extraction failed for {url}")
-                else:
-                    logger.warning(f"Trafilatura failed to download content from {url}")
-            except Exception as e:
-                logger.error(f"Error using trafilatura for {url}: {e}")
-                logger.debug(f"Trafilatura error details: {traceback.format_exc()}")
-        else:
-            logger.warning("Trafilatura not available")
+        if not url.startswith(('http://', 'https://')):
+            url = 'https://' + url
+        set_span_attributes(url=url)
         
-        # Fallback to requests + BeautifulSoup if trafilatura failed
-        logger.info(f"Falling back to requests + BeautifulSoup for {url}")
-        try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
-            response = requests.get(url, headers=headers, timeout=10)
-            
-            if response.status_code == 200:
-                logger.debug(f"Successfully downloaded {url} with requests")
-                
-                # Check content type
-                if 'text/html' in response.headers.get('Content-Type', ''):
-                    # Use our fallback function if trafilatura isn't available or as a backup
-                    if 'extract_text_with_bs4' in globals():
-                        text = extract_text_with_bs4(response.text)
-                    else:
-                        # Create an inline version if the function isn't globally available
-                        soup = BeautifulSoup(response.text, 'html.parser')
-                        for script in soup(["script", "style"]):
-                            script.extract()
-                        text = soup.get_text()
-                        lines = (line.strip() for line in text.splitlines())
-                        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-                        text = '\n'.join(chunk for chunk in chunks if chunk)
-                    
-                    if text:
-                        logger.info(f"Successfully extracted text with BeautifulSoup fallback (length: {len(text)})")
-                        return text
-                    else:
-                        logger.warning("BeautifulSoup fallback produced no text")
-                else:
-                    logger.warning(f"Response was not HTML: {response.headers.get('Content-Type')}")
-            else:
-                logger.warning(f"Failed to download with requests: status code {response.status_code}")
+        response = http_get(url, timeout=10)
+        if response.status_code != 200:
+            logger.warning("Failed to download %s: status code %s", url, response.status_code)
+            set_span_error(f'HTTP {response.status_code}')
+            return ""
+        if 'text/html' not in response.headers.get('Content-Type', ''):
+            logger.warning("Response was not HTML: %s", response.headers.get('Content-Type'))
+            set_span_error('Response was not HTML')
+            return ""
         
-        except Exception as e:
-            logger.error(f"Error in BeautifulSoup fallback: {e}")
-            logger.debug(f"BeautifulSoup fallback error details: {traceback.format_exc()}")
+        text = extract_page_text(response.text)
+        if text:
+            logger.info("Successfully extracted text from %s (length: %s)", url, len(text))
+            return text
         
         # If all methods failed, return empty string
-        logger.error(f"All extraction methods failed for {url}")
+        logger.error("All extraction methods failed for %s", url)
+        set_span_error('All extraction methods failed')
         return ""
     
     except Exception as e:
-        logger.error(f"Unexpected error in get_website_text_content for {url}: {e}")
-        logger.debug(f"Stacktrace: {traceback.format_exc()}")
+        logger.error("Unexpected error in get_website_text_content for %s: %s", url, e)
+        set_span_error(str(e))
+        logger.debug("Stacktrace", exc_info=True)
         return ""
 
 def detect_anti_bot_measures(response):
@@ -150,6 +196,8 @@ def detect_anti_bot_measures(response):
     
     return False
 
+@span('search_company')
+@timed(SCRAPE_STAGE_SECONDS, stage='search')
 def search_company(company_name):
     """
     Search for company information using a search engine
@@ -169,11 +217,11 @@ def search_company(company_name):
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
         
-        response = requests.get(search_url, headers=headers)
+        response = http_get(search_url, headers=headers)
         
         # Check if we're being blocked
         if detect_anti_bot_measures(response):
-            logging.warning("Anti-bot measures detected in search results")
+            logger.warning("Anti-bot measures detected in search results")
             
         # Extract links from search results
         soup = BeautifulSoup(response.text, 'html.parser')
@@ -190,7 +238,8 @@ def search_company(company_name):
         
         return result_links[:3]  # Return top 3 results
     except Exception as e:
-        logging.error(f"Error searching for company: {e}")
+        logger.error("Error searching for company: %s", e)
+        set_span_error(str(e))
         return []
 
 def extract_domain_from_url(url):
@@ -303,7 +352,7 @@ def extract_owner_info(text, company_name):
     company_name_lower = company_name.lower()
     for known_company, info in well_known_companies.items():
         if known_company in company_name_lower:
-            logging.info(f"Found well-known company match for owner info: {known_company}")
+            logger.info("Found well-known company match for owner info: %s", known_company)
             return info
     
     # For financial companies like capital groups, provide a default fallback
@@ -458,6 +507,8 @@ def infer_company_size(text):
     else:
         return 'SMB'
 
+@span('infer_company_info_from_text')
+@timed(SCRAPE_STAGE_SECONDS, stage='regex_extraction')
 def infer_company_info_from_text(text, company_name):
     """
     Extract comprehensive company information from scraped text
@@ -571,7 +622,7 @@ def infer_company_info_from_text(text, company_name):
             owner_info = extract_owner_info(text, company_name)
             # Combine well-known company info with owner info
             full_info = {**info, **owner_info}
-            logging.info(f"Using well-known company information for {known_company}")
+            logger.info("Using well-known company information for %s", known_company)
             return full_info
     
     # Initialize with default values for non-well-known companies
@@ -686,17 +737,22 @@ def infer_company_info_from_text(text, company_name):
     # Return comprehensive company information
     return info
 
-def scrape_company_data(source):
+@span('scrape_company_data')
+def scrape_company_data(source, progress=None):
     """
     Scrape company data from a website or search for company by name
     
     Args:
         source (str): Website URL or company name
+        progress (callable): Optional progress(stage, data) callback, called
+            as the website is found, its text extracted and company info
+            inferred
     
     Returns:
         dict: Company information
     """
-    logging.info(f"Starting company data scraping for: {source}")
+    progress = progress or (lambda stage, data: None)
+    logger.info("Starting company data scraping for: %s", source)
     
     # Check if source is a URL or company name
     if source.startswith(('http://', 'https://')):
@@ -710,24 +766,28 @@ def scrape_company_data(source):
         if search_results:
             url = search_results[0]
         else:
-            logging.error(f"No search results found for company: {company_name}")
+            logger.error("No search results found for company: %s", company_name)
+            set_span_error('No company website found')
             return {
                 'company_name': company_name,
                 'error': 'No company website found'
             }
     
-    logging.info(f"Using URL: {url} for company: {company_name}")
+    logger.info("Using URL: %s for company: %s", url, company_name)
+    progress('website_found', {'url': url, 'company_name': company_name})
     
     # Get website content
     text_content = get_website_text_content(url)
     
     if not text_content:
-        logging.error(f"No text content extracted from {url}")
+        logger.error("No text content extracted from %s", url)
+        set_span_error('Failed to extract content')
         return {
             'company_name': company_name,
             'url': url,
             'error': 'Failed to extract content'
         }
+    progress('text_extracted', {'characters': len(text_content)})
     
     # Extract company information from text
     company_info = infer_company_info_from_text(text_content, company_name)
@@ -743,5 +803,6 @@ def scrape_company_data(source):
         short_content = ' '.join(text_content.split()[:50])
         company_info['description'] = f"{company_name} is a company that {short_content}..."
     
-    logging.info(f"Successfully scraped data for {company_name}")
+    progress('company_info', company_info)
+    logger.info("Successfully scraped data for %s", company_name)
     return company_info
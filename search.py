@@ -0,0 +1,326 @@
+import html
+import logging
+import re
+from sqlalchemy import or_, text
+from sqlalchemy.exc import OperationalError
+
+from app import db
+from models import Lead, Company
+from lead_queries import LIST_FIELDSET, lead_load_options, serialize_lead
+
+logger = logging.getLogger(__name__)
+
+# Which full-text implementation init_search() set up: 'fts5' (SQLite),
+# 'postgres' (tsvector + GIN) or 'like' (unindexed fallback)
+SEARCH_BACKEND = 'like'
+
+# Searchable text columns per table, most important first
+COMPANY_SEARCH_COLUMNS = ('name', 'summary', 'target_audience', 'description')
+LEAD_SEARCH_COLUMNS = ('name', 'position', 'ai_analysis')
+
+# bm25 / setweight importance of each column above
+COMPANY_COLUMN_WEIGHTS = (10.0, 4.0, 3.0, 1.0)
+LEAD_COLUMN_WEIGHTS = (10.0, 3.0, 1.0)
+POSTGRES_WEIGHT_LABELS = ('A', 'B', 'C', 'D')
+
+# Snippet highlight markers, swapped for <mark> after HTML-escaping the text
+MARK_START, MARK_END = '\x02', '\x03'
+SNIPPET_WORDS = 16
+
+SEARCH_TYPES = ('all', 'company', 'lead')
+MAX_SEARCH_OFFSET = 1000
+
+# Matches ranked per table. Scoring every match of a very common word is
+# what makes full-text search slow on large tables, so beyond this only the
+# most recently added matches are ranked.
+SEARCH_CANDIDATE_LIMIT = 10000
+
+def fts5_statements(table, columns):
+    """DDL for an external-content FTS5 table over a table, with sync triggers"""
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    fts = f'{table}_fts'
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{column_list}, content='{table}', content_rowid='id', tokenize='porter unicode61')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); END",
+        # Only the indexed columns, so timestamp-only updates don't reindex
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {column_list} ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END",
+    ]
+
+def postgres_document(columns):
+    """Weighted tsvector expression over a table's search columns"""
+    return ' || '.join(
+        f"setweight(to_tsvector('english', coalesce({column}, '')), '{label}')"
+        for column, label in zip(columns, POSTGRES_WEIGHT_LABELS)
+    )
+
+def init_search():
+    """
+    Create the full-text search structures for the database in use, if
+    missing. Called at startup after db.create_all().
+    """
+    global SEARCH_BACKEND
+    dialect = db.engine.dialect.name
+
+    if dialect == 'postgresql':
+        with db.engine.begin() as connection:
+            for table, columns in (('company', COMPANY_SEARCH_COLUMNS), ('lead', LEAD_SEARCH_COLUMNS)):
+                connection.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS ix_{table}_search ON {table} "
+                    f"USING GIN (({postgres_document(columns)}))"
+                ))
+        SEARCH_BACKEND = 'postgres'
+        return
+
+    if dialect == 'sqlite':
+        try:
+            with db.engine.begin() as connection:
+                existing = {row[0] for row in connection.execute(text(
+                    "SELECT name FROM sqlite_master WHERE name IN ('company_fts', 'lead_fts')"
+                ))}
+                for table, columns in (('company', COMPANY_SEARCH_COLUMNS), ('lead', LEAD_SEARCH_COLUMNS)):
+                    for statement in fts5_statements(table, columns):
+                        connection.execute(text(statement))
+                    # Index rows that existed before the FTS table
+                    if f'{table}_fts' not in existing:
+                        connection.execute(text(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')"))
+            SEARCH_BACKEND = 'fts5'
+            return
+        except OperationalError as e:
+            logger.warning("SQLite FTS5 unavailable, search will not be indexed: %s", e)
+
+    SEARCH_BACKEND = 'like'
+
+def fts5_query(query):
+    """
+    Turn free text into a safe FTS5 query where every word must match.
+    Words are quoted, so FTS5 operators in the input are matched literally;
+    the porter tokenizer makes 'robot' also match 'robotics'.
+    """
+    words = re.findall(r'\w+', query)
+    if not words:
+        return None
+    return ' '.join(f'"{word}"' for word in words)
+
+def search_page_fts5(query, types, limit, offset):
+    """Ranked (kind, id, rank) rows for one page, plus per-kind snippets"""
+    match = fts5_query(query)
+    if not match:
+        return [], {}
+
+    parts = []
+    params = {'match': match, 'limit': limit, 'offset': offset}
+    for kind, weights in (('company', COMPANY_COLUMN_WEIGHTS), ('lead', LEAD_COLUMN_WEIGHTS)):
+        if kind not in types:
+            continue
+        part = (
+            f"SELECT '{kind}' AS kind, rowid AS id, "
+            f"bm25({kind}_fts, {', '.join(map(str, weights))}) AS rank "
+            f"FROM {kind}_fts WHERE {kind}_fts MATCH :match"
+        )
+        # FTS5 walks matches in rowid order, so finding the cutoff is cheap
+        # and the rowid range keeps bm25 to SEARCH_CANDIDATE_LIMIT rows
+        cutoff = db.session.execute(
+            text(f"SELECT rowid FROM {kind}_fts WHERE {kind}_fts MATCH :match "
+                 "ORDER BY rowid DESC LIMIT 1 OFFSET :candidates"),
+            {'match': match, 'candidates': SEARCH_CANDIDATE_LIMIT}
+        ).scalar()
+        if cutoff is not None:
+            part += f" AND rowid > :{kind}_cutoff"
+            params[f'{kind}_cutoff'] = cutoff
+        parts.append(part)
+
+    # bm25 is lower for better matches
+    rows = db.session.execute(
+        text(' UNION ALL '.join(parts) + ' ORDER BY rank, kind, id LIMIT :limit OFFSET :offset'),
+        params
+    ).all()
+    page = [(kind, row_id, -rank) for kind, row_id, rank in rows]
+
+    # Snippets only for the rows on this page
+    snippets = {}
+    for kind in ('company', 'lead'):
+        ids = [row_id for row_kind, row_id, _ in page if row_kind == kind]
+        if not ids:
+            continue
+        id_params = {f'id{index}': row_id for index, row_id in enumerate(ids)}
+        snippet_rows = db.session.execute(
+            text(
+                f"SELECT rowid, snippet({kind}_fts, -1, :start, :end, '…', {SNIPPET_WORDS}) "
+                f"FROM {kind}_fts WHERE {kind}_fts MATCH :match "
+                f"AND rowid IN ({', '.join(':' + name for name in id_params)})"
+            ),
+            {'match': match, 'start': MARK_START, 'end': MARK_END, **id_params}
+        )
+        snippets.update({(kind, row_id): snippet for row_id, snippet in snippet_rows})
+
+    return page, snippets
+
+def search_page_postgres(query, types, limit, offset):
+    """Ranked (kind, id, rank) rows for one page, plus per-kind snippets"""
+    parts = []
+    for kind, columns in (('company', COMPANY_SEARCH_COLUMNS), ('lead', LEAD_SEARCH_COLUMNS)):
+        if kind not in types:
+            continue
+        # The GIN index finds the matches; only the newest
+        # SEARCH_CANDIDATE_LIMIT of them are ranked
+        document = postgres_document(columns)
+        parts.append(
+            f"(SELECT '{kind}' AS kind, id, ts_rank(document, websearch_to_tsquery('english', :query)) AS rank "
+            f"FROM (SELECT id, ({document}) AS document FROM {kind} "
+            f"WHERE ({document}) @@ websearch_to_tsquery('english', :query) "
+            f"ORDER BY id DESC LIMIT :candidates) AS {kind}_matches)"
+        )
+    rows = db.session.execute(
+        text(' UNION ALL '.join(parts) + ' ORDER BY rank DESC, kind, id LIMIT :limit OFFSET :offset'),
+        {'query': query, 'candidates': SEARCH_CANDIDATE_LIMIT, 'limit': limit, 'offset': offset}
+    ).all()
+    page = [(kind, row_id, rank) for kind, row_id, rank in rows]
+
+    snippets = {}
+    options = f'StartSel={MARK_START}, StopSel={MARK_END}, MaxWords={SNIPPET_WORDS}, MinWords=5'
+    for kind, columns in (('company', COMPANY_SEARCH_COLUMNS), ('lead', LEAD_SEARCH_COLUMNS)):
+        ids = [row_id for row_kind, row_id, _ in page if row_kind == kind]
+        if not ids:
+            continue
+        document = " || ' ' || ".join(f"coalesce({column}, '')" for column in columns)
+        snippet_rows = db.session.execute(
+            text(
+                f"SELECT id, ts_headline('english', {document}, websearch_to_tsquery('english', :query), :options) "
+                f"FROM {kind} WHERE id = ANY(:ids)"
+            ),
+            {'query': query, 'options': options, 'ids': ids}
+        )
+        snippets.update({(kind, row_id): snippet for row_id, snippet in snippet_rows})
+
+    return page, snippets
+
+def like_snippet(values, words):
+    """Snippet around the first matching word, for the unindexed fallback"""
+    for value in values:
+        if not value:
+            continue
+        lowered = value.lower()
+        for word in words:
+            position = lowered.find(word.lower())
+            if position >= 0:
+                start = max(0, position - 60)
+                end = position + len(word)
+                snippet = value[start:position] + MARK_START + value[position:end] + MARK_END + value[end:end + 60]
+                return ('…' if start else '') + snippet + ('…' if end + 60 < len(value) else '')
+    return None
+
+def search_page_like(query, types, limit, offset):
+    """Unranked LIKE search for databases without full-text support"""
+    words = re.findall(r'\w+', query)
+    if not words:
+        return [], {}
+
+    def matching(model, columns):
+        conditions = [
+            or_(*[getattr(model, column).icontains(word, autoescape=True) for column in columns])
+            for word in words
+        ]
+        return model.query.filter(*conditions).order_by(model.id)
+
+    rows = []
+    if 'company' in types:
+        rows += [('company', company) for company in matching(Company, COMPANY_SEARCH_COLUMNS).limit(offset + limit)]
+    if 'lead' in types:
+        rows += [('lead', lead) for lead in matching(Lead, LEAD_SEARCH_COLUMNS).limit(offset + limit)]
+    rows = rows[offset:offset + limit]
+
+    page = [(kind, item.id, 0.0) for kind, item in rows]
+    columns = {'company': COMPANY_SEARCH_COLUMNS, 'lead': LEAD_SEARCH_COLUMNS}
+    snippets = {
+        (kind, item.id): like_snippet([getattr(item, column) for column in columns[kind]], words)
+        for kind, item in rows
+    }
+    return page, snippets
+
+def render_snippet(snippet):
+    """HTML-escape a snippet and turn the match markers into <mark> tags"""
+    if not snippet:
+        return None
+    return html.escape(snippet).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+def search(query, search_type='all', limit=20, offset=0):
+    """
+    Full-text search over companies (name, summary, target audience,
+    description) and leads (name, position, AI analysis).
+
+    Args:
+        query (str): Free text; every word must match
+        search_type (str): all, company or lead
+        limit (int): Results per page
+        offset (int): Results to skip
+
+    Returns:
+        dict: Ranked results with HTML snippets, and the next page's offset
+
+    Raises:
+        ValueError: For an unknown search type or offset
+    """
+    if search_type not in SEARCH_TYPES:
+        raise ValueError(f"'type' must be one of: {', '.join(SEARCH_TYPES)}")
+    if offset < 0 or offset > MAX_SEARCH_OFFSET:
+        raise ValueError(f"'offset' must be between 0 and {MAX_SEARCH_OFFSET}")
+    types = ('company', 'lead') if search_type == 'all' else (search_type,)
+
+    search_page = {
+        'fts5': search_page_fts5,
+        'postgres': search_page_postgres,
+    }.get(SEARCH_BACKEND, search_page_like)
+
+    # Fetch one extra row to know whether there's a next page
+    page, snippets = search_page(query, types, limit + 1, offset)
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    company_ids = [row_id for kind, row_id, _ in page if kind == 'company']
+    lead_ids = [row_id for kind, row_id, _ in page if kind == 'lead']
+    companies = {company.id: company for company in Company.query.filter(Company.id.in_(company_ids))} \
+        if company_ids else {}
+    leads = {}
+    if lead_ids:
+        leads = {
+            lead.id: lead for lead in
+            Lead.query.join(Lead.company)
+            .options(*lead_load_options(LIST_FIELDSET))
+            .filter(Lead.id.in_(lead_ids))
+        }
+
+    results = []
+    for kind, row_id, rank in page:
+        result = {
+            'type': kind,
+            'id': row_id,
+            'rank': round(float(rank), 4),
+            'snippet': render_snippet(snippets.get((kind, row_id)))
+        }
+        if kind == 'company' and row_id in companies:
+            company = companies[row_id]
+            result['company'] = {
+                'id': company.id,
+                'name': company.name,
+                'industry': company.industry,
+                'size': company.size,
+                'website': company.website
+            }
+        elif kind == 'lead' and row_id in leads:
+            result['lead'] = serialize_lead(leads[row_id], LIST_FIELDSET)
+        else:
+            continue  # deleted since the search ran
+        results.append(result)
+
+    return {
+        'results': results,
+        'next_offset': offset + limit if has_more else None
+    }
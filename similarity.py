@@ -0,0 +1,144 @@
+import math
+import re
+from collections import Counter
+
+# NumPy is only needed to score candidates in one vectorized pass
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Candidates per /api/competitors/batch job, scraped by one worker
+MAX_BATCH_COMPETITORS = 50
+
+# Text fields compared between a company and its competitor candidates
+TEXT_FIELDS = ('description', 'summary', 'target_audience')
+
+# Points out of 100: text similarity (TF-IDF cosine) plus matching
+# industry, size and country
+TEXT_SIMILARITY_POINTS = 70
+FIELD_MATCH_POINTS = {'industry': 15, 'size': 10, 'country': 5}
+
+STOP_WORDS = frozenset((
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'has', 'have', 'in', 'is', 'it',
+    'its', 'of', 'on', 'or', 'our', 'that', 'the', 'their', 'this', 'to', 'we', 'with', 'you', 'your',
+    'company', 'unknown', 'n/a'
+))
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+def field_value(company, field):
+    """Read a field from a Company or a scraped company data dict"""
+    if isinstance(company, dict):
+        return company.get(field)
+    return getattr(company, field, None)
+
+def company_tokens(company):
+    text = ' '.join(field_value(company, field) or '' for field in TEXT_FIELDS).lower()
+    return [token for token in TOKEN_PATTERN.findall(text) if len(token) > 1 and token not in STOP_WORDS]
+
+def tfidf_cosine(target_tokens, candidate_tokens):
+    """
+    Cosine similarity between the target's TF-IDF vector and each
+    candidate's, with document frequencies taken over the target and
+    candidates together.
+
+    Returns:
+        list: Similarities in [0, 1], aligned with candidate_tokens
+    """
+    documents = [target_tokens] + candidate_tokens
+    vocabulary = {}
+    for tokens in documents:
+        for token in tokens:
+            vocabulary.setdefault(token, len(vocabulary))
+    if not vocabulary or not target_tokens:
+        return [0.0] * len(candidate_tokens)
+
+    if np is None:
+        document_frequency = Counter(token for tokens in documents for token in set(tokens))
+        idf = {
+            token: math.log((1 + len(documents)) / (1 + count)) + 1
+            for token, count in document_frequency.items()
+        }
+        vectors = []
+        for tokens in documents:
+            vector = {token: count * idf[token] for token, count in Counter(tokens).items()}
+            norm = math.sqrt(sum(value * value for value in vector.values())) or 1.0
+            vectors.append({token: value / norm for token, value in vector.items()})
+        target = vectors[0]
+        return [
+            sum((value * target.get(token, 0.0) for token, value in vector.items()), 0.0)
+            for vector in vectors[1:]
+        ]
+
+    # Term counts as a dense documents x vocabulary matrix
+    rows = np.repeat(np.arange(len(documents)), [len(tokens) for tokens in documents])
+    columns = np.fromiter((vocabulary[token] for tokens in documents for token in tokens), dtype=np.int64)
+    counts = np.zeros((len(documents), len(vocabulary)))
+    np.add.at(counts, (rows, columns), 1)
+
+    document_frequency = np.count_nonzero(counts, axis=0)
+    weights = counts * (np.log((1 + len(documents)) / (1 + document_frequency)) + 1)
+    norms = np.linalg.norm(weights, axis=1, keepdims=True)
+    weights /= np.where(norms == 0, 1, norms)
+    return (weights[1:] @ weights[0]).tolist()
+
+def similarity_scores(company, candidates):
+    """
+    Score how similar each candidate is to a company, 0-100.
+
+    TF-IDF cosine over description, summary and target audience gives up
+    to TEXT_SIMILARITY_POINTS; a matching industry, size and country add
+    FIELD_MATCH_POINTS each.
+
+    Args:
+        company: Target Company (or company data dict)
+        candidates (list): Candidate company data dicts
+
+    Returns:
+        list: Integer scores aligned with candidates
+    """
+    if not candidates:
+        return []
+
+    text_similarity = tfidf_cosine(company_tokens(company), [company_tokens(candidate) for candidate in candidates])
+    scores = [similarity * TEXT_SIMILARITY_POINTS for similarity in text_similarity]
+
+    for field, points in FIELD_MATCH_POINTS.items():
+        target = (field_value(company, field) or '').strip().lower()
+        if not target or target == 'unknown':
+            continue
+        for index, candidate in enumerate(candidates):
+            if (field_value(candidate, field) or '').strip().lower() == target:
+                scores[index] += points
+
+    return [int(round(min(score, 100))) for score in scores]
+
+def competitor_fields(company, competitor_data, similarity_score):
+    """
+    CompetitorAnalysis column values for a scraped competitor, including
+    the generated comparison, strengths and weaknesses.
+    """
+    name = competitor_data.get('name')
+    ai_comparison = f"Both {company.name} and {name} operate in the {company.industry} industry. "
+    if company.size == competitor_data.get('size'):
+        ai_comparison += f"They are similar in size ({company.size}). "
+    else:
+        ai_comparison += f"While {company.name} is {company.size}, {name} is {competitor_data.get('size')}. "
+
+    if any((competitor_data.get('social_media') or {}).values()):
+        strengths = f"{name} has a strong online presence."
+    else:
+        strengths = f"{name} has limited online visibility."
+
+    return {
+        'company_id': company.id,
+        'competitor_name': name,
+        'competitor_website': competitor_data.get('website', ''),
+        'competitor_industry': competitor_data.get('industry', 'Unknown'),
+        'competitor_size': competitor_data.get('size', 'Unknown'),
+        'market_position': 'challenger',  # Default position
+        'strengths': strengths,
+        'weaknesses': "Further analysis required to determine specific weaknesses.",
+        'similarity_score': similarity_score,
+        'ai_comparison': ai_comparison
+    }
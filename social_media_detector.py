@@ -1,11 +1,23 @@
 import re
+import os
 import logging
-import requests
 from bs4 import BeautifulSoup
 from urllib.parse import urlparse
 import time
 import random
 
+from metrics import SCRAPE_STAGE_SECONDS, timed
+from tracing import set_span_attributes, set_span_error, span
+from scraper import http_get
+
+logger = logging.getLogger(__name__)
+
+# Pause after each social media search, to stay under search engine rate
+# limits (seconds)
+SOCIAL_SEARCH_DELAY_SECONDS = float(os.environ.get("SOCIAL_SEARCH_DELAY_SECONDS", "1.5"))
+
+@span('detect_social_media')
+@timed(SCRAPE_STAGE_SECONDS, stage='social_detection')
 def detect_social_media(company_name):
     """
     Detect social media presence for a company by:
@@ -26,7 +38,7 @@ def detect_social_media(company_name):
         'facebook': None
     }
     
-    logging.info(f"Detecting social media for {company_name}")
+    logger.info("Detecting social media for %s", company_name)
     
     # Enhanced handling for well-known companies
     well_known_companies = {
@@ -66,7 +78,7 @@ def detect_social_media(company_name):
     company_name_lower = company_name.lower()
     for known_company, profiles in well_known_companies.items():
         if known_company in company_name_lower:
-            logging.info(f"Found well-known company match: {known_company}")
+            logger.info("Found well-known company match: %s", known_company)
             return profiles
     
     try:
@@ -83,7 +95,7 @@ def detect_social_media(company_name):
         # Handle each platform separately
         for i, query in enumerate(search_queries):
             platform = social_platforms[i]
-            logging.info(f"Searching for {platform} profile for {company_name}")
+            logger.info("Searching for %s profile for %s", platform, company_name)
             
             # Search using Google
             formatted_query = query.replace(' ', '+')
@@ -94,7 +106,7 @@ def detect_social_media(company_name):
             }
             
             try:
-                response = requests.get(search_url, headers=headers, timeout=10)
+                response = http_get(search_url, headers=headers, timeout=10)
                 
                 if response.status_code == 200:
                     soup = BeautifulSoup(response.text, 'html.parser')
@@ -143,25 +155,25 @@ def detect_social_media(company_name):
                                     # Store both Twitter and X URLs for better compatibility
                                     twitter_url = clean_link.replace('x.com', 'twitter.com')
                                     social_media[platform] = twitter_url
-                                    logging.info(f"Converted X to Twitter URL: {twitter_url}")
+                                    logger.info("Converted X to Twitter URL: %s", twitter_url)
                                     break
                                 else:
                                     # For twitter.com links, keep as is
                                     social_media[platform] = clean_link
-                                    logging.info(f"Found Twitter profile: {clean_link}")
+                                    logger.info("Found Twitter profile: %s", clean_link)
                                     break
                             else:
                                 # For other platforms, verify normally
                                 if verify_social_profile(clean_link):
                                     social_media[platform] = clean_link
-                                    logging.info(f"Found verified {platform} profile: {clean_link}")
+                                    logger.info("Found verified %s profile: %s", platform, clean_link)
                                     break
                     
                 # Add a small delay between requests
-                time.sleep(1.5)
+                time.sleep(SOCIAL_SEARCH_DELAY_SECONDS)
                 
             except Exception as e:
-                logging.error(f"Error searching for {platform} profile: {e}")
+                logger.error("Error searching for %s profile: %s", platform, e)
         
         # If we still don't have profiles, try common pattern matching using the company name
         for platform in social_platforms:
@@ -201,10 +213,10 @@ def detect_social_media(company_name):
                         if platform == 'twitter' and 'x.com' in url:
                             twitter_url = url.replace('x.com', 'twitter.com')
                             social_media[platform] = twitter_url
-                            logging.info(f"Found Twitter profile through pattern matching, converted from X: {twitter_url}")
+                            logger.info("Found Twitter profile through pattern matching, converted from X: %s", twitter_url)
                         else:
                             social_media[platform] = url
-                            logging.info(f"Found {platform} profile through pattern matching: {url}")
+                            logger.info("Found %s profile through pattern matching: %s", platform, url)
                         break
         
         # Final check for company names containing well-known terms
@@ -214,14 +226,16 @@ def detect_social_media(company_name):
                 for platform, url in profiles.items():
                     if not social_media[platform]:
                         social_media[platform] = url
-                        logging.info(f"Using well-known {platform} profile for {known_company} in {company_name}: {url}")
+                        logger.info("Using well-known %s profile for %s in %s: %s", platform, known_company, company_name, url)
         
         return social_media
         
     except Exception as e:
-        logging.error(f"Error detecting social media for {company_name}: {e}")
+        logger.error("Error detecting social media for %s: %s", company_name, e)
+        set_span_error(str(e))
         return social_media
 
+@span('verify_social_profile')
 def verify_social_profile(url):
     """
     Verify if a social media profile exists by making a request
@@ -232,6 +246,7 @@ def verify_social_profile(url):
     Returns:
         bool: True if the profile exists, False otherwise
     """
+    set_span_attributes(url=url)
     try:
         # Add headers to avoid being blocked
         headers = {
@@ -266,7 +281,7 @@ def verify_social_profile(url):
             return True
         
         # For other URLs, make a request to verify
-        response = requests.get(url, headers=headers, timeout=5, allow_redirects=True)
+        response = http_get(url, headers=headers, timeout=5, allow_redirects=True)
         
         # Check for successful response or typical redirect
         if response.status_code == 200:
@@ -285,7 +300,8 @@ def verify_social_profile(url):
         return response.status_code < 400
         
     except Exception as e:
-        logging.error(f"Error verifying social profile {url}: {e}")
+        logger.error("Error verifying social profile %s: %s", url, e)
+        set_span_error(str(e))
         # For well-known company URLs, return True even on error to be resilient
         if any(known_url in url.lower() for known_url in ['microsoft', 'apple', 'google', 'amazon', 'netflix']):
             return True
@@ -0,0 +1,89 @@
+import os
+import sys
+import tempfile
+
+import pytest
+from sqlalchemy import event
+
+# The app reads its configuration at import time, so point it at a
+# throwaway database before anything imports it
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test.db')
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+os.environ['PRELOAD_COMPANY_INDEXES'] = '0'
+os.environ['WRITE_BATCHING'] = '0'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app as flask_app, db  # noqa: E402
+from models import Lead, Company, SocialMedia  # noqa: E402
+from dedup import dedup_index  # noqa: E402
+from company_index import company_index  # noqa: E402
+
+@pytest.fixture
+def app():
+    with flask_app.app_context():
+        db.drop_all()
+        db.create_all()
+        # The in-memory indexes reload from the fresh tables when next used
+        for index in (dedup_index, company_index):
+            if index is not None:
+                index.loaded.clear()
+        yield flask_app
+        db.session.remove()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def seed_leads(app):
+    """Add leads spread over companies that each have social media"""
+    def seed(count, per_company=3):
+        first_lead = Lead.query.count()
+        first_company = Company.query.count()
+        company = None
+        for i in range(first_lead, first_lead + count):
+            if company is None or (i - first_lead) % per_company == 0:
+                n = first_company
+                first_company += 1
+                company = Company(
+                    name=f'Company {n}', industry=['Technology', 'Finance'][n % 2],
+                    size=['SMB', 'Enterprise'][n % 2], domain=f'company{n}.com'
+                )
+                db.session.add(company)
+                db.session.flush()
+                db.session.add(SocialMedia(
+                    company_id=company.id,
+                    linkedin=f'https://www.linkedin.com/company/company{n}',
+                    twitter=f'https://twitter.com/company{n}'
+                ))
+            db.session.add(Lead(
+                name=f'Lead {i}', email=f'lead{i}@{company.domain}', email_status=['valid', 'risky'][i % 2],
+                score=i % 100, priority=['low', 'medium', 'high'][i % 3], company_id=company.id
+            ))
+        db.session.commit()
+    return seed
+
+class StatementCounter:
+    """Record the SQL statements run on the database while active"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append((statement, parameters))
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self.record)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, 'before_cursor_execute', self.record)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+@pytest.fixture
+def count_statements(app):
+    return lambda: StatementCounter(db.engine)
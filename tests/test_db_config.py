@@ -0,0 +1,26 @@
+from app import db
+
+def test_read_replica_flag_is_cleared_after_the_view(client, seed_leads):
+    seed_leads(3)
+
+    assert client.get('/api/leads').status_code == 200
+    assert client.get('/api/leads/stats').status_code == 200
+
+    # The test app context stays pushed, so later work shares the session
+    assert 'read_replica' not in db.session.info
+
+def test_read_replica_flag_lasts_while_a_response_streams(client, seed_leads):
+    seed_leads(3)
+
+    response = client.post('/api/leads/export', json={'format': 'ndjson'})
+    assert response.is_streamed
+    assert db.session.info['read_replica'] is True
+    assert len(response.get_data(as_text=True).splitlines()) == 3
+    response.close()
+
+    assert 'read_replica' not in db.session.info
+
+def test_read_replica_flag_is_cleared_after_an_error(client):
+    response = client.get('/api/leads?sort=name')
+    assert response.status_code == 400
+    assert 'read_replica' not in db.session.info
@@ -0,0 +1,141 @@
+import pytest
+
+import app as app_module
+from app import db
+from dedup import duplicate_groups, find_duplicate_company, find_duplicates, merge_companies
+from models import Company, Lead, SocialMedia
+
+@pytest.fixture
+def companies(app):
+    """Stored companies by name"""
+    stored = {}
+    for name, domain in [('Acme Cloud Analytics', 'acme.io'), ('Blue River Software', None),
+                         ('Zephyr Foods', 'zephyr.com'), ('Acme Cloud Analytics Inc', None)]:
+        stored[name] = Company(name=name, domain=domain, industry='Technology', size='SMB')
+        db.session.add(stored[name])
+    db.session.commit()
+    return stored
+
+@pytest.fixture
+def no_network(monkeypatch):
+    monkeypatch.setattr(app_module, 'detect_social_media', lambda name: {})
+    monkeypatch.setattr(app_module, 'summarize_company', lambda description: '')
+    monkeypatch.setattr(app_module, 'analyze_company_value', lambda company_data: {'reasoning': ''})
+    monkeypatch.setattr(app_module, 'scrape_company_data', lambda source: pytest.fail('scraped ' + source))
+
+def test_find_duplicates_matches_normalized_name_and_domain(companies):
+    acme, acme_inc = companies['Acme Cloud Analytics'].id, companies['Acme Cloud Analytics Inc'].id
+
+    assert find_duplicates('acme cloud analytics, inc.') == [(acme, 1.0, 'name'), (acme_inc, 1.0, 'name')]
+    assert find_duplicates('Other', domain='https://www.acme.io/about') == [(acme, 1.0, 'domain')]
+    assert find_duplicates('Totally Unrelated') == []
+
+def test_find_duplicates_reports_similar_names(companies):
+    matches = find_duplicates('Blue River Soft')
+    assert [(company_id, reason) for company_id, _, reason in matches] == [
+        (companies['Blue River Software'].id, 'similar name')
+    ]
+    assert 0.7 <= matches[0][1] < 1
+
+def test_exact_duplicate_company_ignores_similar_names(companies):
+    assert find_duplicate_company('Blue River Soft') == companies['Blue River Software']
+    assert find_duplicate_company('Blue River Soft', exact=True) is None
+    assert find_duplicate_company('New name', domain='acme.io', exact=True) == companies['Acme Cloud Analytics']
+
+def test_find_duplicates_follows_committed_changes(companies):
+    zephyr = companies['Zephyr Foods']
+    assert find_duplicates('Zephyr Foods')
+
+    zephyr.name = 'Quantum Ledger'
+    zephyr.domain = None
+    db.session.commit()
+    assert find_duplicates('Zephyr Foods') == []
+    assert find_duplicates('Quantum Ledger') == [(zephyr.id, 1.0, 'name')]
+
+    db.session.delete(zephyr)
+    db.session.commit()
+    assert find_duplicates('Quantum Ledger') == []
+
+def test_duplicate_groups(companies):
+    db.session.add(Company(name='Blue River Soft'))
+    db.session.commit()
+    blue_river_soft = Company.query.filter_by(name='Blue River Soft').one()
+
+    assert duplicate_groups() == [
+        [companies['Acme Cloud Analytics'].id, companies['Acme Cloud Analytics Inc'].id],
+        [companies['Blue River Software'].id, blue_river_soft.id],
+    ]
+
+def test_merge_companies(companies):
+    target, source = companies['Acme Cloud Analytics'], companies['Acme Cloud Analytics Inc']
+    source.description = 'Analytics in the cloud'
+    db.session.add_all([
+        SocialMedia(company_id=target.id, linkedin='https://www.linkedin.com/company/acme'),
+        SocialMedia(company_id=source.id, linkedin='https://www.linkedin.com/company/other',
+                    twitter='https://twitter.com/acme'),
+        Lead(name='Ann', email='ann@acme.io', email_status='valid', company_id=target.id),
+        Lead(name='Bob', email='bob@acme.io', email_status='valid', company_id=source.id),
+    ])
+    db.session.commit()
+    target_id, source_id = target.id, source.id
+
+    assert merge_companies(target_id, [source_id]) == {'merged': 1, 'leads_moved': 1}
+
+    db.session.expire_all()
+    target = db.session.get(Company, target_id)
+    assert db.session.get(Company, source_id) is None
+    assert target.description == 'Analytics in the cloud'
+    assert {lead.email for lead in Lead.query.filter_by(company_id=target_id)} == {'ann@acme.io', 'bob@acme.io'}
+    social_media, = SocialMedia.query.filter_by(company_id=target_id).all()
+    assert social_media.linkedin == 'https://www.linkedin.com/company/acme'
+    assert social_media.twitter == 'https://twitter.com/acme'
+    assert find_duplicates('Acme Cloud Analytics Inc') == [(target_id, 1.0, 'name')]
+
+def test_merge_companies_rejects_bad_ids(companies):
+    acme = companies['Acme Cloud Analytics'].id
+    with pytest.raises(ValueError):
+        merge_companies(acme, [acme])
+    with pytest.raises(ValueError):
+        merge_companies(acme, [])
+    with pytest.raises(ValueError):
+        merge_companies(acme, [12345])
+
+def add_lead(client, company_name, **extra):
+    return client.post('/api/leads', json={
+        'name': 'Dana', 'email': f'dana{Lead.query.count()}@example.com', 'company_name': company_name,
+        'company_data': {'name': company_name, 'industry': 'Technology', 'size': 'SMB'}, **extra
+    })
+
+def test_add_lead_reuses_exact_match(client, companies, no_network):
+    response = add_lead(client, 'ACME Cloud Analytics, Inc.')
+    assert response.status_code == 200
+    lead = db.session.get(Lead, response.json['id'])
+    assert lead.company_id in (companies['Acme Cloud Analytics'].id, companies['Acme Cloud Analytics Inc'].id)
+    assert Company.query.count() == 4
+
+def test_add_lead_asks_about_similar_company(client, companies, no_network):
+    response = add_lead(client, 'Acme Cloud Analytics Labs')
+    assert response.status_code == 409
+    assert {company['name'] for company in response.json['similar_companies']} == {
+        'Acme Cloud Analytics', 'Acme Cloud Analytics Inc'
+    }
+    assert Lead.query.count() == 0
+
+    response = add_lead(client, 'Acme Cloud Analytics Labs', force=True)
+    assert response.status_code == 200
+    assert db.session.get(Lead, response.json['id']).company.name == 'Acme Cloud Analytics Labs'
+
+    blue_river = companies['Blue River Software'].id
+    response = add_lead(client, 'Blue River Soft', company_id=blue_river)
+    assert response.status_code == 200
+    assert db.session.get(Lead, response.json['id']).company_id == blue_river
+
+def test_scheduled_lead_only_reuses_exact_match(companies):
+    from scheduler import save_scraped_lead
+
+    assert save_scraped_lead({'name': 'Blue River Soft', 'owner_email': 'owner@blueriversoft.com'})
+    lead = Lead.query.filter_by(email='owner@blueriversoft.com').one()
+    assert lead.company.name == 'Blue River Soft'
+
+    assert save_scraped_lead({'name': 'Zephyr', 'website': 'https://zephyr.com', 'owner_email': 'owner@zephyr.com'})
+    assert Lead.query.filter_by(email='owner@zephyr.com').one().company == companies['Zephyr Foods']
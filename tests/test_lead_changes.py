@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+import lead_queries
+from app import db
+from dedup import merge_companies
+from models import Company, DeletedCompany, Lead, SocialMedia
+
+def listing_etag(client, url='/api/leads'):
+    response = client.get(url)
+    assert response.status_code == 200
+    return response.headers['ETag']
+
+def age_leads(seconds=60):
+    """Move every lead's updated_at back, as if they changed a while ago"""
+    db.session.execute(update(Lead).values(updated_at=datetime.utcnow() - timedelta(seconds=seconds)))
+    db.session.commit()
+
+def test_listing_revalidates_with_etag(client, seed_leads):
+    seed_leads(3)
+    etag = listing_etag(client)
+
+    assert client.get('/api/leads', headers={'If-None-Match': etag}).status_code == 304
+    assert listing_etag(client, '/api/leads?sort=score') != etag
+
+def test_etag_changes_when_company_or_social_media_is_edited(client, seed_leads):
+    seed_leads(3)
+    age_leads()
+    etag = listing_etag(client)
+
+    company = Company.query.first()
+    company.industry = 'Healthcare'
+    db.session.commit()
+    company_etag = listing_etag(client)
+    assert company_etag != etag
+    assert client.get('/api/leads', headers={'If-None-Match': etag}).status_code == 200
+
+    age_leads()
+    aged_etag = listing_etag(client)
+    SocialMedia.query.first().instagram = 'https://instagram.com/company0'
+    db.session.commit()
+    assert listing_etag(client) != aged_etag
+
+def test_etag_changes_after_bulk_rescore(client, seed_leads):
+    seed_leads(6)
+    age_leads()
+    etag = listing_etag(client)
+
+    response = client.post('/api/leads/rescore', json={})
+    assert response.json['changed'] > 0
+    assert listing_etag(client) != etag
+
+def test_changes_feed_pages_through_leads(client, seed_leads):
+    seed_leads(5)
+    age_leads()
+
+    response = client.get('/api/leads/changes?limit=3').json
+    assert [lead['name'] for lead in response['changes']] == ['Lead 0', 'Lead 1', 'Lead 2']
+    assert response['has_more'] is True
+    response = client.get(f"/api/leads/changes?limit=3&since={response['next_since']}").json
+    assert [lead['name'] for lead in response['changes']] == ['Lead 3', 'Lead 4']
+    assert response['has_more'] is False
+    response = client.get(f"/api/leads/changes?since={response['next_since']}").json
+    assert (response['changes'], response['deleted']) == ([], [])
+
+def test_deleted_leads_and_companies_appear_in_changes(client, seed_leads):
+    seed_leads(9)
+    age_leads()
+    since = client.get('/api/leads/changes').json['next_since']
+
+    lead = Lead.query.filter_by(name='Lead 0').one()
+    deleted_lead_id = lead.id
+    db.session.delete(lead)
+    db.session.commit()
+    response = client.get(f'/api/leads/changes?since={since}').json
+    assert response['deleted'] == [deleted_lead_id]
+    since = response['next_since']
+
+    # A deleted company's leads are deleted with it
+    company = Company.query.filter_by(name='Company 1').one()
+    company_id, lead_ids = company.id, sorted(lead.id for lead in company.leads)
+    for lead in company.leads:
+        db.session.delete(lead)
+    SocialMedia.query.filter_by(company_id=company_id).delete()
+    db.session.delete(company)
+    db.session.commit()
+    response = client.get(f'/api/leads/changes?since={since}').json
+    assert sorted(response['deleted']) == lead_ids
+    assert DeletedCompany.query.filter_by(company_id=company_id).count() == 1
+    since = response['next_since']
+
+    # Merging a company away moves its leads, which show up as changed
+    target, source = Company.query.filter_by(name='Company 0').one(), Company.query.filter_by(name='Company 2').one()
+    moved = sorted(lead.id for lead in source.leads)
+    merge_companies(target.id, [source.id])
+    response = client.get(f'/api/leads/changes?since={since}&view=full').json
+    changed = {lead['id']: lead['company']['name'] for lead in response['changes']}
+    assert {lead_id: changed.get(lead_id) for lead_id in moved} == {lead_id: 'Company 0' for lead_id in moved}
+    assert DeletedCompany.query.filter_by(company_id=source.id).count() == 1
+
+def test_changes_token_holds_back_recent_rows(client, seed_leads, monkeypatch):
+    seed_leads(2)
+    age_leads()
+    since = client.get('/api/leads/changes').json['next_since']
+
+    lead = Lead.query.filter_by(name='Lead 1').one()
+    lead.priority = 'high'
+    db.session.commit()
+
+    # Changed within the settle window: the token stays behind it, so the
+    # next poll sends the lead again in case an earlier commit lands
+    first = client.get(f'/api/leads/changes?since={since}').json
+    assert [change['id'] for change in first['changes']] == [lead.id]
+    updated_after, last_id, _ = lead_queries.decode_change_token(first['next_since'])
+    assert updated_after < lead.updated_at and last_id == 0
+    again = client.get(f"/api/leads/changes?since={first['next_since']}").json
+    assert [change['id'] for change in again['changes']] == [lead.id]
+
+    # Once the window has passed, the token moves past the lead
+    monkeypatch.setattr(lead_queries, 'CHANGE_FEED_SETTLE_SECONDS', 0)
+    settled = client.get(f'/api/leads/changes?since={since}').json
+    assert client.get(f"/api/leads/changes?since={settled['next_since']}").json['changes'] == []
+
+def test_bad_change_token_is_rejected(client):
+    response = client.get('/api/leads/changes?since=not-a-token')
+    assert response.status_code == 400
+    assert response.json['message'] == 'Invalid change token'
@@ -0,0 +1,93 @@
+import io
+
+from app import db
+from lead_import import import_leads, iter_import_rows
+from models import Company, EnrichmentTask, Lead
+
+def run_import(csv_text, **kwargs):
+    rows = iter_import_rows(io.BytesIO(csv_text.encode()), 'csv')
+    return import_leads(rows, check_deliverability=False, **kwargs)
+
+def test_import_inserts_leads_and_companies(app):
+    summary = run_import(
+        'name,email,company,domain,industry,size,title\n'
+        'Ann,ann@acme.io,Acme,acme.io,Technology,Enterprise,CTO\n'
+        'Bob,bob@beta.com,Beta,,Retail,SMB,\n'
+    )
+
+    assert (summary['inserted'], summary['updated'], summary['companies_created']) == (2, 0, 2)
+    assert summary['enrichment_queued'] == EnrichmentTask.query.count() == 2
+    ann = Lead.query.filter_by(email='ann@acme.io').one()
+    assert (ann.name, ann.position, ann.priority, ann.company.name) == ('Ann', 'CTO', 'medium', 'Acme')
+    assert (ann.company.domain, ann.company.website, ann.company.industry) == ('acme.io', 'https://acme.io', 'Technology')
+    assert ann.score > 0
+
+def test_existing_email_is_updated_in_place(app):
+    run_import(
+        'name,email,company,domain,title,phone,priority\n'
+        'Ann,ann@acme.io,Acme,acme.io,CTO,555-0100,high\n'
+    )
+    lead = Lead.query.filter_by(email='ann@acme.io').one()
+    lead_id, created_at = lead.id, lead.created_at
+
+    summary = run_import('email,title\nann@acme.io,CEO\n')
+
+    assert (summary['inserted'], summary['updated'], summary['skipped']) == (0, 1, 0)
+    db.session.expire_all()
+    lead = Lead.query.filter_by(email='ann@acme.io').one()
+    assert (lead.id, lead.created_at) == (lead_id, created_at)
+    assert (lead.name, lead.position, lead.phone, lead.priority) == ('Ann', 'CEO', '555-0100', 'high')
+    assert lead.company.name == 'Acme'
+    assert Lead.query.count() == 1
+
+def test_name_only_and_name_with_domain_rows_share_a_company(app):
+    summary = run_import(
+        'name,email,company,domain\n'
+        'Ann,ann@acme.io,Acme,\n'
+        'Bob,bob@acme.io,Acme,acme.io\n'
+        'Cy,cy@acme.io,ACME,\n'
+    )
+
+    assert summary['companies_created'] == 1
+    company, = Company.query.all()
+    assert (company.name, company.domain) == ('Acme', 'acme.io')
+    assert {lead.company_id for lead in Lead.query} == {company.id}
+
+    summary = run_import('name,email,company,website\nDee,dee@acme.io,acme,https://www.acme.io/about\n')
+    assert summary['companies_created'] == 0
+    assert Lead.query.filter_by(email='dee@acme.io').one().company_id == company.id
+
+def test_row_errors_are_reported_by_line(app):
+    summary = run_import(
+        'name,email,company,priority\n'
+        'Ann,,Acme,\n'
+        ',bob@acme.io,Acme,\n'
+        'Cy,cy@acme.io,,\n'
+        'Dee,dee@acme.io,Acme,urgent\n'
+        'Eve,eve@acme.io,Acme,LOW\n'
+    )
+
+    assert (summary['processed'], summary['inserted'], summary['skipped']) == (5, 1, 4)
+    assert summary['errors'] == [
+        {'line': 2, 'message': 'email is required'},
+        {'line': 3, 'message': 'name is required for new leads'},
+        {'line': 4, 'message': 'company_name or company_domain is required for new leads'},
+        {'line': 5, 'message': 'priority must be one of: low, medium, high'},
+    ]
+    assert Lead.query.one().priority == 'low'
+
+def test_invalid_ndjson_lines_are_reported(app):
+    rows = iter_import_rows(io.BytesIO(b'{"name": "Ann", "email": "ann@acme.io", "company": "Acme"}\nnot json\n[1]\n'),
+                            'ndjson')
+    summary = import_leads(rows, check_deliverability=False)
+
+    assert summary['inserted'] == 1
+    assert [error['line'] for error in summary['errors']] == [2, 3]
+    assert summary['errors'][1]['message'] == 'Each line must be a JSON object'
+
+def test_repeated_email_in_a_batch_merges_rows(app):
+    summary = run_import('name,email,company,title\nAnn,ann@acme.io,Acme,CTO\nAnn B,ann@acme.io,,\n', batch_size=10)
+
+    assert (summary['inserted'], summary['duplicates']) == (1, 1)
+    lead = Lead.query.one()
+    assert (lead.name, lead.position, lead.company.name) == ('Ann B', 'CTO', 'Acme')
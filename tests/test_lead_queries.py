@@ -0,0 +1,51 @@
+import pytest
+
+@pytest.mark.parametrize('url', ['/api/leads?limit=200', '/api/leads?limit=200&view=full'])
+def test_lead_listing_runs_constant_number_of_statements(client, seed_leads, count_statements, url):
+    seed_leads(6)
+    with count_statements() as few:
+        response = client.get(url)
+    assert len(response.json['leads']) == 6
+
+    seed_leads(60)
+    with count_statements() as many:
+        response = client.get(url)
+    assert len(response.json['leads']) == 66
+
+    assert many.count == few.count
+
+def test_full_lead_listing_includes_social_media(client, seed_leads):
+    seed_leads(3)
+    lead = client.get('/api/leads?view=full').json['leads'][0]
+    assert lead['social_media']['linkedin'] == 'https://www.linkedin.com/company/company0'
+
+@pytest.mark.parametrize('format_type', ['csv', 'json', 'ndjson'])
+def test_lead_export_runs_constant_number_of_statements(client, seed_leads, count_statements, format_type):
+    seed_leads(6)
+    with count_statements() as few:
+        response = client.post('/api/leads/export', json={'format': format_type})
+        response.get_data()
+        response.close()
+
+    seed_leads(60)
+    with count_statements() as many:
+        response = client.post('/api/leads/export', json={'format': format_type})
+        body = response.get_data(as_text=True)
+        response.close()
+    assert 'https://twitter.com/company21' in body
+
+    assert many.count == few.count
+
+def test_lead_stats_count_unscored_leads_separately(app, client, seed_leads):
+    from app import db
+    from models import Lead
+
+    seed_leads(12)
+    for lead in Lead.query.filter(Lead.score < 4):
+        lead.score = None
+    db.session.commit()
+
+    stats = client.get('/api/leads/stats').json
+    assert stats['unscored'] == 4
+    assert [bucket['count'] for bucket in stats['score_histogram']] == [6, 2] + [0] * 8
+    assert stats['avg_score'] == 7.5
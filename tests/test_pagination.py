@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from models import Lead
+
+def seed_sort_values(seed_leads):
+    """Leads with repeated and NULL values in every sort column"""
+    seed_leads(13)
+    start = datetime(2026, 10, 1, 9, 0)
+    for index, lead in enumerate(Lead.query.order_by(Lead.id)):
+        lead.score = None if index % 4 == 0 else [30, 70, 70, 10][index % 4]
+        lead.created_at = start + timedelta(hours=index // 3)
+        lead.next_follow_up = None if index % 3 == 0 else start + timedelta(days=index % 2)
+    db.session.commit()
+
+def expected_order(sort, order):
+    leads = Lead.query.all()
+    present = [lead for lead in leads if getattr(lead, sort) is not None]
+    missing = [lead for lead in leads if getattr(lead, sort) is None]
+    reverse = order == 'desc'
+    present.sort(key=lambda lead: (getattr(lead, sort), lead.id), reverse=reverse)
+    missing.sort(key=lambda lead: lead.id, reverse=reverse)
+    return [lead.id for lead in present + missing]
+
+def walk_pages(client, sort, order, limit, **filters):
+    ids, cursor, pages = [], None, 0
+    while True:
+        params = {'sort': sort, 'order': order, 'limit': limit, **filters}
+        if cursor:
+            params['cursor'] = cursor
+        response = client.get('/api/leads', query_string=params)
+        assert response.status_code == 200, response.json
+        ids.extend(lead['id'] for lead in response.json['leads'])
+        cursor = response.json['next_cursor']
+        pages += 1
+        if not cursor:
+            return ids, pages
+
+@pytest.mark.parametrize('sort', ['score', 'created_at', 'next_follow_up'])
+@pytest.mark.parametrize('order', ['asc', 'desc'])
+@pytest.mark.parametrize('limit', [1, 2, 3, 5, 13, 50])
+def test_pages_cover_every_lead_once(client, seed_leads, sort, order, limit):
+    seed_sort_values(seed_leads)
+
+    ids, pages = walk_pages(client, sort, order, limit)
+
+    assert ids == expected_order(sort, order)
+    assert len(set(ids)) == 13
+    assert pages == max(1, -(-13 // limit))
+
+@pytest.mark.parametrize('sort', ['score', 'next_follow_up'])
+def test_pages_with_a_filter(client, seed_leads, sort):
+    seed_sort_values(seed_leads)
+
+    ids, _ = walk_pages(client, sort, 'desc', 2, email_status='valid')
+
+    assert ids == [lead_id for lead_id in expected_order(sort, 'desc')
+                   if db.session.get(Lead, lead_id).email_status == 'valid']
+
+def first_cursor(client, sort, order):
+    response = client.get('/api/leads', query_string={'sort': sort, 'order': order, 'limit': 2})
+    return response.json['next_cursor']
+
+@pytest.mark.parametrize('sort, order', [('created_at', 'desc'), ('score', 'asc'), ('next_follow_up', 'desc')])
+def test_cursor_for_another_sort_is_rejected(client, seed_leads, sort, order):
+    seed_sort_values(seed_leads)
+    cursor = first_cursor(client, 'score', 'desc')
+
+    response = client.get('/api/leads', query_string={'sort': sort, 'order': order, 'cursor': cursor})
+
+    assert response.status_code == 400
+    assert response.json['message'] == 'Cursor does not match the requested sort order'
+
+@pytest.mark.parametrize('cursor', ['garbage', 'W10', 'WyJzY29yZSJd'])
+def test_malformed_cursor_is_rejected(client, seed_leads, cursor):
+    seed_sort_values(seed_leads)
+
+    response = client.get('/api/leads', query_string={'sort': 'score', 'cursor': cursor})
+
+    assert response.status_code == 400
+    assert response.json['message'] == 'Invalid cursor'
@@ -0,0 +1,77 @@
+import re
+
+import pytest
+
+from app import db
+from models import Company, SocialMedia
+
+def query_plan(statement, parameters):
+    with db.engine.connect() as conn:
+        return [row[-1] for row in conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)]
+
+def assert_uses_indexes(plan):
+    # Every table is reached through an index; a plain "SCAN lead" reads the whole table
+    assert not [step for step in plan if re.match(r'SCAN \w+$', step)], plan
+    assert any(re.search(r'USING (COVERING )?INDEX ix_', step) for step in plan), plan
+
+def selects(counter, table=None):
+    return [(statement, parameters) for statement, parameters in counter.statements
+            if statement.lstrip().upper().startswith('SELECT')
+            and (table is None or f'FROM {table} ' in statement)]
+
+@pytest.mark.parametrize('url, index', [
+    ('/api/leads', 'ix_lead_created_at_id'),
+    ('/api/leads?sort=score', 'ix_lead_score_id'),
+    ('/api/leads?sort=next_follow_up&order=asc', 'ix_lead_next_follow_up_id'),
+    ('/api/followups?due_before=2100-01-01T00:00:00', 'ix_lead_next_follow_up_id'),
+])
+def test_sorted_lead_pages_walk_sort_index(client, seed_leads, count_statements, url, index):
+    seed_leads(30)
+    with count_statements() as counter:
+        response = client.get(url)
+    assert response.status_code == 200
+
+    # The unfiltered total counts every lead, so only the page is checked
+    pages = [query for query in selects(counter, 'lead') if 'LIMIT' in query[0]]
+    assert pages
+    for statement, parameters in pages:
+        plan = query_plan(statement, parameters)
+        assert_uses_indexes(plan)
+        assert any(index in step for step in plan), plan
+
+@pytest.mark.parametrize('url, index', [
+    ('/api/leads?industry=Technology&company_size=SMB', 'ix_company_industry_size'),
+    ('/api/leads?email_status=valid', 'ix_lead_email_status_created_at'),
+    ('/api/leads?email_status=valid&sort=score', 'ix_lead_email_status_score'),
+    ('/api/leads?priority=high', 'ix_lead_priority'),
+])
+def test_filtered_lead_queries_use_filter_index(client, seed_leads, count_statements, url, index):
+    seed_leads(30)
+    with count_statements() as counter:
+        response = client.get(url)
+    assert response.status_code == 200
+
+    # Both the total and the page; the total may use any index on the filter
+    queries = selects(counter, 'lead')
+    assert len(queries) == 2
+    for statement, parameters in queries:
+        assert_uses_indexes(query_plan(statement, parameters))
+
+    page, = [query for query in queries if 'LIMIT' in query[0]]
+    plan = query_plan(*page)
+    assert any(index in step for step in plan), plan
+
+@pytest.mark.parametrize('lookup, index', [
+    (lambda: Company.query.filter_by(name='Company 1').first(), 'ix_company_name'),
+    (lambda: Company.query.filter_by(domain='company1.com').first(), 'ix_company_domain'),
+    (lambda: SocialMedia.query.filter_by(company_id=1).first(), 'ix_social_media_company_id'),
+])
+def test_company_lookups_use_indexes(seed_leads, count_statements, lookup, index):
+    seed_leads(30)
+    with count_statements() as counter:
+        lookup()
+
+    (statement, parameters), = selects(counter)
+    plan = query_plan(statement, parameters)
+    assert_uses_indexes(plan)
+    assert any(index in step for step in plan), plan
@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import scheduler
+from app import db
+from models import AutoScraperSchedule
+from scheduler import (
+    MONTH_NAMES, DAY_NAMES, claim_schedule, compute_next_run, next_cron_time, parse_cron, parse_cron_field
+)
+
+@pytest.mark.parametrize('field, low, high, names, expected', [
+    ('*', 0, 5, None, {0, 1, 2, 3, 4, 5}),
+    ('*/15', 0, 59, None, {0, 15, 30, 45}),
+    ('5/20', 0, 59, None, {5, 25, 45}),
+    ('10-20/5', 0, 59, None, {10, 15, 20}),
+    ('1,3-4,9', 0, 23, None, {1, 3, 4, 9}),
+    ('jan-mar,DEC', 1, 12, MONTH_NAMES, {1, 2, 3, 12}),
+    ('mon-fri', 0, 7, DAY_NAMES, {1, 2, 3, 4, 5}),
+    ('sat,sun', 0, 7, DAY_NAMES, {6, 0}),
+])
+def test_parse_cron_field(field, low, high, names, expected):
+    assert parse_cron_field(field, low, high, names) == expected
+
+@pytest.mark.parametrize('field', ['60', '5-2', '*/0', 'x', '1-70/5'])
+def test_parse_cron_field_rejects_bad_values(field):
+    with pytest.raises(ValueError):
+        parse_cron_field(field, 0, 59)
+
+@pytest.mark.parametrize('expression', ['* * *', '0 0 30 feb-mar mon-funday', '@fortnightly'])
+def test_parse_cron_rejects_bad_expressions(expression):
+    with pytest.raises(ValueError):
+        parse_cron(expression)
+
+def test_parse_cron_treats_7_as_sunday():
+    assert parse_cron('0 9 * * 5-7').weekdays == {5, 6, 0}
+    assert parse_cron('@weekly') == parse_cron('0 0 * * sun')
+
+@pytest.mark.parametrize('expression, after, expected', [
+    ('*/15 * * * *', datetime(2026, 3, 4, 10, 7, 30), datetime(2026, 3, 4, 10, 15)),
+    ('0 9 * * mon-fri', datetime(2026, 10, 16, 9, 0), datetime(2026, 10, 19, 9, 0)),  # Friday -> Monday
+    ('30 2 1 jan,jul *', datetime(2026, 2, 1), datetime(2026, 7, 1, 2, 30)),
+    ('0 0 29 feb *', datetime(2026, 3, 1), datetime(2028, 2, 29)),
+    # Day of month and weekday both restricted: either matches
+    ('0 12 13 * fri', datetime(2026, 10, 19), datetime(2026, 10, 23, 12, 0)),
+])
+def test_next_cron_time(expression, after, expected):
+    assert next_cron_time(parse_cron(expression), after) == expected
+
+def test_next_cron_time_rejects_impossible_dates():
+    with pytest.raises(ValueError):
+        next_cron_time(parse_cron('0 0 30 feb *'), datetime(2026, 1, 1))
+
+def schedule(**fields):
+    return AutoScraperSchedule(name='Test', created_at=datetime(2026, 1, 7, 8, 30), **fields)
+
+@pytest.mark.parametrize('fields, now, expected', [
+    ({'frequency': 'daily'}, datetime(2026, 10, 19, 12, 0), datetime(2026, 10, 20, 8, 30)),
+    ({'frequency': 'weekly'}, datetime(2026, 10, 19, 12, 0), datetime(2026, 10, 21, 8, 30)),  # a Wednesday
+    ({'frequency': 'monthly'}, datetime(2026, 10, 19, 12, 0), datetime(2026, 11, 7, 8, 30)),
+    ({'frequency': 'custom', 'custom_cron': '*/10 * * * *'},
+     datetime(2026, 10, 19, 12, 1), datetime(2026, 10, 19, 12, 10)),
+])
+def test_compute_next_run_without_jitter(monkeypatch, fields, now, expected):
+    monkeypatch.setattr(scheduler.random, 'uniform', lambda low, high: low)
+    assert compute_next_run(schedule(**fields), now) == expected
+
+@pytest.mark.parametrize('fields, max_jitter', [
+    ({'frequency': 'daily'}, scheduler.SCHEDULER_JITTER_SECONDS),
+    # Capped at a tenth of the interval
+    ({'frequency': 'custom', 'custom_cron': '*/10 * * * *'}, 60),
+])
+def test_compute_next_run_jitter_bounds(monkeypatch, fields, max_jitter):
+    bounds = []
+    monkeypatch.setattr(scheduler.random, 'uniform', lambda low, high: bounds.append((low, high)) or high)
+    now = datetime(2026, 10, 19, 12, 1)
+    without_jitter = next_cron_time(parse_cron(scheduler.schedule_cron(schedule(**fields))), now)
+
+    assert compute_next_run(schedule(**fields), now) == without_jitter + timedelta(seconds=max_jitter)
+    assert bounds == [(0, max_jitter)]
+
+def test_compute_next_run_rejects_bad_frequency():
+    with pytest.raises(ValueError):
+        compute_next_run(schedule(frequency='hourly'))
+    with pytest.raises(ValueError):
+        compute_next_run(schedule(frequency='custom', custom_cron='every day'))
+
+def test_claim_schedule_is_a_compare_and_swap(app):
+    due = datetime(2026, 10, 19, 8, 30)
+    stored = schedule(frequency='daily', next_run=due, is_active=True)
+    db.session.add(stored)
+    db.session.commit()
+    now, next_run = due + timedelta(seconds=5), due + timedelta(days=1)
+
+    assert claim_schedule(stored.id, due, next_run, now) is True
+    # Another instance read the same next_run before the first claim
+    assert claim_schedule(stored.id, due, next_run + timedelta(minutes=1), now) is False
+
+    db.session.expire_all()
+    claimed = db.session.get(AutoScraperSchedule, stored.id)
+    assert (claimed.last_run, claimed.next_run) == (now, next_run)
+
+def test_inactive_schedule_is_not_claimed(app):
+    due = datetime(2026, 10, 19, 8, 30)
+    stored = schedule(frequency='daily', next_run=due, is_active=False)
+    db.session.add(stored)
+    db.session.commit()
+
+    assert claim_schedule(stored.id, due, due + timedelta(days=1), due) is False
@@ -0,0 +1,71 @@
+import pytest
+
+import scoring
+from app import db
+from models import Lead
+from scoring import ScoringFeatures, compute_scores, load_scoring_features, merge_weights, score_distribution, score_lead
+
+@pytest.fixture(params=['numpy', 'python'])
+def numpy_mode(request, monkeypatch):
+    """Run a test with NumPy, and again with the pure Python fallback"""
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(scoring, 'np', None)
+    return request.param
+
+def features(rows):
+    columns = [list(column) for column in zip(*rows)] or [[] for _ in ScoringFeatures._fields]
+    if scoring.np is not None:
+        np = scoring.np
+        return ScoringFeatures(
+            np.array(columns[0], dtype=np.int64), *[np.array(column, dtype=object) for column in columns[1:4]],
+            np.array(columns[4], dtype=np.int64), np.array(columns[5], dtype=np.int64)
+        )
+    return ScoringFeatures(*columns)
+
+def test_compute_scores_matches_score_lead(numpy_mode):
+    weights = merge_weights()
+    rows = [
+        (1, 'valid', 'Enterprise', 'Technology', 4, 0),
+        (2, 'risky', 'SMB', 'Mining', 1, 0),
+        (3, 'invalid', '', '', 0, 0),
+        (4, 'unknown', 'Mid-Market', 'Finance', 9, 0),
+    ]
+    expected = [score_lead(status, size, industry, social, weights) for _, status, size, industry, social, _ in rows]
+
+    assert [int(score) for score in compute_scores(features(rows), weights)] == expected == [100, 45, 10, 55]
+
+def test_compute_scores_uses_given_weights(numpy_mode):
+    weights = merge_weights({'email_status': {'valid': 50}, 'relevant_industries': ['Mining']})
+    rows = [(1, 'valid', 'SMB', 'Mining', 0, 0), (2, 'valid', 'SMB', 'Technology', 0, 0)]
+
+    assert [int(score) for score in compute_scores(features(rows), weights)] == [80, 70]
+
+def test_compute_scores_without_leads(numpy_mode):
+    assert len(compute_scores(features([]))) == 0
+
+def test_score_distribution(numpy_mode):
+    distribution = score_distribution([0, 5, 15, 50, 95, 100])
+
+    assert distribution['count'] == 6
+    assert distribution['mean'] == 44.2
+    assert [bucket['count'] for bucket in distribution['histogram']] == [2, 1, 0, 0, 0, 1, 0, 0, 0, 2]
+    assert distribution['histogram'][-1] == {'min': 90, 'max': 100, 'count': 2}
+    assert set(distribution['percentiles']) == {'p10', 'p25', 'p50', 'p75', 'p90'}
+    assert distribution['percentiles']['p90'] >= distribution['percentiles']['p10']
+
+def test_score_distribution_without_scores(numpy_mode):
+    assert score_distribution([]) == {'count': 0, 'mean': 0, 'percentiles': {}, 'histogram': []}
+
+def test_rescore_with_unscored_leads(numpy_mode, client, seed_leads):
+    seed_leads(6)
+    Lead.query.filter(Lead.id <= 2).update({'score': None})
+    db.session.commit()
+
+    assert list(load_scoring_features(Lead.query.join(Lead.company)).scores[:2]) == [0, 0]
+    response = client.post('/api/leads/rescore', json={})
+    assert response.status_code == 200
+    assert response.json['count'] == 6
+    assert response.json['current']['count'] == 6
+    assert Lead.query.filter(Lead.score.is_(None)).count() == 0
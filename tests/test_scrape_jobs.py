@@ -0,0 +1,33 @@
+import json
+
+import scrape_jobs
+from scrape_jobs import ScrapeJob, format_sse, run_job
+
+def test_emitted_event_data_is_a_snapshot():
+    job = ScrapeJob('acme.io')
+    data = {'name': 'Acme', 'social_media': {'linkedin': None}}
+    job.emit('company_info', data)
+    data['summary'] = 'Later stage'
+    data['social_media']['linkedin'] = 'https://www.linkedin.com/company/acme'
+
+    event, = job.wait_for_events(0, 0)
+    assert event['data'] == {'name': 'Acme', 'social_media': {'linkedin': None}}
+
+def test_late_stream_replays_each_stage_as_reported(monkeypatch):
+    def scrape(source, progress):
+        company_data = {'name': 'Acme', 'description': 'Cloud analytics'}
+        progress('company_info', company_data)
+        return company_data
+
+    monkeypatch.setattr(scrape_jobs, 'scrape_company_data', scrape)
+    monkeypatch.setattr(scrape_jobs, 'summarize_company', lambda description: 'Analytics company')
+    monkeypatch.setattr(scrape_jobs, 'detect_social_media', lambda name: {'linkedin': 'https://linkedin.com/company/acme'})
+    job = ScrapeJob('acme.io')
+    run_job(job)
+
+    events = {event['event']: event for event in job.events}
+    assert list(events) == ['started', 'company_info', 'summary_ready', 'socials_found', 'done']
+    assert events['company_info']['data'] == {'name': 'Acme', 'description': 'Cloud analytics'}
+    assert events['done']['data']['summary'] == 'Analytics company'
+    sse = format_sse(events['company_info'])
+    assert json.loads(sse.split('data: ', 1)[1]) == {'name': 'Acme', 'description': 'Cloud analytics'}
@@ -0,0 +1,160 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+import work_queue
+from app import db
+from models import Job
+from scrape_jobs import MAX_BATCH_CONCURRENCY
+from work_queue import (
+    JOB_LEASE_SECONDS, RETRY_BACKOFF_BASE, claim_jobs, enqueue_jobs, extend_leases, finish_job, reap_expired_jobs
+)
+
+def job(job_id):
+    db.session.expire_all()
+    return db.session.get(Job, job_id)
+
+def test_enqueue_rejects_bad_jobs(app):
+    with pytest.raises(ValueError):
+        enqueue_jobs('mine_bitcoin', [{}])
+    with pytest.raises(ValueError):
+        enqueue_jobs('scrape', [{'source': 'acme.io'}, {'save_lead': True}])
+    assert Job.query.count() == 0
+
+def test_claims_due_jobs_in_order(app):
+    now = datetime.utcnow()
+    later, = enqueue_jobs('scrape', [{'source': 'later.io'}], run_at=now + timedelta(hours=1))
+    first, second = enqueue_jobs('scrape', [{'source': 'a.io'}, {'source': 'b.io'}], run_at=now)
+    enrich, = enqueue_jobs('enrich', [{'company_id': 1}], run_at=now)
+
+    assert claim_jobs('worker-a', 10, kinds=['scrape'], now=now) == [first.id, second.id]
+    claimed = job(first.id)
+    assert (claimed.status, claimed.locked_by, claimed.attempts) == ('running', 'worker-a', 1)
+    assert claimed.locked_until == now + timedelta(seconds=JOB_LEASE_SECONDS)
+    assert job(later.id).status == 'queued'
+    assert claim_jobs('worker-b', 10, now=now) == [enrich.id]
+
+def test_claimers_get_disjoint_jobs(app):
+    jobs = enqueue_jobs('scrape', [{'source': f'company{i}.io'} for i in range(40)])
+    claimed = {}
+
+    def claim(worker_id):
+        with app.app_context():
+            got = []
+            while True:
+                batch = claim_jobs(worker_id, 3)
+                if not batch:
+                    break
+                got.extend(batch)
+            claimed[worker_id] = got
+            db.session.remove()
+
+    threads = [threading.Thread(target=claim, args=(f'worker-{i}',)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    all_claimed = [job_id for got in claimed.values() for job_id in got]
+    assert sorted(all_claimed) == sorted(job.id for job in jobs)
+    db.session.expire_all()
+    for worker_id, got in claimed.items():
+        assert {job.locked_by for job in Job.query.filter(Job.id.in_(got))} <= {worker_id}
+
+def test_expired_lease_is_requeued_or_dead_lettered(app):
+    now = datetime.utcnow()
+    retried, final, alive = enqueue_jobs('scrape', [{'source': f'{name}.io'} for name in ('a', 'b', 'c')], run_at=now)
+    job(final.id).max_attempts = 1
+    db.session.commit()
+    claim_jobs('worker-a', 3, now=now)
+    extend_leases([alive.id], 'worker-a', now=now + timedelta(seconds=JOB_LEASE_SECONDS))
+
+    assert reap_expired_jobs(now=now + timedelta(seconds=JOB_LEASE_SECONDS + 1)) == 2
+
+    requeued = job(retried.id)
+    assert (requeued.status, requeued.locked_by, requeued.attempts) == ('queued', None, 1)
+    dead = job(final.id)
+    assert (dead.status, dead.error) == ('dead', 'Lease expired on the final attempt')
+    assert job(alive.id).status == 'running'
+
+def test_finish_after_losing_the_lease_does_nothing(app):
+    now = datetime.utcnow()
+    queued, = enqueue_jobs('scrape', [{'source': 'acme.io'}], run_at=now)
+    claim_jobs('worker-a', 1, now=now)
+    reap_expired_jobs(now=now + timedelta(seconds=JOB_LEASE_SECONDS + 1))
+    assert claim_jobs('worker-b', 1, now=now + timedelta(seconds=JOB_LEASE_SECONDS + 1)) == [queued.id]
+
+    assert extend_leases([queued.id], 'worker-a') == 0
+    assert finish_job(queued.id, 'worker-a', result={'company': 'stale'}) is False
+    stale = job(queued.id)
+    assert (stale.status, stale.locked_by, stale.result) == ('running', 'worker-b', None)
+
+    assert finish_job(queued.id, 'worker-b', result={'company': 'Acme'}) is True
+    done = job(queued.id)
+    assert (done.status, done.locked_by, done.result) == ('done', None, '{"company": "Acme"}')
+
+def test_failed_job_is_retried_after_a_backoff(app, monkeypatch):
+    monkeypatch.setattr(work_queue.random, 'uniform', lambda low, high: high)
+    queued, = enqueue_jobs('scrape', [{'source': 'acme.io'}], max_attempts=2)
+    claim_jobs('worker-a', 1)
+
+    started = datetime.utcnow()
+    assert finish_job(queued.id, 'worker-a', error='Timed out') is True
+    retried = job(queued.id)
+    assert (retried.status, retried.error, retried.locked_by) == ('queued', 'Timed out', None)
+    assert started + timedelta(seconds=RETRY_BACKOFF_BASE) <= retried.run_at
+    assert retried.run_at <= datetime.utcnow() + timedelta(seconds=RETRY_BACKOFF_BASE)
+    assert claim_jobs('worker-a', 1) == []
+
+    assert claim_jobs('worker-a', 1, now=retried.run_at) == [queued.id]
+    assert finish_job(queued.id, 'worker-a', error='Timed out again') is True
+    assert job(queued.id).status == 'dead'
+
+def test_retry_delay_doubles_up_to_the_cap(monkeypatch):
+    monkeypatch.setattr(work_queue.random, 'uniform', lambda low, high: high)
+    assert [work_queue.retry_delay(attempts).total_seconds() for attempts in (1, 2, 3)] == [
+        RETRY_BACKOFF_BASE, RETRY_BACKOFF_BASE * 2, RETRY_BACKOFF_BASE * 4
+    ]
+    assert work_queue.retry_delay(50) == timedelta(seconds=work_queue.RETRY_BACKOFF_MAX)
+
+def test_competitor_batch_is_queued_not_scraped_in_the_request(client, seed_leads, monkeypatch):
+    seed_leads(3)
+    monkeypatch.setattr(work_queue, 'scrape_companies', lambda *args: pytest.fail('scraped in the request'))
+
+    response = client.post('/api/competitors/batch', json={
+        'company_id': 1, 'competitors': ['https://rival.io', 'rival.io/about', 'Other Co'], 'concurrency': 99
+    })
+    assert response.status_code == 202
+    body = response.get_json()
+    assert body['total'] == 2 and body['duplicates']
+    assert response.headers['Location'] == body['status_url']
+
+    queued = job(body['job_id'])
+    assert (queued.kind, queued.status) == ('competitors', 'queued')
+    status = client.get(body['status_url']).get_json()['job']
+    assert status['payload']['company_id'] == 1 and len(status['payload']['competitors']) == 2
+    assert status['payload']['concurrency'] == MAX_BATCH_CONCURRENCY
+
+    assert client.post('/api/competitors/batch', json={'company_id': 999, 'competitors': ['a.io']}).status_code == 404
+    assert client.post('/api/competitors/batch', json={'company_id': 1, 'competitors': []}).status_code == 400
+
+def test_competitor_job_adds_each_competitor_once(app, seed_leads, monkeypatch):
+    seed_leads(3)
+
+    def fake_scrape(sources, concurrency):
+        return [
+            {'source': source, 'status': 'failed', 'error': 'No company information found'} if 'down' in source else
+            {'source': source, 'status': 'done', 'company_data': {'name': source.title(), 'website': f'https://{source}.io'}}
+            for source in sources
+        ]
+    monkeypatch.setattr(work_queue, 'scrape_companies', fake_scrape)
+
+    result = work_queue.run_competitors_job({'company_id': 1, 'competitors': ['rival', 'down', 'other']})
+    assert sorted(added['competitor_name'] for added in result['added']) == ['Other', 'Rival']
+    assert [failure['source'] for failure in result['failed']] == ['down']
+
+    # A retried job skips what the first attempt stored
+    result = work_queue.run_competitors_job({'company_id': 1, 'competitors': ['rival', 'other', 'third']})
+    assert [added['competitor_name'] for added in result['added']] == ['Third']
+    assert result['existing'] == ['rival', 'other']
@@ -0,0 +1,267 @@
+import atexit
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# OTLP/HTTP collector (e.g. an OpenTelemetry Collector or Jaeger at
+# http://localhost:4318) that finished traces are sent to as OTLP JSON.
+# Unset: traces are only kept for the scrape "timings" block.
+OTEL_EXPORTER_OTLP_ENDPOINT = os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT")
+OTEL_SERVICE_NAME = os.environ.get("OTEL_SERVICE_NAME", "lead-scraper")
+
+# Traces sent per export request, and seconds to wait for a collector
+TRACE_EXPORT_BATCH_SIZE = 50
+TRACE_EXPORT_TIMEOUT = 5
+
+# Spans kept per trace, so a long loop can't grow one without bound
+MAX_TRACE_SPANS = 1000
+
+# OTLP status codes
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+# The innermost open span in this thread or task, None outside a trace
+current_span = ContextVar('current_span', default=None)
+
+class Span:
+    """A timed operation within a trace, with attributes and an outcome"""
+
+    def __init__(self, trace, name, parent=None, attributes=None):
+        self.trace = trace
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.started = time.perf_counter()
+        self.duration = None
+        self.error = None
+
+    @property
+    def outcome(self):
+        return 'error' if self.error else 'ok'
+
+    def end(self):
+        self.duration = time.perf_counter() - self.started
+        self.trace.add(self)
+
+    def to_timing(self, trace_start):
+        timing = {
+            'name': self.name,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start_ms': round((self.started - trace_start) * 1000, 3),
+            'duration_ms': round(self.duration * 1000, 3) if self.duration is not None else None,
+            'outcome': self.outcome
+        }
+        if self.error:
+            timing['error'] = self.error
+        if self.attributes:
+            timing['attributes'] = self.attributes
+        return timing
+
+    def to_otlp(self):
+        span = {
+            'traceId': self.trace.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': 1,  # SPAN_KIND_INTERNAL
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.start_ns + int((self.duration or 0) * 1e9)),
+            'attributes': otlp_attributes(self.attributes),
+            'status': {'code': STATUS_ERROR, 'message': self.error} if self.error else {'code': STATUS_OK}
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        return span
+
+class Trace:
+    """The spans of one traced operation, e.g. a scrape, as they finish"""
+
+    def __init__(self, name, attributes=None):
+        self.trace_id = secrets.token_hex(16)
+        self.spans = []
+        self.dropped = 0
+        self.lock = threading.Lock()
+        self.root = Span(self, name, attributes=attributes)
+
+    def add(self, span):
+        with self.lock:
+            if len(self.spans) < MAX_TRACE_SPANS:
+                self.spans.append(span)
+            else:
+                self.dropped += 1
+
+    def timings(self):
+        """
+        Each finished span's start (relative to the trace), duration and
+        outcome, in start order. The root span is listed with a null
+        duration while the trace is still running.
+
+        Returns:
+            dict: {"trace_id", "duration_ms", "outcome", "spans", "dropped_spans"}
+        """
+        with self.lock:
+            spans = list(self.spans)
+        if self.root.duration is None:
+            spans.append(self.root)
+        return {
+            'trace_id': self.trace_id,
+            'duration_ms': round(self.root.duration * 1000, 3) if self.root.duration is not None else None,
+            'outcome': self.root.outcome if self.root.duration is not None else 'running',
+            'spans': [span.to_timing(self.root.started) for span in sorted(spans, key=lambda span: span.started)],
+            'dropped_spans': self.dropped
+        }
+
+def otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+def otlp_attributes(attributes):
+    return [{'key': key, 'value': otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+def error_message(e):
+    return f'{type(e).__name__}: {e}'
+
+@contextmanager
+def trace(name, **attributes):
+    """
+    Start a trace whose root span covers the block. Spans opened inside
+    it, in the same thread, become its children. The finished trace is
+    exported if OTEL_EXPORTER_OTLP_ENDPOINT is set.
+
+    Yields:
+        Trace: The trace, for its timings
+    """
+    new_trace = Trace(name, attributes)
+    token = current_span.set(new_trace.root)
+    try:
+        yield new_trace
+    except Exception as e:
+        new_trace.root.error = error_message(e)
+        raise
+    finally:
+        current_span.reset(token)
+        new_trace.root.end()
+        if OTEL_EXPORTER_OTLP_ENDPOINT:
+            get_exporter().export(new_trace)
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Record a block (or, used as a decorator, a function call) as a child
+    of the current span. An exception marks it failed and propagates.
+    Outside a trace it does nothing.
+
+    Yields:
+        Span: The span, or None outside a trace
+    """
+    parent = current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(parent.trace, name, parent, attributes)
+    token = current_span.set(child)
+    try:
+        yield child
+    except Exception as e:
+        child.error = error_message(e)
+        raise
+    finally:
+        current_span.reset(token)
+        child.end()
+
+def set_span_attributes(**attributes):
+    """Add attributes to the current span, if any"""
+    current = current_span.get()
+    if current is not None:
+        current.attributes.update(attributes)
+
+def set_span_error(message):
+    """Mark the current span failed without raising, e.g. when a fallback is returned"""
+    current = current_span.get()
+    if current is not None:
+        current.error = message
+
+class OTLPExporter:
+    """
+    Sends finished traces to an OTLP/HTTP collector (POST /v1/traces, JSON
+    encoding) from a background thread, batching traces that finish
+    close together. Traces that can't be sent are logged and dropped.
+    """
+
+    def __init__(self, endpoint, service_name=OTEL_SERVICE_NAME, batch_size=TRACE_EXPORT_BATCH_SIZE):
+        self.url = endpoint.rstrip('/') + '/v1/traces'
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.queue = queue.Queue()
+        self.session = requests.Session()
+        self.thread = threading.Thread(target=self.run, name='trace-exporter', daemon=True)
+        self.thread.start()
+
+    def export(self, finished_trace):
+        self.queue.put(finished_trace)
+
+    def payload(self, traces):
+        return {
+            'resourceSpans': [{
+                'resource': {'attributes': otlp_attributes({'service.name': self.service_name})},
+                'scopeSpans': [{
+                    'scope': {'name': 'tracing'},
+                    'spans': [span.to_otlp() for finished_trace in traces for span in finished_trace.spans]
+                }]
+            }]
+        }
+
+    def run(self):
+        while True:
+            traces = [self.queue.get()]
+            while len(traces) < self.batch_size and traces[-1] is not None:
+                try:
+                    traces.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = traces[-1] is None
+            traces = [finished_trace for finished_trace in traces if finished_trace is not None]
+            if traces:
+                self.send(traces)
+            if stopping:
+                return
+
+    def send(self, traces):
+        try:
+            response = self.session.post(self.url, json=self.payload(traces), timeout=TRACE_EXPORT_TIMEOUT)
+            response.raise_for_status()
+        except Exception as e:
+            logger.warning("Failed to export %s traces to %s: %s", len(traces), self.url, e)
+
+    def stop(self):
+        """Send the queued traces and stop the thread"""
+        self.queue.put(None)
+        self.thread.join()
+
+exporter = None
+exporter_lock = threading.Lock()
+
+def get_exporter():
+    """The OTLP exporter, started on first use"""
+    global exporter
+    with exporter_lock:
+        if exporter is None:
+            exporter = OTLPExporter(OTEL_EXPORTER_OTLP_ENDPOINT)
+            atexit.register(exporter.stop)
+    return exporter
@@ -0,0 +1,419 @@
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+from app import db
+from db_config import begin_immediate
+from models import Company, CompetitorAnalysis, Job
+from enrichment import apply_enrichment, fetch_enrichment_data
+from lead_import import normalize_domain
+from scheduler import save_scraped_lead
+from scrape_jobs import DEFAULT_BATCH_CONCURRENCY, run_scrape_pipeline, scrape_companies
+from similarity import competitor_fields, similarity_scores
+from write_batcher import submit_write
+from logging_config import bind_log_context
+
+logger = logging.getLogger(__name__)
+
+# Job threads per worker process
+WORKER_CONCURRENCY = int(os.environ.get("WORKER_CONCURRENCY", "4"))
+
+# How long a claimed job stays invisible to other workers without a
+# heartbeat before it is handed out again (seconds)
+JOB_LEASE_SECONDS = int(os.environ.get("JOB_LEASE_SECONDS", "120"))
+
+# Longest sleep between checks for queued jobs (seconds)
+WORKER_POLL_SECONDS = float(os.environ.get("WORKER_POLL_SECONDS", "2"))
+
+DEFAULT_MAX_ATTEMPTS = 5
+
+# Retry delay doubles per attempt from the base, up to the cap (seconds)
+RETRY_BACKOFF_BASE = 30
+RETRY_BACKOFF_MAX = 3600
+
+JOB_STATUSES = ('queued', 'running', 'done', 'dead')
+
+def run_scrape_job(payload):
+    """Scrape a company; with 'save_lead', store it as a company and lead"""
+    company_data = run_scrape_pipeline(payload['source'])
+    result = {'company': company_data}
+    if payload.get('save_lead'):
+        result['lead_created'] = save_scraped_lead(company_data)
+    return result
+
+def run_enrich_job(payload):
+    """Enrich a stored company (scrape, summary, social media, lead scores)"""
+    company = db.session.get(Company, payload['company_id'])
+    if not company:
+        raise ValueError(f"Company {payload['company_id']} not found")
+    company_data = fetch_enrichment_data(company)
+    # Grouped with other workers' enrichment commits
+    submit_write(apply_enrichment, company.id, company_data).result()
+    return {'company_id': company.id}
+
+def run_competitors_job(payload):
+    """
+    Scrape competitor candidates for a stored company and add them with
+    similarity scores. Candidates already recorded as its competitors
+    (by name or domain) are skipped, so a retried job doesn't add them
+    twice.
+    """
+    company = db.session.get(Company, payload['company_id'])
+    if not company:
+        raise ValueError(f"Company {payload['company_id']} not found")
+    sources = payload.get('competitors') or []
+
+    known = set()
+    for name, website in db.session.query(CompetitorAnalysis.competitor_name, CompetitorAnalysis.competitor_website) \
+            .filter(CompetitorAnalysis.company_id == company.id):
+        known.add(name.lower())
+        if website:
+            known.add(normalize_domain(website))
+
+    scraped, failed, existing = [], [], []
+    for result in scrape_companies(sources, payload.get('concurrency') or DEFAULT_BATCH_CONCURRENCY):
+        if result['status'] == 'failed':
+            failed.append({'source': result['source'], 'error': result['error']})
+            continue
+        competitor_data = result['company_data']
+        keys = {competitor_data['name'].lower(), normalize_domain(competitor_data.get('website'))} - {None}
+        if keys & known:
+            existing.append(result['source'])
+            continue
+        known.update(keys)
+        scraped.append(competitor_data)
+
+    competitors = [
+        CompetitorAnalysis(**competitor_fields(company, competitor_data, similarity_score))
+        for competitor_data, similarity_score in zip(scraped, similarity_scores(company, scraped))
+    ]
+    db.session.add_all(competitors)
+    db.session.commit()
+
+    competitors.sort(key=lambda competitor: competitor.similarity_score, reverse=True)
+    return {
+        'company_id': company.id,
+        'added': [
+            {
+                'id': competitor.id,
+                'competitor_name': competitor.competitor_name,
+                'competitor_website': competitor.competitor_website,
+                'similarity_score': competitor.similarity_score
+            }
+            for competitor in competitors
+        ],
+        'failed': failed,
+        'existing': existing
+    }
+
+# Job kind -> handler(payload) returning a JSON-serializable result
+JOB_HANDLERS = {
+    'scrape': run_scrape_job,
+    'enrich': run_enrich_job,
+    'competitors': run_competitors_job,
+}
+
+# Payload field each job kind requires
+REQUIRED_PAYLOAD_FIELDS = {
+    'scrape': 'source',
+    'enrich': 'company_id',
+    'competitors': 'company_id',
+}
+
+def enqueue_jobs(kind, payloads, run_at=None, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """
+    Add jobs to the queue in one transaction.
+
+    Args:
+        kind (str): Handler name, a key of JOB_HANDLERS
+        payloads (list): Handler arguments (dicts), one job each
+        run_at (datetime): Earliest start time (default: now)
+        max_attempts (int): Attempts before a job is dead-lettered
+
+    Returns:
+        list: The queued jobs
+
+    Raises:
+        ValueError: If the kind is unknown or a payload lacks its required field
+    """
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"'kind' must be one of: {', '.join(JOB_HANDLERS)}")
+    field = REQUIRED_PAYLOAD_FIELDS[kind]
+    for payload in payloads:
+        if not isinstance(payload, dict) or payload.get(field) in (None, ''):
+            raise ValueError(f"Every '{kind}' job payload needs a '{field}'")
+
+    run_at = run_at or datetime.utcnow()
+    jobs = [
+        Job(kind=kind, payload=json.dumps(payload), run_at=run_at, max_attempts=max_attempts)
+        for payload in payloads
+    ]
+    db.session.add_all(jobs)
+    db.session.commit()
+    return jobs
+
+def enqueue_job(kind, payload, run_at=None, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """Add one job to the queue; see enqueue_jobs"""
+    return enqueue_jobs(kind, [payload], run_at=run_at, max_attempts=max_attempts)[0]
+
+def job_to_dict(job):
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'payload': json.loads(job.payload) if job.payload else None,
+        'status': job.status,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'run_at': job.run_at.isoformat() if job.run_at else None,
+        'locked_by': job.locked_by,
+        'result': json.loads(job.result) if job.result else None,
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None
+    }
+
+def retry_delay(attempts):
+    """Backoff before retrying a job that has failed 'attempts' times, with jitter"""
+    delay = min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * 2 ** (attempts - 1))
+    return timedelta(seconds=delay * random.uniform(0.5, 1))
+
+def claim_jobs(worker_id, limit, kinds=None, now=None):
+    """
+    Lease up to limit due jobs to a worker.
+
+    On PostgreSQL candidates are locked with FOR UPDATE SKIP LOCKED, so
+    concurrent workers claim disjoint jobs without waiting on each other.
+    Elsewhere (SQLite) the claim runs in a BEGIN IMMEDIATE transaction, so
+    a worker that commits first can't make its read snapshot stale
+    (SQLITE_BUSY_SNAPSHOT), and each candidate is claimed with a
+    compare-and-swap UPDATE on its status.
+
+    Returns:
+        list: Ids of the claimed jobs
+    """
+    now = now or datetime.utcnow()
+    lease = {
+        'status': 'running',
+        'locked_by': worker_id,
+        'locked_until': now + timedelta(seconds=JOB_LEASE_SECONDS),
+        'attempts': Job.attempts + 1
+    }
+    candidates = (
+        select(Job.id)
+        .where(Job.status == 'queued', Job.run_at <= now)
+        .order_by(Job.run_at, Job.id)
+        .limit(limit)
+    )
+    if kinds:
+        candidates = candidates.where(Job.kind.in_(kinds))
+
+    if db.session.get_bind().dialect.name == 'postgresql':
+        claimed = list(db.session.scalars(candidates.with_for_update(skip_locked=True)))
+        if claimed:
+            db.session.execute(
+                update(Job).where(Job.id.in_(claimed)).values(**lease)
+                .execution_options(synchronize_session=False)
+            )
+    else:
+        begin_immediate(db.session)
+        claimed = []
+        for job_id in db.session.scalars(candidates).all():
+            result = db.session.execute(
+                update(Job).where(Job.id == job_id, Job.status == 'queued').values(**lease)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 1:
+                claimed.append(job_id)
+
+    db.session.commit()
+    return claimed
+
+def reap_expired_jobs(now=None):
+    """
+    Requeue running jobs whose lease expired (their worker died or hung),
+    or dead-letter them if they've used all their attempts.
+
+    Returns:
+        int: Number of jobs requeued or dead-lettered
+    """
+    now = now or datetime.utcnow()
+    expired = (Job.status == 'running', Job.locked_until < now)
+    dead = db.session.execute(
+        update(Job)
+        .where(*expired, Job.attempts >= Job.max_attempts)
+        .values(status='dead', error='Lease expired on the final attempt', locked_by=None,
+                locked_until=None, finished_at=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    requeued = db.session.execute(
+        update(Job)
+        .where(*expired)
+        .values(status='queued', run_at=now, locked_by=None, locked_until=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+
+    if dead or requeued:
+        logger.warning("Jobs with expired leases: %s requeued, %s dead-lettered", requeued, dead)
+    return dead + requeued
+
+def extend_leases(job_ids, worker_id, now=None):
+    """
+    Heartbeat: push back the lease expiry of a worker's running jobs.
+
+    Returns:
+        int: Number of leases still held
+    """
+    now = now or datetime.utcnow()
+    held = db.session.execute(
+        update(Job)
+        .where(Job.id.in_(job_ids), Job.locked_by == worker_id, Job.status == 'running')
+        .values(locked_until=now + timedelta(seconds=JOB_LEASE_SECONDS))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return held
+
+def finish_job(job_id, worker_id, result=None, error=None):
+    """
+    Record a job's outcome. Failed jobs are retried after a backoff until
+    they reach max_attempts, then dead-lettered. Does nothing if the
+    worker lost its lease, since the job has been handed to another one.
+
+    Returns:
+        bool: False if the lease was lost
+    """
+    now = datetime.utcnow()
+    job = db.session.get(Job, job_id)
+    if error is None:
+        values = {'status': 'done', 'result': json.dumps(result), 'error': None, 'finished_at': now}
+    elif job.attempts >= job.max_attempts:
+        values = {'status': 'dead', 'error': error, 'finished_at': now}
+    else:
+        values = {'status': 'queued', 'error': error, 'run_at': now + retry_delay(job.attempts)}
+
+    finished = db.session.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.locked_by == worker_id, Job.status == 'running')
+        .values(locked_by=None, locked_until=None, **values)
+        .execution_options(synchronize_session=False)
+    ).rowcount == 1
+    db.session.commit()
+
+    if not finished:
+        logger.warning("Worker %s lost the lease on job %s, discarding its outcome", worker_id, job_id)
+    return finished
+
+class Worker:
+    """
+    Claims jobs from the queue and runs them on a thread pool, extending
+    their leases from a heartbeat thread while they run. Start one or more
+    worker processes per machine (see worker.py) to scale throughput.
+    """
+
+    def __init__(self, app, concurrency=WORKER_CONCURRENCY, kinds=None, poll_seconds=WORKER_POLL_SECONDS):
+        self.app = app
+        self.concurrency = concurrency
+        self.kinds = kinds
+        self.poll_seconds = poll_seconds
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+        self.active = set()
+        self.active_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stop_event = threading.Event()
+
+    def execute(self, job_id):
+        try:
+            with self.app.app_context(), bind_log_context(job_id=job_id):
+                job = db.session.get(Job, job_id)
+                payload = json.loads(job.payload) if job.payload else {}
+                try:
+                    result = JOB_HANDLERS[job.kind](payload)
+                    error = None
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error("Job %s (%s) attempt %s failed: %s", job_id, job.kind, job.attempts, e)
+                    logger.debug("Job error details", exc_info=True)
+                    result, error = None, str(e) or e.__class__.__name__
+                finish_job(job_id, self.worker_id, result=result, error=error)
+        except Exception as e:
+            logger.error("Error finishing job %s: %s", job_id, e)
+        finally:
+            with self.active_lock:
+                self.active.discard(job_id)
+            self.wakeup.set()
+
+    def heartbeat(self):
+        while not self.stop_event.wait(JOB_LEASE_SECONDS / 3):
+            with self.active_lock:
+                job_ids = list(self.active)
+            if not job_ids:
+                continue
+            try:
+                with self.app.app_context():
+                    held = extend_leases(job_ids, self.worker_id)
+                if held < len(job_ids):
+                    logger.warning("Worker %s lost %s job leases", self.worker_id, len(job_ids) - held)
+            except Exception as e:
+                logger.error("Job heartbeat failed: %s", e)
+
+    def poll(self, executor):
+        """
+        Reap expired leases and claim as many jobs as there are free threads.
+
+        Returns:
+            int: Number of jobs claimed
+        """
+        with self.active_lock:
+            free = self.concurrency - len(self.active)
+        if free <= 0:
+            return 0
+
+        with self.app.app_context():
+            reap_expired_jobs()
+            claimed = claim_jobs(self.worker_id, free, self.kinds)
+        for job_id in claimed:
+            with self.active_lock:
+                self.active.add(job_id)
+            executor.submit(self.execute, job_id)
+        return len(claimed)
+
+    def run(self, once=False):
+        """
+        Process jobs until stopped, or with once=True until the queue has
+        no due jobs left.
+        """
+        logger.info("Worker %s started with %s threads", self.worker_id, self.concurrency)
+        heartbeat = threading.Thread(target=self.heartbeat, name='job-heartbeat', daemon=True)
+        heartbeat.start()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='job') as executor:
+            while not self.stop_event.is_set():
+                self.wakeup.clear()
+                try:
+                    claimed = self.poll(executor)
+                except Exception as e:
+                    logger.error("Job poll failed: %s", e)
+                    claimed = 0
+
+                with self.active_lock:
+                    idle = not self.active
+                if once and not claimed and idle:
+                    break
+                if not claimed:
+                    self.wakeup.wait(self.poll_seconds)
+
+        self.stop_event.set()
+        heartbeat.join()
+
+    def stop(self):
+        self.stop_event.set()
+        self.wakeup.set()
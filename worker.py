@@ -0,0 +1,19 @@
+import argparse
+import signal
+
+from app import app
+from work_queue import WORKER_CONCURRENCY, Worker
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run queued scrape and enrichment jobs')
+    parser.add_argument('--concurrency', type=int, default=WORKER_CONCURRENCY, help='Job threads')
+    parser.add_argument('--kind', action='append', dest='kinds', help='Only run jobs of this kind (repeatable)')
+    parser.add_argument('--once', action='store_true', help='Exit when no due jobs are left')
+    args = parser.parse_args()
+
+    worker = Worker(app, concurrency=args.concurrency, kinds=args.kinds)
+    signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop())
+    try:
+        worker.run(once=args.once)
+    except KeyboardInterrupt:
+        worker.stop()
@@ -0,0 +1,157 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from flask import current_app
+
+from app import db
+from db_config import begin_immediate
+
+logger = logging.getLogger(__name__)
+
+# Writes committed together by the batcher, and how long it waits for
+# more writes to join a batch after the first arrives (seconds)
+WRITE_BATCH_SIZE = int(os.environ.get("WRITE_BATCH_SIZE", "100"))
+WRITE_BATCH_DELAY = float(os.environ.get("WRITE_BATCH_DELAY", "0"))
+
+class WriteBatcher:
+    """
+    Write-behind batcher: a single thread runs submitted write functions
+    and commits them in groups.
+
+    SQLite allows one writer at a time and syncs on every commit, so
+    threads committing their own small transactions queue on the write
+    lock (or fail with "database is locked"). Here a batch of writes
+    shares one BEGIN IMMEDIATE ... COMMIT, each write in its own
+    savepoint, so a failing write is rolled back alone and reported to its
+    caller while the rest of the batch commits.
+
+    Write functions run in the batcher's session and app context. They
+    should take ids and plain data, not ORM objects from another session,
+    and return plain values. A caller waiting on a write must not hold a
+    write transaction itself, or the batcher waits for its lock.
+    """
+
+    def __init__(self, app, batch_size=WRITE_BATCH_SIZE, batch_delay=WRITE_BATCH_DELAY):
+        self.app = app
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run, name='write-batcher', daemon=True)
+        self.thread.start()
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Queue a write.
+
+        Returns:
+            Future: Resolves to fn's return value once its batch commits,
+                or to the exception fn or the commit raised
+        """
+        future = Future()
+        self.queue.put((fn, args, kwargs, future))
+        return future
+
+    def next_batch(self):
+        """Block for a write, then collect more for up to batch_delay"""
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.batch_delay
+        while len(batch) < self.batch_size and batch[-1] is not None:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        while True:
+            batch = self.next_batch()
+            stopping = batch[-1] is None
+            writes = [write for write in batch if write is not None]
+            if writes:
+                self.write_batch(writes)
+            if stopping:
+                return
+
+    def write_batch(self, writes):
+        done = []
+        with self.app.app_context():
+            try:
+                begin_immediate(db.session)
+                for fn, args, kwargs, future in writes:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        with db.session.begin_nested():
+                            result = fn(*args, **kwargs)
+                    except Exception as e:
+                        logger.debug("Batched write error details", exc_info=True)
+                        future.set_exception(e)
+                        continue
+                    done.append((future, result))
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.error("Error committing a batch of %s writes: %s", len(writes), e)
+                for _, _, _, future in writes:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            finally:
+                db.session.remove()
+
+        for future, result in done:
+            future.set_result(result)
+
+    def stop(self):
+        """Commit the queued writes and stop the thread"""
+        self.queue.put(None)
+        self.thread.join()
+
+batcher_lock = threading.Lock()
+
+def batching_enabled(app):
+    """WRITE_BATCHING config if set, else on for SQLite. Needs an app context."""
+    enabled = app.config.get('WRITE_BATCHING')
+    if enabled is None:
+        return db.engine.dialect.name == 'sqlite'
+    return enabled
+
+def get_write_batcher(app=None):
+    """The app's write batcher, started on first use"""
+    app = app or current_app._get_current_object()
+    with batcher_lock:
+        batcher = app.extensions.get('write_batcher')
+        if batcher is None:
+            batcher = app.extensions['write_batcher'] = WriteBatcher(app)
+            atexit.register(batcher.stop)
+    return batcher
+
+def submit_write(fn, *args, **kwargs):
+    """
+    Run a write through the app's write batcher, or when batching is off
+    run it now in the current session and commit.
+
+    Returns:
+        Future: See WriteBatcher.submit
+    """
+    app = current_app._get_current_object()
+    if batching_enabled(app):
+        return get_write_batcher(app).submit(fn, *args, **kwargs)
+
+    future = Future()
+    future.set_running_or_notify_cancel()
+    try:
+        result = fn(*args, **kwargs)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        future.set_exception(e)
+    else:
+        future.set_result(result)
+    return future